@@ -12,8 +12,11 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from decouple import config, Csv
 
+from .database import banco_de_dados
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -64,6 +67,7 @@ MIDDLEWARE = [
     'allauth.account.middleware.AccountMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'nfc_cards.tenancy.EmpresaMiddleware',
 ]
 
 ROOT_URLCONF = 'card_nfc_project.urls'
@@ -90,13 +94,99 @@ WSGI_APPLICATION = 'card_nfc_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DATABASE_URL (ver card_nfc_project/database.py); sem ela, SQLite local.
+# Em produção com vários workers use PostgreSQL (serviço db do docker-compose,
+# profile "postgres"; dados existentes: manage.py migrate_from_sqlite), ex.:
+# DATABASE_URL=postgres://cards:cards@db:5432/cards?connect_timeout=5
+# Conexões persistentes por DB_CONN_MAX_AGE segundos, verificadas antes do
+# reuso (DB_CONN_HEALTH_CHECKS); DB_POOL=pgbouncer quando o DATABASE_URL aponta
+# para um PgBouncer em modo transaction (serviço pgbouncer do docker-compose).
+
 DATABASES = {
+    'default': banco_de_dados(
+        config('DATABASE_URL', default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
+        conn_max_age=config('DB_CONN_MAX_AGE', default=60, cast=int),
+        health_checks=config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+        pool=config('DB_POOL', default=''),
+    )
+}
+
+# Cache
+# Em produção use um backend compartilhado entre os workers (ex.: Redis ou
+# FileBasedCache); o LocMemCache padrão é isolado por processo, então o cache
+# de páginas fica desligado e os demais caches usam TTLs curtos.
+# Redis: CACHE_BACKEND=django.core.cache.backends.redis.RedisCache e
+# CACHE_LOCATION=redis://redis:6379/0 (serviço do docker-compose.yml).
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='cards-nfc'),
     }
 }
 
+# Cache de resolução de toques NFC (nfc_cards/tap_cache.py)
+NFC_TAP_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': config('NFC_TAP_CACHE_TIMEOUT', default=3600, cast=int),
+    'LOCAL_MAXSIZE': config('NFC_TAP_CACHE_LOCAL_MAXSIZE', default=2048, cast=int),
+    'LOCAL_TTL': config('NFC_TAP_CACHE_LOCAL_TTL', default=30, cast=int),
+}
+
+# Máximo de códigos por consulta em /api/nfc/lote/
+NFC_API_LOTE_MAXIMO = config('NFC_API_LOTE_MAXIMO', default=100, cast=int)
+
+# Grava o JSON da API em NFCCard.payload_json (nfc_cards/serializers.py).
+# Após ativar, rode `python manage.py refresh_api_snapshots`.
+NFC_API_SNAPSHOT = config('NFC_API_SNAPSHOT', default=False, cast=bool)
+
+# Cache das páginas públicas de pessoas e pets (nfc_cards/page_cache.py)
+NFC_PAGE_CACHE = {
+    'ENABLED': config('NFC_PAGE_CACHE_ENABLED', default=True, cast=bool),
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': config('NFC_PAGE_CACHE_TIMEOUT', default=3600, cast=int),
+}
+
+# Cache slug -> empresa da resolução de tenant (nfc_cards/tenancy.py)
+NFC_TENANT_CACHE = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': config('NFC_TENANT_CACHE_TIMEOUT', default=3600, cast=int),
+    'LOCAL_TIMEOUT': config('NFC_TENANT_CACHE_LOCAL_TIMEOUT', default=30, cast=int),
+}
+
+# Registro assíncrono de toques (nfc_cards/tap_events.py)
+NFC_TAP_EVENTS = {
+    'ENABLED': config('NFC_TAP_EVENTS_ENABLED', default=True, cast=bool),
+    'MAX_QUEUE': config('NFC_TAP_EVENTS_MAX_QUEUE', default=10000, cast=int),
+    'BATCH_SIZE': config('NFC_TAP_EVENTS_BATCH_SIZE', default=500, cast=int),
+    'BACKGROUND': True,
+}
+
+# Fila de tarefas em segundo plano (nfc_cards/jobs.py), executada por
+# `python manage.py run_worker`. Com EAGER=True as tarefas rodam no próprio
+# processo da requisição, logo após o commit, sem worker. Padrão: só no
+# runserver com DEBUG (gunicorn e o docker-compose usam o worker).
+NFC_JOBS = {
+    'EAGER': config('NFC_JOBS_EAGER', default=DEBUG and sys.argv[1:2] == ['runserver'], cast=bool),
+    'WORKERS': config('NFC_JOBS_WORKERS', default=2, cast=int),
+    'POLL_INTERVAL': config('NFC_JOBS_POLL_INTERVAL', default=1.0, cast=float),
+    'MAX_TENTATIVAS': config('NFC_JOBS_MAX_TENTATIVAS', default=5, cast=int),
+    'TIMEOUT': config('NFC_JOBS_TIMEOUT', default=600, cast=int),
+}
+
+# Modo de produção do SQLite (nfc_cards/sqlite.py): WAL, synchronous=NORMAL,
+# mmap, cache e busy timeout em cada conexão. Só vale com DATABASE_URL sqlite;
+# ative em servidores com vários workers que continuam no SQLite.
+# WRITER_INTERVAL vale em qualquer banco: intervalo do escritor em segundo
+# plano de cada processo, que grava os toques NFC.
+NFC_SQLITE = {
+    'PRODUCTION': config('NFC_SQLITE_PRODUCTION', default=False, cast=bool),
+    'BUSY_TIMEOUT': config('NFC_SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+    'CACHE_SIZE_KB': config('NFC_SQLITE_CACHE_SIZE_KB', default=65536, cast=int),
+    'MMAP_SIZE': config('NFC_SQLITE_MMAP_SIZE', default=268435456, cast=int),
+    'WRITER_INTERVAL': config('NFC_SQLITE_WRITER_INTERVAL', default=1.0, cast=float),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
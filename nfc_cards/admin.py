@@ -1,5 +1,35 @@
-from django.contrib import admin
-from .models import Empresa, Person, Pet, NFCCard
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from .models import Empresa, Person, Pet, NFCCard, TapEvent, Job
+from .imports import Importador, detectar_formato, ler_linhas
+from .pagination import ContagemEstimadaPaginator
+from .provisioning import provisionar_cartoes
+from . import counters, search
+
+class ProvisionarCartoesForm(forms.Form):
+    """Parâmetros da ação de provisionamento de cartões em lote"""
+    quantidade = forms.IntegerField(min_value=1, max_value=100000, label="Quantidade")
+    tipo = forms.ChoiceField(choices=NFCCard.TIPOS, label="Tipo de Cartão")
+    esquema = forms.ChoiceField(choices=[('aleatorio', 'Aleatório'), ('sequencial', 'Sequencial')], label="Esquema de código")
+    prefixo = forms.CharField(max_length=20, required=False, label="Prefixo")
+    tamanho = forms.IntegerField(min_value=4, max_value=30, initial=8, label="Tamanho do sufixo")
+
+class ImportarCadastrosForm(forms.Form):
+    """Arquivos da ação de importação em lote (CSV ou JSONL, colunas como na exportação)"""
+    pessoas = forms.FileField(required=False, label="Pessoas")
+    pets = forms.FileField(required=False, label="Pets", help_text="Tutor pela coluna tutor_slug ou tutor_email")
+    cartoes = forms.BooleanField(required=False, label="Criar um cartão NFC para cada registro")
+    dry_run = forms.BooleanField(required=False, label="Apenas validar (não grava nada)")
+    
+    def clean(self):
+        dados = super().clean()
+        if not dados.get('pessoas') and not dados.get('pets'):
+            raise forms.ValidationError('Envie o arquivo de pessoas e/ou o de pets.')
+        return dados
 
 @admin.register(Empresa)
 class EmpresaAdmin(admin.ModelAdmin):
@@ -8,6 +38,7 @@ class EmpresaAdmin(admin.ModelAdmin):
     search_fields = ['nome', 'slug', 'email']
     readonly_fields = ['criado_em', 'atualizado_em']
     prepopulated_fields = {'slug': ('nome',)}
+    actions = ['acao_provisionar_cartoes', 'acao_importar_cadastros']
     
     fieldsets = (
         ('Informações Básicas', {
@@ -24,13 +55,145 @@ class EmpresaAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    @admin.action(description="Provisionar cartões NFC em lote")
+    def acao_provisionar_cartoes(self, request, queryset):
+        if 'aplicar' in request.POST:
+            form = ProvisionarCartoesForm(request.POST)
+            if form.is_valid():
+                for empresa in queryset:
+                    try:
+                        cartoes = provisionar_cartoes(empresa, **form.cleaned_data)
+                    except ValueError as erro:
+                        self.message_user(request, str(erro), messages.ERROR)
+                        return None
+                    self.message_user(
+                        request,
+                        f'{len(cartoes)} cartões criados para {empresa.nome}. Os QR codes ficaram pendentes.',
+                        messages.SUCCESS,
+                    )
+                return None
+        else:
+            form = ProvisionarCartoesForm()
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Provisionar cartões NFC',
+            'opts': self.model._meta,
+            'form': form,
+            'empresas': queryset,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/nfc_cards/empresa/provisionar_cartoes.html', context)
+    
+    @admin.action(description="Importar pessoas e pets (CSV/JSONL)")
+    def acao_importar_cadastros(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, 'Selecione uma única empresa para importar.', messages.WARNING)
+            return None
+        empresa = queryset.get()
+        resultados = None
+        if 'aplicar' in request.POST:
+            form = ImportarCadastrosForm(request.POST, request.FILES)
+            if form.is_valid():
+                dados = form.cleaned_data
+                importador = Importador(empresa, dry_run=dados['dry_run'])
+                for conjunto in ('pessoas', 'pets'):
+                    if dados[conjunto]:
+                        arquivo = dados[conjunto]
+                        importador.importar(ler_linhas(arquivo, detectar_formato(arquivo.name)), conjunto)
+                if dados['cartoes']:
+                    importador.provisionar_cartoes()
+                resultados = importador.finalizar()
+                for conjunto, resultado in resultados.items():
+                    if resultado['linhas']:
+                        self.message_user(
+                            request,
+                            f"{conjunto}: {resultado['criados']} de {resultado['linhas']} linhas "
+                            f"{'válidas' if dados['dry_run'] else 'importadas'}, {resultado['total_erros']} com erro"
+                            + (f", {resultado['cartoes']} cartões criados (QR codes pendentes)." if resultado['cartoes'] else '.'),
+                            messages.WARNING if resultado['total_erros'] else messages.SUCCESS,
+                        )
+                if not any(resultado['total_erros'] for resultado in resultados.values()):
+                    return None
+        else:
+            form = ImportarCadastrosForm()
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Importar pessoas e pets',
+            'opts': self.model._meta,
+            'form': form,
+            'empresa': empresa,
+            'resultados': resultados,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(request, 'admin/nfc_cards/empresa/importar_cadastros.html', context)
+
+class ChangeListEstimada(ChangeList):
+    """Links de anterior/próxima para quando o total é desconhecido"""
+    
+    def _url_pagina(self, numero):
+        return self.get_query_string({PAGE_VAR: numero})
+    
+    @property
+    def url_anterior(self):
+        return self._url_pagina(self.page_num - 1) if self.page_num > 1 else None
+    
+    @property
+    def url_proxima(self):
+        return self._url_pagina(self.page_num + 1) if self.paginator.tem_proxima else None
+
+class ContagemEstimadaAdminMixin:
+    """Changelist sem COUNT(*) da tabela inteira (ver ``ContagemEstimadaPaginator``).
+
+    Acima do limite de contagem, o total só vem dos contadores quando o
+    único filtro é a empresa; com qualquer outro filtro ou busca o contador
+    não corresponde à lista e o total fica desconhecido.
+    """
+    paginator = ContagemEstimadaPaginator
+    show_full_result_count = False
+    parametros_sem_filtro = (PAGE_VAR, ORDER_VAR)
+    
+    def get_changelist(self, request, **kwargs):
+        return ChangeListEstimada
+    
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            estimar=lambda: self.total_da_empresa(request),
+        )
+    
+    def total_da_empresa(self, request):
+        filtros = {
+            chave: valor for chave, valor in request.GET.items()
+            if chave not in self.parametros_sem_filtro and valor != ''
+        }
+        if list(filtros) != ['empresa__id__exact'] or not filtros['empresa__id__exact'].isdigit():
+            return None
+        campo = counters.campo_do_modelo(self.model)
+        return counters.totais(int(filtros['empresa__id__exact']))[campo]
+
+class AutocompleteIndexadoMixin:
+    """Autocomplete dos campos FK (``autocomplete_fields``) pelo índice de busca, só com registros ativos"""
+    busca_tipo = None
+    busca_limite = 200
+    
+    def get_search_results(self, request, queryset, search_term):
+        if request.resolver_match is None or request.resolver_match.url_name != 'autocomplete':
+            return super().get_search_results(request, queryset, search_term)
+        queryset = queryset.filter(ativo=True)
+        if search.termos(search_term):
+            queryset = queryset.filter(pk__in=search.buscar(None, self.busca_tipo, search_term, self.busca_limite))
+        return queryset, False
 
 @admin.register(Person)
-class PersonAdmin(admin.ModelAdmin):
+class PersonAdmin(ContagemEstimadaAdminMixin, AutocompleteIndexadoMixin, admin.ModelAdmin):
     list_display = ['nome', 'slug', 'email', 'telefone', 'empresa', 'cargo', 'criado_em', 'ativo']
     list_filter = ['ativo', 'criado_em', 'empresa']
     search_fields = ['nome', 'slug', 'email', 'telefone', 'empresa__nome']
     readonly_fields = ['slug', 'criado_em', 'atualizado_em']
+    busca_tipo = 'pessoa'
     
     fieldsets = (
         ('Empresa', {
@@ -57,11 +220,13 @@ class PersonAdmin(admin.ModelAdmin):
         return qs.select_related('empresa')
 
 @admin.register(Pet)
-class PetAdmin(admin.ModelAdmin):
+class PetAdmin(ContagemEstimadaAdminMixin, AutocompleteIndexadoMixin, admin.ModelAdmin):
     list_display = ['nome', 'slug', 'especie', 'raca', 'tutor', 'empresa', 'criado_em', 'ativo']
     list_filter = ['ativo', 'especie', 'porte', 'criado_em', 'empresa']
     search_fields = ['nome', 'slug', 'raca', 'tutor__nome', 'empresa__nome']
     readonly_fields = ['slug', 'empresa', 'criado_em', 'atualizado_em', 'idade']
+    autocomplete_fields = ['tutor']
+    busca_tipo = 'pet'
     
     fieldsets = (
         ('Informações Básicas', {
@@ -90,15 +255,17 @@ class PetAdmin(admin.ModelAdmin):
     
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "tutor":
+            # Valida só ativos; as opções vêm do autocomplete
             kwargs["queryset"] = Person.objects.filter(ativo=True).select_related('empresa')
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 @admin.register(NFCCard)
-class NFCCardAdmin(admin.ModelAdmin):
+class NFCCardAdmin(ContagemEstimadaAdminMixin, admin.ModelAdmin):
     list_display = ['codigo_nfc', 'tipo', 'get_owner', 'empresa', 'criado_em', 'ativo']
     list_filter = ['ativo', 'tipo', 'criado_em', 'empresa']
     search_fields = ['codigo_nfc', 'pessoa__nome', 'pet__nome', 'empresa__nome']
     readonly_fields = ['empresa', 'criado_em', 'atualizado_em', 'qr_code']
+    autocomplete_fields = ['pessoa', 'pet']
     
     def get_owner(self, obj):
         if obj.pessoa:
@@ -127,8 +294,47 @@ class NFCCardAdmin(admin.ModelAdmin):
         return qs.select_related('empresa', 'pessoa', 'pet')
     
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Valida só ativos; as opções vêm do autocomplete
         if db_field.name == "pessoa":
             kwargs["queryset"] = Person.objects.filter(ativo=True).select_related('empresa')
         elif db_field.name == "pet":
             kwargs["queryset"] = Pet.objects.filter(ativo=True).select_related('empresa', 'tutor')
-        return super().formfield_for_foreignkey(db_field, request, **kwargs)
\ No newline at end of file
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+@admin.register(TapEvent)
+class TapEventAdmin(admin.ModelAdmin):
+    list_display = ['criado_em', 'cartao', 'empresa', 'user_agent', 'referencia']
+    list_filter = ['user_agent', 'referencia', 'criado_em', 'empresa']
+    date_hierarchy = 'criado_em'
+    list_select_related = ['cartao', 'empresa']
+    readonly_fields = ['cartao', 'empresa', 'user_agent', 'referencia', 'criado_em']
+    show_full_result_count = False
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'status', 'tentativas', 'agendado_para', 'concluido_em', 'criado_em']
+    list_filter = ['status', 'tipo', 'criado_em']
+    search_fields = ['tipo', 'chave']
+    date_hierarchy = 'criado_em'
+    readonly_fields = [
+        'tipo', 'payload', 'chave', 'status', 'repetir', 'tentativas', 'erro',
+        'agendado_para', 'iniciado_em', 'concluido_em', 'criado_em', 'atualizado_em',
+    ]
+    actions = ['acao_reprocessar']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description="Reprocessar tarefas selecionadas")
+    def acao_reprocessar(self, request, queryset):
+        agora = timezone.now()
+        total = queryset.exclude(status='executando').update(
+            status='pendente', tentativas=0, erro='', agendado_para=agora, atualizado_em=agora,
+        )
+        self.message_user(request, f'{total} tarefas voltaram para a fila.', messages.SUCCESS)
@@ -0,0 +1,196 @@
+"""
+Resumos de toques NFC.
+
+Os eventos brutos (``TapEvent``) são consolidados de forma incremental em
+``TapRollup`` (por hora e por dia; por empresa, cartão, pessoa e pet) pelo
+comando ``compact_tap_events``. As páginas leem apenas os resumos, então o
+custo delas não cresce com o volume de toques.
+
+A consolidação avança por um checkpoint de id. Como vários workers gravam
+lotes em paralelo, um evento com id menor pode ficar visível depois de um
+maior (no PostgreSQL os ids são reservados antes do commit). Por isso só
+entram eventos com mais de ``ATRASO_SEGURANCA`` segundos, e a janela para no
+primeiro evento mais novo que isso: ids abaixo do checkpoint nunca voltam a
+aparecer.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import NFCCard, TapEvent, TapRollup, TapRollupCheckpoint
+
+CHECKPOINT = 'toques'
+
+# Tempo, em segundos, para um toque sair do buffer (ver tap_events.py) e o
+# lote que o contém ser commitado
+ATRASO_SEGURANCA = 60
+
+
+def _inicio_do_dia(momento):
+    return timezone.localtime(momento).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _acumular(agregados):
+    """Converte linhas agregadas por hora em deltas por (granularidade, escopo, objeto, início)"""
+    deltas = defaultdict(int)
+    empresas = {}
+    for linha in agregados:
+        hora = linha['hora']
+        dia = _inicio_do_dia(hora)
+        objetos = [
+            ('empresa', linha['empresa_id']),
+            ('cartao', linha['cartao_id']),
+            ('pessoa', linha['cartao__pessoa_id']),
+            ('pet', linha['cartao__pet_id']),
+        ]
+        for escopo, objeto_id in objetos:
+            if objeto_id is None:
+                continue
+            for granularidade, inicio in (('hora', hora), ('dia', dia)):
+                chave = (granularidade, escopo, str(objeto_id), inicio)
+                deltas[chave] += linha['total']
+                empresas[chave] = linha['empresa_id']
+    return deltas, empresas
+
+
+def _aplicar(deltas, empresas):
+    existentes = TapRollup.objects.filter(
+        inicio__in={chave[3] for chave in deltas},
+        objeto_id__in={chave[2] for chave in deltas},
+    )
+    alterados = []
+    for rollup in existentes:
+        chave = (rollup.granularidade, rollup.escopo, rollup.objeto_id, rollup.inicio)
+        if chave in deltas:
+            rollup.total += deltas.pop(chave)
+            alterados.append(rollup)
+    TapRollup.objects.bulk_update(alterados, ['total'], batch_size=500)
+    TapRollup.objects.bulk_create([
+        TapRollup(
+            granularidade=granularidade, escopo=escopo, objeto_id=objeto_id,
+            inicio=inicio, empresa_id=empresas[(granularidade, escopo, objeto_id, inicio)], total=total,
+        )
+        for (granularidade, escopo, objeto_id, inicio), total in deltas.items()
+    ], batch_size=500)
+    return len(alterados) + len(deltas)
+
+
+def compactar_lote(tamanho_lote=20000, atraso=ATRASO_SEGURANCA):
+    """Consolida até ``tamanho_lote`` eventos com mais de ``atraso`` segundos.
+
+    Retorna ``(eventos, resumos)`` ou ``None`` quando não há eventos pendentes.
+    """
+    with transaction.atomic():
+        checkpoint, _ = TapRollupCheckpoint.objects.select_for_update().get_or_create(nome=CHECKPOINT)
+        pendentes = TapEvent.objects.filter(id__gt=checkpoint.ultimo_evento_id).order_by('id')
+        corte = timezone.now() - timedelta(seconds=atraso)
+        recente = pendentes.filter(criado_em__gte=corte).values_list('id', flat=True).first()
+        if recente is not None:
+            # Lotes ainda não commitados podem ter ids abaixo deste evento
+            pendentes = pendentes.filter(id__lt=recente)
+        limite = pendentes.values_list('id', flat=True)[tamanho_lote - 1:tamanho_lote].first()
+        if limite is None:
+            limite = pendentes.values_list('id', flat=True).last()
+        if limite is None:
+            return None
+
+        janela = TapEvent.objects.filter(id__gt=checkpoint.ultimo_evento_id, id__lte=limite)
+        agregados = (
+            janela.annotate(hora=TruncHour('criado_em'))
+            .values('hora', 'empresa_id', 'cartao_id', 'cartao__pessoa_id', 'cartao__pet_id')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        deltas, empresas = _acumular(agregados)
+        eventos = sum(total for (granularidade, escopo, _, _), total in deltas.items()
+                      if granularidade == 'hora' and escopo == 'cartao')
+        resumos = _aplicar(deltas, empresas)
+
+        checkpoint.ultimo_evento_id = limite
+        checkpoint.save(update_fields=['ultimo_evento_id', 'atualizado_em'])
+    return eventos, resumos
+
+
+def compactar_toques(tamanho_lote=20000, atraso=ATRASO_SEGURANCA):
+    """Consolida todos os eventos pendentes em lotes transacionais"""
+    total_eventos = total_resumos = 0
+    while True:
+        resultado = compactar_lote(tamanho_lote, atraso)
+        if resultado is None:
+            break
+        total_eventos += resultado[0]
+        total_resumos += resultado[1]
+    return total_eventos, total_resumos
+
+
+def podar_eventos(retencao_dias):
+    """Remove eventos brutos já consolidados e mais antigos que a retenção"""
+    checkpoint = TapRollupCheckpoint.objects.filter(nome=CHECKPOINT).first()
+    if checkpoint is None:
+        return 0
+    limite = timezone.now() - timedelta(days=retencao_dias)
+    removidos, _ = TapEvent.objects.filter(
+        id__lte=checkpoint.ultimo_evento_id, criado_em__lt=limite
+    ).delete()
+    return removidos
+
+
+def serie_diaria(empresa, dias=14, escopo='empresa', objeto_id=None):
+    """Lista de ``(dia, total)`` dos últimos ``dias`` dias, preenchida com zeros"""
+    hoje = _inicio_do_dia(timezone.now())
+    inicio = hoje - timedelta(days=dias - 1)
+    totais = dict(
+        TapRollup.objects.filter(
+            empresa=empresa, escopo=escopo, granularidade='dia',
+            objeto_id=str(objeto_id if objeto_id is not None else empresa.pk),
+            inicio__gte=inicio,
+        ).values_list('inicio', 'total')
+    )
+    totais = {_inicio_do_dia(momento).date(): total for momento, total in totais.items()}
+    return [
+        (dia, totais.get(dia, 0))
+        for dia in ((inicio + timedelta(days=n)).date() for n in range(dias))
+    ]
+
+
+def mais_tocados(empresa, escopo='cartao', dias=30, limite=5):
+    """Objetos com mais toques no período: lista de ``(objeto_id, total)``"""
+    inicio = _inicio_do_dia(timezone.now()) - timedelta(days=dias - 1)
+    return list(
+        TapRollup.objects.filter(empresa=empresa, escopo=escopo, granularidade='dia', inicio__gte=inicio)
+        .values('objeto_id')
+        .annotate(soma=Sum('total'))
+        .order_by('-soma')
+        .values_list('objeto_id', 'soma')[:limite]
+    )
+
+
+def total_toques(empresa, dias=30):
+    inicio = _inicio_do_dia(timezone.now()) - timedelta(days=dias - 1)
+    return TapRollup.objects.filter(
+        empresa=empresa, escopo='empresa', objeto_id=str(empresa.pk),
+        granularidade='dia', inicio__gte=inicio,
+    ).aggregate(soma=Sum('total'))['soma'] or 0
+
+
+def resumo_dashboard(empresa, dias=14):
+    """Contexto dos gráficos do dashboard, lido apenas dos resumos"""
+    serie = serie_diaria(empresa, dias=dias)
+    ranking = mais_tocados(empresa, escopo='cartao', dias=dias)
+    cartoes = {
+        str(cartao.pk): cartao
+        for cartao in NFCCard.objects.select_related('pessoa', 'pet').filter(pk__in=[objeto_id for objeto_id, _ in ranking])
+    }
+    return {
+        'toques_por_dia': serie,
+        'toques_pico': max((total for _, total in serie), default=0),
+        'toques_periodo': sum(total for _, total in serie),
+        'toques_dias': dias,
+        'cartoes_mais_tocados': [
+            (cartoes[objeto_id], total) for objeto_id, total in ranking if objeto_id in cartoes
+        ],
+    }
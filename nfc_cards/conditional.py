@@ -0,0 +1,115 @@
+"""
+Validadores de GET condicional (ETag / Last-Modified) das páginas públicas e
+da API de cartões.
+
+Os validadores saem de uma única consulta sobre os campos ``atualizado_em``
+do objeto, da empresa e dos relacionados exibidos, mais a contagem dos
+relacionados (exclusões não alteram nenhum ``atualizado_em``). Assim um
+cliente com a versão atual recebe 304 antes de o grafo de objetos ser
+carregado e o template renderizado.
+"""
+import hashlib
+
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import NFCCard, Person, Pet
+
+# Incrementar quando os templates das páginas públicas ou o formato da API mudarem
+REVISAO = 1
+
+
+def _agregado(modelo, campo, funcao):
+    """Subconsulta com o agregado dos registros de ``modelo`` ligados ao objeto externo"""
+    return Subquery(
+        modelo.objects.filter(**{campo: OuterRef('pk')}).order_by()
+        .values(campo).annotate(valor=funcao).values('valor')
+    )
+
+
+def _timestamp(*datas):
+    datas = [data for data in datas if data]
+    return int(max(datas).timestamp()) if datas else 0
+
+
+def _etag(*partes):
+    assinatura = '|'.join(str(parte) for parte in (REVISAO, *partes))
+    return 'W/"%s"' % hashlib.sha1(assinatura.encode('utf-8')).hexdigest()
+
+
+def _validadores(partes, datas, versao=None):
+    last_modified = _timestamp(*datas)
+    if versao is not None:
+        # O carimbo de versão das páginas (page_cache) é um instante em ns
+        last_modified = max(last_modified, versao // 10 ** 9)
+        partes = (*partes, versao)
+    return {'etag': _etag(*partes), 'last_modified': last_modified}
+
+
+def validadores_pessoa(empresa_slug, person_slug, versao=None, usuario=''):
+    linha = (
+        Person.objects.filter(empresa__slug=empresa_slug, empresa__ativo=True, slug=person_slug, ativo=True)
+        .annotate(
+            pets_em=_agregado(Pet, 'tutor', Max('atualizado_em')),
+            pets_total=_agregado(Pet, 'tutor', Count('pk', output_field=IntegerField())),
+            cartoes_em=_agregado(NFCCard, 'pessoa', Max('atualizado_em')),
+            cartoes_total=_agregado(NFCCard, 'pessoa', Count('pk', output_field=IntegerField())),
+        )
+        .values('pk', 'atualizado_em', 'empresa__atualizado_em', 'pets_em', 'pets_total', 'cartoes_em', 'cartoes_total')
+        .first()
+    )
+    if linha is None:
+        return None
+    datas = (linha['atualizado_em'], linha['empresa__atualizado_em'], linha['pets_em'], linha['cartoes_em'])
+    partes = ('pessoa', linha['pk'], *datas, linha['pets_total'], linha['cartoes_total'], usuario)
+    return _validadores(partes, datas, versao)
+
+
+def validadores_pet(empresa_slug, pet_slug, versao=None, usuario=''):
+    linha = (
+        Pet.objects.filter(empresa__slug=empresa_slug, empresa__ativo=True, slug=pet_slug, ativo=True)
+        .annotate(
+            cartoes_em=_agregado(NFCCard, 'pet', Max('atualizado_em')),
+            cartoes_total=_agregado(NFCCard, 'pet', Count('pk', output_field=IntegerField())),
+        )
+        .values('pk', 'atualizado_em', 'empresa__atualizado_em', 'tutor__atualizado_em', 'cartoes_em', 'cartoes_total')
+        .first()
+    )
+    if linha is None:
+        return None
+    datas = (linha['atualizado_em'], linha['empresa__atualizado_em'], linha['tutor__atualizado_em'], linha['cartoes_em'])
+    partes = ('pet', linha['pk'], *datas, linha['cartoes_total'], usuario)
+    return _validadores(partes, datas, versao)
+
+
+def validadores_cartao(codigo, empresa_slug=None, host=''):
+    """Validadores da API de cartão; ``host`` entra porque a resposta traz URLs absolutas"""
+    cartoes = NFCCard.objects.filter(codigo_nfc=codigo, ativo=True)
+    if empresa_slug is not None:
+        cartoes = cartoes.filter(empresa__slug=empresa_slug, empresa__ativo=True)
+    linha = cartoes.values(
+        'pk', 'atualizado_em', 'empresa__atualizado_em', 'pessoa__atualizado_em',
+        'pet__atualizado_em', 'pet__tutor__atualizado_em',
+    ).first()
+    if linha is None:
+        return None
+    datas = (
+        linha['atualizado_em'], linha['empresa__atualizado_em'], linha['pessoa__atualizado_em'],
+        linha['pet__atualizado_em'], linha['pet__tutor__atualizado_em'],
+    )
+    return _validadores(('cartao', linha['pk'], *datas, host), datas)
+
+
+def aplicar_validadores(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def nao_modificado(request, etag, last_modified):
+    """Resposta 304 (ou 412) se a requisição já tem a versão atual, senão None"""
+    base = aplicar_validadores(HttpResponse(), etag, last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified, response=base)
+    return None if response is base else response
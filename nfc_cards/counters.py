@@ -0,0 +1,163 @@
+"""
+Contadores desnormalizados de pessoas, pets e cartões ativos.
+
+O dashboard, a home da empresa e a home pública mostravam totais com
+``COUNT(*)`` a cada carregamento. Os totais agora ficam em ``Counter``: uma
+linha por empresa (``empresa:<id>``) e uma global (``global``), lidas com uma
+consulta por chave.
+
+Os sinais de ``Person``, ``Pet`` e ``NFCCard`` (ver ``models.py``) aplicam
+deltas com ``F()`` na mesma transação do save/delete, inclusive quando
+``ativo`` ou a empresa mudam. Caminhos em lote sem sinais (``bulk_create``,
+``queryset.update``) chamam ``somar`` diretamente ou dependem do comando
+``reconcile_counters``, que recalcula tudo e corrige desvios.
+
+Os deltas também ficam na transação da requisição no modo SQLite de
+produção (``sqlite.py``): com WAL e ``busy_timeout`` o UPDATE por ``F()``
+custa pouco, e um worker reiniciado não perde totais já confirmados.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+CHAVE_GLOBAL = 'global'
+
+# modelo -> campo do contador
+CAMPOS = {
+    'nfc_cards.person': 'pessoas',
+    'nfc_cards.pet': 'pets',
+    'nfc_cards.nfccard': 'cartoes',
+}
+
+ZERADOS = {'pessoas': 0, 'pets': 0, 'cartoes': 0}
+
+
+def campo_do_modelo(modelo):
+    return CAMPOS[modelo._meta.label_lower]
+
+
+def chave_empresa(empresa_id):
+    return f'empresa:{empresa_id}'
+
+
+def _chave(empresa_id):
+    return CHAVE_GLOBAL if empresa_id is None else chave_empresa(empresa_id)
+
+
+def contar(empresa_id=None):
+    """Totais calculados com COUNT nas tabelas (usado na criação e na reconciliação)"""
+    from .models import NFCCard, Person, Pet
+
+    totais = {}
+    for modelo in (Person, Pet, NFCCard):
+        registros = modelo.objects.filter(ativo=True)
+        if empresa_id is not None:
+            registros = registros.filter(empresa_id=empresa_id)
+        totais[campo_do_modelo(modelo)] = registros.count()
+    return totais
+
+
+def recontar(empresa_id=None):
+    """Recalcula e grava a linha da empresa (ou a global); retorna os totais"""
+    from .models import Counter
+
+    totais = contar(empresa_id)
+    Counter.objects.update_or_create(chave=_chave(empresa_id), defaults=totais)
+    return totais
+
+
+def _aplicar(chave, empresa_id, deltas):
+    from .models import Counter
+
+    deltas = {campo: delta for campo, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    atualizadas = Counter.objects.filter(chave=chave).update(
+        **{campo: F(campo) + delta for campo, delta in deltas.items()}
+    )
+    if not atualizadas:
+        # Primeira alteração desde a criação: a contagem já inclui o registro salvo
+        try:
+            with transaction.atomic():
+                recontar(empresa_id)
+        except IntegrityError:
+            # Outro processo criou a linha no meio tempo
+            Counter.objects.filter(chave=chave).update(
+                **{campo: F(campo) + delta for campo, delta in deltas.items()}
+            )
+
+
+def somar(empresa_id, **deltas):
+    """Soma ``deltas`` (ex.: ``pessoas=10``) na linha da empresa e na global"""
+    _aplicar(chave_empresa(empresa_id), empresa_id, deltas)
+    _aplicar(CHAVE_GLOBAL, None, deltas)
+
+
+def mover(campo, empresa_antes, empresa_depois):
+    """Um registro deixou de contar em ``empresa_antes`` e passou a contar em ``empresa_depois``.
+
+    ``None`` significa "não contado" (inativo, novo ou excluído).
+    """
+    if empresa_antes is not None:
+        _aplicar(chave_empresa(empresa_antes), empresa_antes, {campo: -1})
+    if empresa_depois is not None:
+        _aplicar(chave_empresa(empresa_depois), empresa_depois, {campo: 1})
+    if (empresa_antes is None) != (empresa_depois is None):
+        _aplicar(CHAVE_GLOBAL, None, {campo: -1 if empresa_depois is None else 1})
+
+
+def remover_empresa(empresa_id):
+    from .models import Counter
+
+    Counter.objects.filter(chave=chave_empresa(empresa_id)).delete()
+
+
+def totais(empresa_id=None):
+    """Totais da empresa (ou globais) com uma consulta; cria a linha se faltar"""
+    from .models import Counter
+
+    linha = Counter.objects.filter(chave=_chave(empresa_id)).values('pessoas', 'pets', 'cartoes').first()
+    if linha is None:
+        return recontar(empresa_id)
+    return linha
+
+
+def totais_empresas(empresa_ids):
+    """``{empresa_id: totais}`` com uma consulta para todas as empresas"""
+    from .models import Counter
+
+    chaves = {chave_empresa(empresa_id): empresa_id for empresa_id in empresa_ids}
+    linhas = Counter.objects.filter(chave__in=list(chaves)).values('chave', 'pessoas', 'pets', 'cartoes')
+    resultado = {chaves[linha.pop('chave')]: linha for linha in linhas}
+    for empresa_id in chaves.values():
+        if empresa_id not in resultado:
+            resultado[empresa_id] = recontar(empresa_id)
+    return resultado
+
+
+def reconciliar():
+    """Recalcula todas as linhas; retorna ``[(chave, antes, depois)]`` das que divergiam"""
+    from .models import Counter, Empresa
+
+    esperados = {CHAVE_GLOBAL: contar()}
+    for modelo, relacao in (('pessoas', 'pessoas'), ('pets', 'pets'), ('cartoes', 'cartoes_nfc')):
+        contagens = Empresa.objects.annotate(total=Count(relacao, filter=Q(**{f'{relacao}__ativo': True})))
+        for empresa_id, total in contagens.values_list('pk', 'total'):
+            esperados.setdefault(chave_empresa(empresa_id), dict(ZERADOS))[modelo] = total
+
+    divergentes = []
+    with transaction.atomic():
+        atuais = {
+            linha['chave']: linha
+            for linha in Counter.objects.select_for_update().values('chave', 'pessoas', 'pets', 'cartoes')
+        }
+        for chave, valores in esperados.items():
+            atual = atuais.pop(chave, None)
+            antes = {campo: atual[campo] for campo in ZERADOS} if atual else None
+            if antes != valores:
+                Counter.objects.update_or_create(chave=chave, defaults=valores)
+                divergentes.append((chave, antes, valores))
+        # Linhas de empresas que não existem mais
+        if atuais:
+            Counter.objects.filter(chave__in=list(atuais)).delete()
+            divergentes.extend((chave, {campo: linha[campo] for campo in ZERADOS}, None) for chave, linha in atuais.items())
+    return divergentes
@@ -0,0 +1,185 @@
+"""
+Exportação em streaming de pessoas, pets e cartões de uma empresa.
+
+Os registros são lidos com ``values()`` (com os joins necessários) e
+``iterator()``, em blocos, e cada formato é um gerador que entrega pedaços de
+~64 KB. A memória fica constante mesmo para empresas com centenas de
+milhares de registros, tanto na view (``StreamingHttpResponse``) quanto no
+comando ``export_data``.
+"""
+import csv
+import json
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+
+from .models import NFCCard, Person, Pet
+from .serializers import url_site
+
+TAMANHO_BLOCO = 2000
+TAMANHO_PEDACO = 64 * 1024
+
+# conjunto -> (modelo, [(coluna, campo em values())])
+CONJUNTOS = {
+    'pessoas': (Person, [
+        ('slug', 'slug'), ('nome', 'nome'), ('email', 'email'), ('telefone', 'telefone'),
+        ('whatsapp', 'whatsapp'), ('cargo', 'cargo'), ('apresentacao', 'apresentacao'),
+        ('foto', 'foto'), ('linkedin', 'linkedin'), ('instagram', 'instagram'),
+        ('facebook', 'facebook'), ('website', 'website'), ('linktree_url', 'linktree_url'),
+        ('ativo', 'ativo'), ('criado_em', 'criado_em'), ('atualizado_em', 'atualizado_em'),
+    ]),
+    'pets': (Pet, [
+        ('slug', 'slug'), ('nome', 'nome'), ('especie', 'especie'), ('raca', 'raca'),
+        ('porte', 'porte'), ('cor', 'cor'), ('data_nascimento', 'data_nascimento'), ('foto', 'foto'),
+        ('veterinario', 'veterinario'), ('telefone_veterinario', 'telefone_veterinario'),
+        ('observacoes', 'observacoes'), ('medicamentos', 'medicamentos'), ('alergias', 'alergias'),
+        ('tutor_slug', 'tutor__slug'), ('tutor_nome', 'tutor__nome'),
+        ('ativo', 'ativo'), ('criado_em', 'criado_em'), ('atualizado_em', 'atualizado_em'),
+    ]),
+    'cartoes': (NFCCard, [
+        ('codigo_nfc', 'codigo_nfc'), ('tipo', 'tipo'), ('pessoa_slug', 'pessoa__slug'),
+        ('pet_slug', 'pet__slug'), ('qr_code', 'qr_code'), ('ativo', 'ativo'),
+        ('criado_em', 'criado_em'), ('atualizado_em', 'atualizado_em'),
+    ]),
+}
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'vcf.zip': 'application/zip',
+}
+
+
+def formatos_do_conjunto(conjunto):
+    return ('csv', 'jsonl', 'vcf.zip') if conjunto == 'pessoas' else ('csv', 'jsonl')
+
+
+def linhas(empresa, conjunto):
+    """Dicionários ``{coluna: valor}`` do conjunto, lidos em blocos"""
+    modelo, colunas = CONJUNTOS[conjunto]
+    campos = [campo for _, campo in colunas]
+    registros = modelo.objects.filter(empresa=empresa).order_by('pk').values(*campos)
+    for registro in registros.iterator(chunk_size=TAMANHO_BLOCO):
+        yield {coluna: registro[campo] for coluna, campo in colunas}
+
+
+def _agrupar(pedacos, vazio=''):
+    """Junta pedaços pequenos em blocos de ~TAMANHO_PEDACO"""
+    buffer, tamanho = [], 0
+    for pedaco in pedacos:
+        buffer.append(pedaco)
+        tamanho += len(pedaco)
+        if tamanho >= TAMANHO_PEDACO:
+            yield vazio.join(buffer)
+            buffer, tamanho = [], 0
+    if buffer:
+        yield vazio.join(buffer)
+
+
+class _Eco:
+    """Destino do csv.writer que apenas devolve a linha formatada"""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(empresa, conjunto):
+    _, colunas = CONJUNTOS[conjunto]
+    escritor = csv.writer(_Eco())
+
+    def pedacos():
+        # BOM para o Excel reconhecer UTF-8
+        yield '\ufeff'
+        yield escritor.writerow([coluna for coluna, _ in colunas])
+        for linha in linhas(empresa, conjunto):
+            yield escritor.writerow(linha.values())
+
+    return _agrupar(pedacos())
+
+
+def gerar_jsonl(empresa, conjunto):
+    return _agrupar(
+        json.dumps(linha, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+        for linha in linhas(empresa, conjunto)
+    )
+
+
+def _escapar_vcard(valor):
+    valor = str(valor or '')
+    for original, escapado in (('\\', '\\\\'), (',', '\\,'), (';', '\\;'), ('\r\n', '\\n'), ('\n', '\\n')):
+        valor = valor.replace(original, escapado)
+    return valor
+
+
+def vcard(pessoa, empresa):
+    """vCard 3.0 de uma linha do conjunto ``pessoas``"""
+    url = url_site(reverse('person_detail', kwargs={'empresa_slug': empresa.slug, 'person_slug': pessoa['slug']}))
+    nome = _escapar_vcard(pessoa['nome'])
+    linhas_vcard = [
+        'BEGIN:VCARD',
+        'VERSION:3.0',
+        f'FN:{nome}',
+        f'N:{nome};;;;',
+        f'ORG:{_escapar_vcard(empresa.nome)}',
+    ]
+    if pessoa['cargo']:
+        linhas_vcard.append(f"TITLE:{_escapar_vcard(pessoa['cargo'])}")
+    if pessoa['email']:
+        linhas_vcard.append(f"EMAIL;TYPE=INTERNET:{_escapar_vcard(pessoa['email'])}")
+    if pessoa['telefone']:
+        linhas_vcard.append(f"TEL;TYPE=WORK,VOICE:{_escapar_vcard(pessoa['telefone'])}")
+    if pessoa['whatsapp']:
+        linhas_vcard.append(f"TEL;TYPE=CELL:{_escapar_vcard(pessoa['whatsapp'])}")
+    linhas_vcard.append(f'URL:{_escapar_vcard(url)}')
+    if pessoa['apresentacao']:
+        linhas_vcard.append(f"NOTE:{_escapar_vcard(pessoa['apresentacao'])}")
+    linhas_vcard.append('END:VCARD')
+    return '\r\n'.join(linhas_vcard) + '\r\n'
+
+
+class _SaidaZip:
+    """Arquivo só de escrita e sem seek: o zipfile grava em modo streaming"""
+
+    def __init__(self):
+        self._pedacos = []
+
+    def write(self, dados):
+        self._pedacos.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(self._pedacos)
+        self._pedacos = []
+        return dados
+
+
+def gerar_vcards_zip(empresa):
+    """Zip com um ``<slug>.vcf`` por pessoa, gerado em streaming"""
+    def pedacos():
+        saida = _SaidaZip()
+        with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED) as arquivo:
+            for pessoa in linhas(empresa, 'pessoas'):
+                arquivo.writestr(f"{pessoa['slug']}.vcf", vcard(pessoa, empresa))
+                yield saida.esvaziar()
+        yield saida.esvaziar()
+
+    return _agrupar(pedacos(), vazio=b'')
+
+
+def exportar(empresa, conjunto, formato):
+    """Gerador com o conteúdo da exportação (str para csv/jsonl, bytes para zip)"""
+    if conjunto not in CONJUNTOS or formato not in formatos_do_conjunto(conjunto):
+        raise ValueError(f'Exportação não suportada: {conjunto}.{formato}')
+    if formato == 'csv':
+        return gerar_csv(empresa, conjunto)
+    if formato == 'jsonl':
+        return gerar_jsonl(empresa, conjunto)
+    return gerar_vcards_zip(empresa)
+
+
+def nome_arquivo(empresa, conjunto, formato):
+    return f'{empresa.slug}-{conjunto}.{formato}'
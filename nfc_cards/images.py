@@ -0,0 +1,128 @@
+"""
+Derivados de imagens enviadas (fotos de pessoas/pets e logos de empresas).
+
+Para cada original são gerados tamanhos reduzidos em WebP e JPEG, gravados
+ao lado do arquivo: ``pessoas/foto.png`` → ``pessoas/foto.thumb.webp``,
+``pessoas/foto.thumb.jpg`` etc. Os templates escolhem o tamanho pela tag
+``{% imagem %}`` (ver ``templatetags/nfc_images.py``).
+"""
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Maior lado, em pixels, de cada variante
+VARIANTES = {
+    'thumb': 200,
+    'card': 600,
+    'full': 1600,
+}
+
+FORMATOS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def caminho_derivado(nome_original, variante, extensao):
+    base, _ = posixpath.splitext(nome_original)
+    return f"{base}.{variante}.{extensao}"
+
+
+def _preparar(imagem, formato):
+    if formato == 'JPEG':
+        if imagem.mode in ('RGBA', 'LA', 'P'):
+            imagem = imagem.convert('RGBA')
+            fundo = Image.new('RGB', imagem.size, (255, 255, 255))
+            fundo.paste(imagem, mask=imagem.getchannel('A'))
+            return fundo
+        return imagem.convert('RGB')
+    if imagem.mode not in ('RGB', 'RGBA'):
+        return imagem.convert('RGBA')
+    return imagem
+
+
+def gerar_derivados(arquivo, storage=default_storage):
+    """Gera todas as variantes do arquivo (FieldFile ou nome no storage)"""
+    nome = getattr(arquivo, 'name', arquivo)
+    if not nome:
+        return []
+
+    with storage.open(nome, 'rb') as origem:
+        original = Image.open(origem)
+        original.load()
+    original = ImageOps.exif_transpose(original)
+
+    gerados = []
+    for variante, lado in VARIANTES.items():
+        reduzida = original.copy()
+        reduzida.thumbnail((lado, lado), Image.LANCZOS)
+        for extensao, (formato, opcoes) in FORMATOS.items():
+            buffer = BytesIO()
+            _preparar(reduzida, formato).save(buffer, format=formato, **opcoes)
+            caminho = caminho_derivado(nome, variante, extensao)
+            if storage.exists(caminho):
+                storage.delete(caminho)
+            gerados.append(storage.save(caminho, ContentFile(buffer.getvalue())))
+    return gerados
+
+
+def remover_exif(arquivo, storage=default_storage):
+    """Grava uma cópia do original sem metadados EXIF (localização, aparelho etc.).
+
+    A orientação indicada no EXIF é aplicada aos pixels antes da remoção. O
+    original não é alterado: a cópia ganha um nome novo, retornado, e quem
+    chama troca a referência e apaga o original (ver ``jobs.processar_imagem``).
+    Retorna None se a imagem não tinha EXIF.
+    """
+    nome = getattr(arquivo, 'name', arquivo)
+    if not nome:
+        return None
+    with storage.open(nome, 'rb') as origem:
+        imagem = Image.open(origem)
+        imagem.load()
+    if not imagem.getexif():
+        return None
+
+    formato = imagem.format
+    imagem = ImageOps.exif_transpose(imagem)
+    imagem.info.pop('exif', None)
+    opcoes = {'quality': 95} if formato == 'JPEG' else {}
+    buffer = BytesIO()
+    imagem.save(buffer, format=formato, **opcoes)
+    # O nome já existe: o storage gera um nome livre ao lado do original
+    return storage.save(nome, ContentFile(buffer.getvalue()))
+
+
+def gerar_derivados_seguro(arquivo):
+    """Como ``gerar_derivados``, mas registra e ignora imagens inválidas"""
+    try:
+        return gerar_derivados(arquivo)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception('Falha ao gerar derivados de %s', getattr(arquivo, 'name', arquivo))
+        return []
+
+
+def derivados_pendentes(arquivo, storage=default_storage):
+    """True se alguma variante do arquivo ainda não existe no storage"""
+    nome = getattr(arquivo, 'name', arquivo)
+    return bool(nome) and any(
+        not storage.exists(caminho_derivado(nome, variante, extensao))
+        for variante in VARIANTES for extensao in FORMATOS
+    )
+
+
+def url_derivado(arquivo, variante, extensao='jpg', storage=default_storage):
+    """URL da variante, ou ``None`` se ela ainda não foi gerada"""
+    nome = getattr(arquivo, 'name', arquivo)
+    if not nome or variante not in VARIANTES or extensao not in FORMATOS:
+        return None
+    caminho = caminho_derivado(nome, variante, extensao)
+    if not storage.exists(caminho):
+        return None
+    return storage.url(caminho)
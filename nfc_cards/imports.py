@@ -0,0 +1,228 @@
+"""
+Importação em lote de pessoas e pets a partir de CSV ou JSONL.
+
+O arquivo é lido linha a linha: cada linha é validada com as regras dos
+campos do modelo (``full_clean``), sem consultas. Os slugs são alocados em
+memória contra o conjunto de slugs já existentes na empresa, buscado uma
+única vez (``slugs.AlocadorSlugs``). As linhas válidas são inseridas com
+``bulk_create`` em blocos transacionais; as inválidas entram no relatório de
+erros com o número da linha.
+
+Pets são ligados ao tutor pela coluna ``tutor_slug`` (slug da pessoa, como na
+exportação) ou ``tutor_email``.
+"""
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
+
+from . import counters, jobs, page_cache, search
+from .models import Person, Pet
+from .provisioning import vincular_cartoes
+from .serializers import snapshot_ativo
+from .slugs import AlocadorSlugs
+
+CAMPOS_PESSOA = (
+    'nome', 'email', 'telefone', 'whatsapp', 'cargo', 'apresentacao',
+    'linkedin', 'instagram', 'facebook', 'website', 'linktree_url',
+)
+CAMPOS_PET = (
+    'nome', 'especie', 'raca', 'porte', 'cor', 'data_nascimento', 'veterinario',
+    'telefone_veterinario', 'observacoes', 'medicamentos', 'alergias',
+)
+
+FORMATOS = ('csv', 'jsonl')
+
+# Linhas com erro guardadas no relatório (as demais só são contadas)
+MAX_ERROS = 1000
+
+
+def detectar_formato(nome_arquivo):
+    return 'jsonl' if nome_arquivo.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def ler_linhas(arquivo, formato):
+    """Gera ``(numero_da_linha, dict)`` a partir de um arquivo binário ou texto"""
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato de importação inválido: {formato}')
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='') if 'b' in getattr(arquivo, 'mode', 'b') else arquivo
+    if formato == 'csv':
+        leitor = csv.DictReader(texto)
+        for registro in leitor:
+            yield leitor.line_num, registro
+        return
+    for numero, linha in enumerate(texto, start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            yield numero, ValueError('JSON inválido.')
+            continue
+        yield numero, registro if isinstance(registro, dict) else ValueError('A linha deve ser um objeto JSON.')
+
+
+def _mensagens(erro):
+    if hasattr(erro, 'message_dict'):
+        return '; '.join(f'{campo}: {" ".join(msgs)}' for campo, msgs in erro.message_dict.items())
+    return ' '.join(getattr(erro, 'messages', [str(erro)]))
+
+
+class Importador:
+    """Importa pessoas e pets para a empresa.
+
+    ``resultados[conjunto]`` acumula ``{'linhas', 'criados', 'erros',
+    'total_erros', 'cartoes'}``; ``erros`` é uma lista de ``(linha, mensagem)``.
+    Importe as pessoas antes dos pets que as referenciam.
+    """
+
+    def __init__(self, empresa, lote=500, dry_run=False):
+        self.empresa = empresa
+        self.lote = lote
+        self.dry_run = dry_run
+        self.resultados = {
+            conjunto: {'linhas': 0, 'criados': 0, 'erros': [], 'total_erros': 0, 'cartoes': 0}
+            for conjunto in ('pessoas', 'pets')
+        }
+        self.criados = {'pessoas': [], 'pets': []}
+        self._tutores = None
+
+    def _erro(self, resultado, numero, mensagem):
+        resultado['total_erros'] += 1
+        if len(resultado['erros']) < MAX_ERROS:
+            resultado['erros'].append((numero, mensagem))
+
+    def _texto(self, registro, campo):
+        valor = registro.get(campo)
+        return '' if valor is None else str(valor).strip()
+
+    # Tutores (pets)
+
+    def _carregar_tutores(self):
+        if self._tutores is None:
+            self._tutores = {}
+            for pk, slug, email in Person.objects.filter(empresa=self.empresa).values_list('pk', 'slug', 'email'):
+                self._tutores[('slug', slug)] = pk
+                self._tutores.setdefault(('email', email.lower()), pk)
+        return self._tutores
+
+    def _tutor(self, registro):
+        """Id do tutor da linha (None no dry-run para pessoas do mesmo arquivo)"""
+        tutores = self._carregar_tutores()
+        slug = self._texto(registro, 'tutor_slug')
+        email = self._texto(registro, 'tutor_email').lower()
+        chave = ('slug', slug) if slug else ('email', email)
+        if not (slug or email) or chave not in tutores:
+            raise ValidationError({'tutor_slug': ['Tutor não encontrado (use tutor_slug ou tutor_email).']})
+        return tutores[chave]
+
+    # Conversão e validação de uma linha
+
+    def _construir_pessoa(self, registro, slugs):
+        pessoa = Person(empresa=self.empresa, **{campo: self._texto(registro, campo) for campo in CAMPOS_PESSOA})
+        pessoa.full_clean(exclude=['empresa', 'slug', 'foto'], validate_unique=False, validate_constraints=False)
+        pessoa.slug = slugs.alocar(self._texto(registro, 'slug') or pessoa.nome)
+        return pessoa
+
+    def _construir_pet(self, registro, slugs):
+        valores = {campo: self._texto(registro, campo) for campo in CAMPOS_PET}
+        valores['data_nascimento'] = valores['data_nascimento'] or None
+        pet = Pet(empresa=self.empresa, tutor_id=self._tutor(registro), **valores)
+        pet.full_clean(exclude=['empresa', 'slug', 'foto', 'tutor'], validate_unique=False, validate_constraints=False)
+        pet.slug = slugs.alocar(self._texto(registro, 'slug') or pet.nome)
+        return pet
+
+    # Inserção
+
+    def _gravar(self, modelo, objetos):
+        with transaction.atomic():
+            criados = modelo.objects.bulk_create(objetos)
+            # bulk_create não dispara os sinais dos contadores nem do índice de busca
+            counters.somar(self.empresa.pk, **{counters.campo_do_modelo(modelo): len(criados)})
+            if modelo is Pet:
+                prefetch_related_objects(criados, 'tutor')
+            search.indexar(criados)
+        return criados
+
+    def _inserir(self, modelo, objetos, slugs):
+        if self.dry_run or not objetos:
+            return objetos
+        try:
+            return self._gravar(modelo, objetos)
+        except IntegrityError:
+            # Outro processo criou um dos slugs: realoca o bloco contra o banco e tenta de novo
+            for objeto, slug in zip(objetos, slugs.realocar([objeto.slug for objeto in objetos])):
+                objeto.slug = slug
+            return self._gravar(modelo, objetos)
+
+    def importar(self, linhas, conjunto):
+        """Consome ``(numero, registro)`` de ``ler_linhas`` e insere as válidas"""
+        modelo, construir, padrao = {
+            'pessoas': (Person, self._construir_pessoa, 'pessoa'),
+            'pets': (Pet, self._construir_pet, 'pet'),
+        }[conjunto]
+        slugs = AlocadorSlugs(modelo, self.empresa.pk, padrao)
+        resultado = self.resultados[conjunto]
+
+        pendentes = []
+        for numero, registro in linhas:
+            resultado['linhas'] += 1
+            if isinstance(registro, Exception):
+                self._erro(resultado, numero, str(registro))
+                continue
+            try:
+                pendentes.append(construir(registro, slugs))
+            except ValidationError as erro:
+                self._erro(resultado, numero, _mensagens(erro))
+                continue
+            if len(pendentes) >= self.lote:
+                self._registrar(conjunto, self._inserir(modelo, pendentes, slugs))
+                pendentes = []
+        self._registrar(conjunto, self._inserir(modelo, pendentes, slugs))
+        return resultado
+
+    def _registrar(self, conjunto, criados):
+        self.resultados[conjunto]['criados'] += len(criados)
+        self.criados[conjunto].extend(criados)
+        if conjunto == 'pessoas':
+            tutores = self._carregar_tutores()
+            for pessoa in criados:
+                tutores[('slug', pessoa.slug)] = pessoa.pk
+                tutores.setdefault(('email', pessoa.email.lower()), pessoa.pk)
+
+    def provisionar_cartoes(self, **opcoes):
+        """Cria e vincula um cartão NFC para cada pessoa e pet importados; retorna os cartões"""
+        if self.dry_run:
+            return []
+        cartoes = []
+        for conjunto, tipo in (('pessoas', 'pessoa'), ('pets', 'pet')):
+            if self.criados[conjunto]:
+                criados = vincular_cartoes(self.empresa, self.criados[conjunto], tipo, **opcoes)
+                self.resultados[conjunto]['cartoes'] += len(criados)
+                cartoes.extend(criados)
+        if cartoes and snapshot_ativo():
+            # bulk_create não dispara os sinais que gravam os snapshots da API
+            jobs.enfileirar('api.snapshots', {'empresa_id': self.empresa.pk}, chave=f'api.snapshots:{self.empresa.pk}')
+        return cartoes
+
+    def finalizar(self):
+        # bulk_create não dispara sinais: páginas de tutores já em cache listam os pets novos
+        if not self.dry_run and any(resultado['criados'] for resultado in self.resultados.values()):
+            page_cache.invalidar_empresas([self.empresa.slug])
+        return self.resultados
+
+
+def importar_arquivos(empresa, pessoas=None, pets=None, formato_pessoas='csv', formato_pets='csv',
+                      cartoes=False, lote=500, dry_run=False, opcoes_cartoes=None):
+    """Importa pessoas e depois pets (que podem referenciar as pessoas importadas)"""
+    importador = Importador(empresa, lote=lote, dry_run=dry_run)
+    if pessoas is not None:
+        importador.importar(ler_linhas(pessoas, formato_pessoas), 'pessoas')
+    if pets is not None:
+        importador.importar(ler_linhas(pets, formato_pets), 'pets')
+    if cartoes:
+        importador.provisionar_cartoes(**(opcoes_cartoes or {}))
+    return importador.finalizar()
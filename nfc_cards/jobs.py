@@ -0,0 +1,326 @@
+"""
+Fila de tarefas em segundo plano, guardada no próprio banco (sem broker).
+
+As views e os modelos chamam ``enfileirar`` dentro da transação corrente; a
+tarefa só fica visível para os workers após o commit. O comando
+``run_worker`` executa as tarefas em threads. A reserva é feita com um
+``UPDATE ... WHERE status='pendente'`` condicional, então vários processos
+podem consumir a mesma fila sem executar uma tarefa duas vezes.
+
+Falhas são repetidas com espera exponencial até ``MAX_TENTATIVAS``; tarefas
+presas em ``executando`` (worker encerrado no meio) voltam para a fila após
+``TIMEOUT`` segundos.
+"""
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PADRAO = {
+    'EAGER': False,
+    'WORKERS': 2,
+    'POLL_INTERVAL': 1.0,
+    'MAX_TENTATIVAS': 5,
+    'TIMEOUT': 600,
+}
+
+# Espera antes da n-ésima nova tentativa: BACKOFF_BASE * 2 ** (n - 1) segundos
+BACKOFF_BASE = 10
+BACKOFF_MAXIMO = 3600
+
+# Intervalo mínimo, em segundos, entre buscas por tarefas travadas
+INTERVALO_RECUPERACAO = 60
+
+_handlers = {}
+
+
+def _config():
+    config = dict(CONFIG_PADRAO)
+    config.update(getattr(settings, 'NFC_JOBS', {}))
+    return config
+
+
+def assincrono():
+    """False quando as tarefas rodam no próprio processo (EAGER)"""
+    return not _config()['EAGER']
+
+
+def tarefa(tipo):
+    """Registra a função como handler das tarefas de ``tipo``"""
+    def registrar(funcao):
+        _handlers[tipo] = funcao
+        return funcao
+    return registrar
+
+
+def enfileirar(tipo, payload=None, chave=None, atraso=0):
+    """Cria a tarefa e retorna o ``Job``.
+
+    Com ``chave``, uma tarefa pendente com a mesma chave é reaproveitada e
+    uma concluída ou que falhou volta para a fila. Uma em execução pode já ter
+    lido o estado antigo: ela é marcada para ``repetir`` e volta para a fila
+    quando terminar.
+    """
+    from .models import Job
+
+    if tipo not in _handlers:
+        raise ValueError(f'Tipo de tarefa desconhecido: {tipo}')
+    agendado_para = timezone.now() + timedelta(seconds=atraso)
+    if chave:
+        job, criado = Job.objects.get_or_create(
+            chave=chave, defaults={'tipo': tipo, 'payload': payload or {}, 'agendado_para': agendado_para},
+        )
+        # Os updates condicionais também travam a linha: um worker só reserva
+        # ou conclui a tarefa depois do commit de quem enfileirou
+        while not criado:
+            campos = {'tipo': tipo, 'payload': payload or {}, 'atualizado_em': timezone.now()}
+            if Job.objects.filter(pk=job.pk, status__in=['concluida', 'falhou']).update(
+                status='pendente', tentativas=0, erro='', agendado_para=agendado_para, **campos,
+            ):
+                job.refresh_from_db()
+                break
+            if Job.objects.filter(pk=job.pk, status='pendente').update(**campos):
+                return job
+            if Job.objects.filter(pk=job.pk, status='executando').update(repetir=True, **campos):
+                return job
+            if not Job.objects.filter(pk=job.pk).exists():
+                return enfileirar(tipo, payload, chave, atraso)
+            # O status mudou entre os updates (worker concluindo a tarefa): tenta de novo
+    else:
+        job = Job.objects.create(tipo=tipo, payload=payload or {}, agendado_para=agendado_para)
+
+    if not assincrono():
+        transaction.on_commit(lambda: executar_pendente(job.pk))
+    return job
+
+
+def reservar(limite=10):
+    """Marca uma tarefa pendente como ``executando`` e a retorna (ou None)"""
+    from .models import Job
+
+    agora = timezone.now()
+    candidatas = (
+        Job.objects.filter(status='pendente', agendado_para__lte=agora)
+        .order_by('agendado_para', 'id')
+        .values_list('id', flat=True)[:limite]
+    )
+    for job_id in list(candidatas):
+        reservada = Job.objects.filter(pk=job_id, status='pendente').update(
+            status='executando', iniciado_em=agora, tentativas=F('tentativas') + 1, atualizado_em=agora,
+        )
+        if reservada:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def _repetir_se_marcada(job_id, **campos):
+    """Devolve à fila (do zero) a tarefa marcada para ``repetir``; retorna se havia a marca"""
+    from .models import Job
+
+    agora = timezone.now()
+    return bool(Job.objects.filter(pk=job_id, repetir=True).update(
+        status='pendente', repetir=False, tentativas=0, agendado_para=agora, atualizado_em=agora, **campos,
+    ))
+
+
+def executar(job):
+    """Executa uma tarefa já reservada e grava o resultado"""
+    from .models import Job
+
+    config = _config()
+    agora = timezone.now
+    try:
+        handler = _handlers[job.tipo]
+        handler(**job.payload)
+    except Exception:
+        erro = traceback.format_exc()
+        logger.warning('Tarefa %s falhou (tentativa %s)', job, job.tentativas, exc_info=True)
+        if job.tentativas >= config['MAX_TENTATIVAS']:
+            campos = {'status': 'falhou', 'concluido_em': agora()}
+        else:
+            espera = min(BACKOFF_BASE * 2 ** (job.tentativas - 1), BACKOFF_MAXIMO)
+            campos = {'status': 'pendente', 'agendado_para': agora() + timedelta(seconds=espera)}
+        if not Job.objects.filter(pk=job.pk, repetir=False).update(erro=erro, atualizado_em=agora(), **campos):
+            _repetir_se_marcada(job.pk, erro=erro)
+        return False
+    # A marca de repetir só é gravada com a tarefa em execução: um dos dois updates sempre casa
+    if not Job.objects.filter(pk=job.pk, repetir=False).update(
+        status='concluida', erro='', concluido_em=agora(), atualizado_em=agora(),
+    ):
+        _repetir_se_marcada(job.pk, erro='')
+    return True
+
+
+def executar_pendente(job_id):
+    """Reserva e executa uma tarefa específica (modo EAGER e ação do admin)"""
+    from .models import Job
+
+    agora = timezone.now()
+    reservada = Job.objects.filter(pk=job_id, status='pendente').update(
+        status='executando', iniciado_em=agora, tentativas=F('tentativas') + 1, atualizado_em=agora,
+    )
+    if reservada:
+        return executar(Job.objects.get(pk=job_id))
+    return None
+
+
+def recuperar_travadas():
+    """Devolve à fila tarefas em execução há mais de ``TIMEOUT`` segundos"""
+    from .models import Job
+
+    limite = timezone.now() - timedelta(seconds=_config()['TIMEOUT'])
+    return Job.objects.filter(status='executando', iniciado_em__lt=limite).update(
+        status='pendente', repetir=False, agendado_para=timezone.now(), atualizado_em=timezone.now(),
+    )
+
+
+class Worker:
+    """Consome a fila com ``threads`` threads até ``parar()`` ser chamado"""
+
+    def __init__(self, threads=None, intervalo=None):
+        config = _config()
+        self.threads = threads or config['WORKERS']
+        self.intervalo = config['POLL_INTERVAL'] if intervalo is None else intervalo
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._ultima_recuperacao = 0.0
+        self.executadas = 0
+        self.falhas = 0
+
+    def parar(self):
+        self._parar.set()
+
+    def _contar(self, sucesso):
+        with self._lock:
+            if sucesso:
+                self.executadas += 1
+            else:
+                self.falhas += 1
+
+    def _recuperar(self):
+        with self._lock:
+            if time.monotonic() - self._ultima_recuperacao < INTERVALO_RECUPERACAO:
+                return
+            self._ultima_recuperacao = time.monotonic()
+        recuperadas = recuperar_travadas()
+        if recuperadas:
+            logger.warning('%s tarefas travadas voltaram para a fila', recuperadas)
+
+    def _loop(self, ate_esvaziar):
+        try:
+            while not self._parar.is_set():
+                close_old_connections()
+                job = reservar()
+                if job is None:
+                    if ate_esvaziar:
+                        return
+                    self._recuperar()
+                    self._parar.wait(self.intervalo)
+                    continue
+                self._contar(executar(job))
+        finally:
+            connection.close()
+
+    def executar(self, ate_esvaziar=False):
+        """Bloqueia até ``parar()`` (ou até a fila esvaziar, com ``ate_esvaziar``)"""
+        self._recuperar()
+        threads = [
+            threading.Thread(target=self._loop, args=(ate_esvaziar,), name=f'nfc-job-{n}', daemon=True)
+            for n in range(self.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+
+
+# Handlers
+
+# Campos de imagem processados por "imagem.processar"
+CAMPOS_IMAGEM = {
+    'nfc_cards.person': 'foto',
+    'nfc_cards.pet': 'foto',
+    'nfc_cards.empresa': 'logo',
+}
+
+
+def _trocar_arquivo(antigo, novo, modelo=None, pk=None):
+    """Aponta o registro de ``antigo`` para ``novo`` e só então apaga ``antigo``.
+
+    Retorna False (e apaga ``novo``) se nenhum registro usa mais ``antigo``.
+    """
+    from django.apps import apps
+    from django.core.files.storage import default_storage
+
+    from .models import NFCCard
+    from .serializers import atualizar_snapshots, snapshot_ativo
+
+    # Tarefas enfileiradas antes de ``modelo``/``pk`` existirem procuram pelo nome
+    modelos = [modelo] if modelo else list(CAMPOS_IMAGEM)
+    trocados = []
+    for rotulo in modelos:
+        campo = CAMPOS_IMAGEM[rotulo]
+        registros = apps.get_model(rotulo).objects.filter(**{campo: antigo})
+        if modelo and pk is not None:
+            registros = registros.filter(pk=pk)
+        ids = list(registros.values_list('pk', flat=True))
+        # update() não dispara os sinais, que enfileirariam o arquivo novo de novo
+        if ids and registros.filter(pk__in=ids).update(**{campo: novo, 'atualizado_em': timezone.now()}):
+            trocados.append((rotulo, ids))
+    if not trocados:
+        # A imagem foi substituída enquanto a tarefa rodava
+        default_storage.delete(novo)
+        return False
+    default_storage.delete(antigo)
+    if snapshot_ativo():
+        for rotulo, ids in trocados:
+            if rotulo == 'nfc_cards.person':
+                atualizar_snapshots(NFCCard.objects.filter(pessoa_id__in=ids))
+            elif rotulo == 'nfc_cards.pet':
+                atualizar_snapshots(NFCCard.objects.filter(pet_id__in=ids))
+    return True
+
+
+@tarefa('imagem.processar')
+def processar_imagem(nome, empresa_id=None, modelo=None, pk=None):
+    """Remove metadados EXIF do original e gera as variantes redimensionadas"""
+    from . import images, page_cache
+    from .models import Empresa
+
+    limpo = images.remover_exif(nome)
+    if limpo:
+        if not _trocar_arquivo(nome, limpo, modelo, pk):
+            return
+        nome = limpo
+    images.gerar_derivados(nome)
+    # As páginas em cache ainda apontam para o original
+    if empresa_id:
+        page_cache.invalidar_empresas(Empresa.objects.filter(pk=empresa_id).values_list('slug', flat=True))
+
+
+@tarefa('qr.renderizar')
+def renderizar_qr(cartao_id):
+    from .models import NFCCard
+
+    cartao = NFCCard.objects.select_related('empresa').filter(pk=cartao_id).first()
+    if cartao is None:
+        return
+    cartao.generate_qr_code()
+    NFCCard.objects.filter(pk=cartao.pk).update(qr_code=cartao.qr_code.name, qr_fingerprint=cartao.qr_fingerprint)
+
+
+@tarefa('api.snapshots')
+def atualizar_snapshots_empresa(empresa_id):
+    from .models import NFCCard
+    from .serializers import atualizar_snapshots
+
+    atualizar_snapshots(NFCCard.objects.filter(empresa_id=empresa_id))
@@ -0,0 +1,127 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from nfc_cards.models import Empresa, NFCCard, Person, Pet
+
+# Modelos cujos Meta.indexes são medidos (com e sem)
+MODELOS_INDICES = (Empresa, Person, Pet, NFCCard)
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria empresas grandes, mede as consultas mais frequentes sem e com os índices '
+        'compostos/parciais e mostra os planos. Tudo é desfeito ao final (transação revertida).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresas', type=int, default=5, help='Empresas criadas (padrão: 5)')
+        parser.add_argument('--pessoas', type=int, default=20000, help='Pessoas por empresa (padrão: 20000)')
+        parser.add_argument('--pets', type=int, default=20000, help='Pets por empresa (padrão: 20000)')
+        parser.add_argument('--repeticoes', type=int, default=20, help='Execuções por consulta (padrão: 20)')
+        parser.add_argument('--sem-plano', action='store_true', help='Não mostra os planos (EXPLAIN)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            inicio = time.monotonic()
+            empresa, codigo = self._popular(options)
+            self.stdout.write(f'Dados criados em {time.monotonic() - inicio:.1f}s.')
+
+            consultas = self._consultas(empresa, codigo)
+            self._remover_indices()
+            self._analisar()
+            antes = self._medir(consultas, options, 'Sem índices')
+            self._criar_indices()
+            self._analisar()
+            depois = self._medir(consultas, options, 'Com índices')
+
+            self.stdout.write('\nResumo (mediana em ms):')
+            for nome in consultas:
+                self.stdout.write(f'  {nome:<28} {antes[nome]:>9.2f} -> {depois[nome]:>9.2f}')
+            transaction.set_rollback(True)
+
+    def _popular(self, options):
+        agora = timezone.now()
+        empresas = Empresa.objects.bulk_create([
+            Empresa(nome=f'Benchmark {numero}', slug=f'benchmark-{numero}-{agora.timestamp():.0f}')
+            for numero in range(options['empresas'])
+        ])
+        for empresa in empresas:
+            pessoas = Person.objects.bulk_create([
+                Person(
+                    empresa=empresa, nome=f'Pessoa {numero:06d}', slug=f'pessoa-{numero}',
+                    email=f'p{numero}@exemplo.com', telefone='0', apresentacao='-',
+                    ativo=numero % 10 != 0,
+                )
+                for numero in range(options['pessoas'])
+            ], batch_size=1000)
+            pets = Pet.objects.bulk_create([
+                Pet(
+                    empresa=empresa, tutor=pessoas[numero % len(pessoas)], nome=f'Pet {numero:06d}',
+                    slug=f'pet-{numero}', especie='cao', ativo=numero % 10 != 0,
+                )
+                for numero in range(options['pets'])
+            ], batch_size=1000) if pessoas else []
+            NFCCard.objects.bulk_create([
+                NFCCard(empresa=empresa, codigo_nfc=f'BENCH{empresa.pk}-{letra}{objeto.pk}', tipo=tipo, **{tipo: objeto})
+                for tipo, letra, objetos in (('pessoa', 'P', pessoas), ('pet', 'T', pets))
+                for objeto in objetos
+            ], batch_size=1000)
+        empresa = empresas[-1]
+        codigo = NFCCard.objects.filter(empresa=empresa, ativo=True).values_list('codigo_nfc', flat=True).last()
+        return empresa, codigo
+
+    def _consultas(self, empresa, codigo):
+        return {
+            'pessoas da empresa (nome)': Person.objects.filter(empresa=empresa, ativo=True).order_by('nome')[:50],
+            'pets da empresa (nome)': Pet.objects.filter(empresa=empresa, ativo=True).order_by('nome')[:50],
+            'pessoas recentes': empresa.pessoas.filter(ativo=True).order_by('-criado_em')[:5],
+            'pets recentes': empresa.pets.filter(ativo=True).order_by('-criado_em')[:5],
+            'total de pessoas ativas': empresa.pessoas.filter(ativo=True),
+            'total de cartões ativos': empresa.cartoes_nfc.filter(ativo=True),
+            'cartão por código': NFCCard.objects.filter(codigo_nfc=codigo, empresa__slug=empresa.slug, ativo=True).order_by(),
+            'empresas ativas': Empresa.objects.filter(ativo=True).order_by('nome'),
+        }
+
+    def _indices(self):
+        for modelo in MODELOS_INDICES:
+            for indice in modelo._meta.indexes:
+                yield modelo, indice
+
+    def _executar_ddl(self, metodo):
+        # SQL gerado direto: o schema editor do SQLite não pode ser aberto dentro de uma transação
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for modelo, indice in self._indices():
+                cursor.execute(str(getattr(indice, metodo)(modelo, editor)))
+
+    def _remover_indices(self):
+        self._executar_ddl('remove_sql')
+
+    def _criar_indices(self):
+        self._executar_ddl('create_sql')
+
+    def _analisar(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _medir(self, consultas, options, titulo):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{titulo}'))
+        medianas = {}
+        for nome, queryset in consultas.items():
+            contagem = nome.startswith('total')
+            tempos = []
+            for _ in range(options['repeticoes']):
+                inicio = time.perf_counter()
+                queryset.count() if contagem else list(queryset.all())
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            medianas[nome] = statistics.median(tempos)
+            self.stdout.write(f'  {nome}: {medianas[nome]:.2f} ms')
+            if not options['sem_plano']:
+                plano = queryset.values('pk').order_by().explain() if contagem else queryset.explain()
+                for linha in plano.splitlines():
+                    self.stdout.write(f'      {linha}')
+        return medianas
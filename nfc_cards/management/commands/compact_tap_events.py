@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from nfc_cards.analytics import ATRASO_SEGURANCA, compactar_toques, podar_eventos
+
+
+class Command(BaseCommand):
+    help = 'Consolida os toques NFC brutos nos resumos por hora/dia e remove eventos antigos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=20000,
+                            help='Eventos consolidados por transação (padrão: 20000)')
+        parser.add_argument('--atraso', type=int, default=ATRASO_SEGURANCA,
+                            help=f'Ignora toques mais novos que estes segundos, ainda sendo gravados (padrão: {ATRASO_SEGURANCA})')
+        parser.add_argument('--retencao-dias', type=int, default=90,
+                            help='Dias de eventos brutos mantidos após a consolidação (padrão: 90; 0 desativa a poda)')
+
+    def handle(self, *args, **options):
+        eventos, resumos = compactar_toques(tamanho_lote=options['lote'], atraso=options['atraso'])
+        self.stdout.write(f'{eventos} toques consolidados em {resumos} resumos.')
+
+        if options['retencao_dias'] > 0:
+            removidos = podar_eventos(options['retencao_dias'])
+            self.stdout.write(f'{removidos} toques brutos removidos.')
+
+        self.stdout.write(self.style.SUCCESS('Compactação concluída.'))
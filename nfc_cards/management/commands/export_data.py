@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nfc_cards.exports import CONJUNTOS, exportar, formatos_do_conjunto, nome_arquivo
+from nfc_cards.models import Empresa
+
+
+class Command(BaseCommand):
+    help = 'Exporta pessoas, pets ou cartões de uma empresa em CSV, JSONL ou zip de vCards (pessoas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('empresa', help='Slug da empresa')
+        parser.add_argument('conjunto', choices=sorted(CONJUNTOS))
+        parser.add_argument('--formato', default='csv', choices=['csv', 'jsonl', 'vcf.zip'])
+        parser.add_argument('--saida', help='Arquivo de saída (padrão: <empresa>-<conjunto>.<formato>; "-" para stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            empresa = Empresa.objects.get(slug=options['empresa'])
+        except Empresa.DoesNotExist:
+            raise CommandError(f'Empresa "{options["empresa"]}" não encontrada.')
+        conjunto, formato = options['conjunto'], options['formato']
+        if formato not in formatos_do_conjunto(conjunto):
+            raise CommandError(f'O formato {formato} não está disponível para {conjunto}.')
+
+        caminho = options['saida'] or nome_arquivo(empresa, conjunto, formato)
+        destino = sys.stdout.buffer if caminho == '-' else open(caminho, 'wb')
+        total = 0
+        try:
+            for pedaco in exportar(empresa, conjunto, formato):
+                if isinstance(pedaco, str):
+                    pedaco = pedaco.encode('utf-8')
+                destino.write(pedaco)
+                total += len(pedaco)
+        finally:
+            if destino is not sys.stdout.buffer:
+                destino.close()
+
+        if caminho != '-':
+            self.stdout.write(self.style.SUCCESS(f'{caminho} gravado ({total} bytes).'))
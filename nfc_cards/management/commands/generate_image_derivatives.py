@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from nfc_cards.images import derivados_pendentes, gerar_derivados_seguro
+from nfc_cards.models import Empresa, Person, Pet
+from nfc_cards.utils import iterar_em_lotes
+
+
+class Command(BaseCommand):
+    help = 'Gera as variantes (thumb, card, full em WebP/JPEG) das fotos e logos já enviados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forcar', action='store_true', help='Regera mesmo as variantes que já existem')
+        parser.add_argument('--lote', type=int, default=500, help='Registros lidos por consulta (padrão: 500)')
+
+    def handle(self, *args, **options):
+        fontes = (
+            (Person, 'foto'),
+            (Pet, 'foto'),
+            (Empresa, 'logo'),
+        )
+        gerados = falhas = 0
+        for modelo, campo in fontes:
+            registros = modelo.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True}).only('pk', campo)
+            for lote in iterar_em_lotes(registros, options['lote']):
+                for registro in lote:
+                    arquivo = getattr(registro, campo)
+                    if not options['forcar'] and not derivados_pendentes(arquivo):
+                        continue
+                    if gerar_derivados_seguro(arquivo):
+                        gerados += 1
+                    else:
+                        falhas += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Variantes geradas para {gerados} imagens ({falhas} falhas).'))
@@ -0,0 +1,96 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nfc_cards.imports import FORMATOS, Importador, detectar_formato, ler_linhas
+from nfc_cards.models import Empresa
+from nfc_cards.provisioning import ESQUEMAS, renderizar_qr_codes
+
+
+class Command(BaseCommand):
+    help = 'Importa pessoas e pets de uma empresa a partir de CSV ou JSONL (colunas como em export_data)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('empresa', help='Slug da empresa')
+        parser.add_argument('--pessoas', help='Arquivo de pessoas')
+        parser.add_argument('--pets', help='Arquivo de pets (tutor por tutor_slug ou tutor_email)')
+        parser.add_argument('--formato', choices=FORMATOS, help='Formato dos arquivos (padrão: pela extensão)')
+        parser.add_argument('--lote', type=int, default=500, help='Linhas por INSERT/transação (padrão: 500)')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas valida, sem gravar')
+        parser.add_argument('--relatorio', help='Grava as linhas com erro em um CSV (arquivo, linha, erro)')
+        parser.add_argument('--cartoes', action='store_true', help='Cria um cartão NFC para cada registro importado')
+        parser.add_argument('--esquema', choices=ESQUEMAS, default='aleatorio')
+        parser.add_argument('--prefixo', default='', help='Prefixo dos códigos dos cartões')
+        parser.add_argument('--tamanho', type=int, default=8, help='Tamanho do sufixo dos códigos (padrão: 8)')
+        parser.add_argument('--sem-qr', action='store_true', help='Não gera os QR codes dos cartões agora')
+
+    def handle(self, *args, **options):
+        try:
+            empresa = Empresa.objects.get(slug=options['empresa'])
+        except Empresa.DoesNotExist:
+            raise CommandError(f'Empresa "{options["empresa"]}" não encontrada.')
+        if not (options['pessoas'] or options['pets']):
+            raise CommandError('Informe --pessoas e/ou --pets.')
+
+        arquivos = {}
+        try:
+            for conjunto in ('pessoas', 'pets'):
+                if options[conjunto]:
+                    arquivos[conjunto] = open(options[conjunto], 'rb')
+        except OSError as erro:
+            raise CommandError(str(erro))
+
+        inicio = time.monotonic()
+        importador = Importador(empresa, lote=options['lote'], dry_run=options['dry_run'])
+        try:
+            for conjunto, arquivo in arquivos.items():
+                formato = options['formato'] or detectar_formato(arquivo.name)
+                importador.importar(ler_linhas(arquivo, formato), conjunto)
+            cartoes = []
+            if options['cartoes']:
+                cartoes = importador.provisionar_cartoes(
+                    esquema=options['esquema'], prefixo=options['prefixo'], tamanho=options['tamanho'],
+                )
+        except ValueError as erro:
+            raise CommandError(str(erro))
+        finally:
+            for arquivo in arquivos.values():
+                arquivo.close()
+        resultados = importador.finalizar()
+
+        relatorio = []
+        for conjunto, arquivo in arquivos.items():
+            self._resumo(conjunto, resultados[conjunto], options['dry_run'])
+            relatorio.extend((arquivo.name, linha, mensagem) for linha, mensagem in resultados[conjunto]['erros'])
+        self.stdout.write(f'Tempo: {time.monotonic() - inicio:.1f}s.')
+
+        if cartoes and not options['sem_qr']:
+            estatisticas = renderizar_qr_codes(cartoes)
+            self.stdout.write(
+                f'{estatisticas["total"]} QR codes gerados em {estatisticas["segundos"]:.1f}s.'
+            )
+
+        if options['relatorio'] and relatorio:
+            with open(options['relatorio'], 'w', newline='', encoding='utf-8') as saida:
+                escritor = csv.writer(saida)
+                escritor.writerow(['arquivo', 'linha', 'erro'])
+                escritor.writerows(relatorio)
+            self.stdout.write(f'Relatório de erros gravado em {options["relatorio"]}.')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry-run: nada foi gravado.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Importação concluída.'))
+
+    def _resumo(self, conjunto, resultado, dry_run):
+        acao = 'válidas' if dry_run else 'importadas'
+        self.stdout.write(
+            f'{conjunto}: {resultado["criados"]} de {resultado["linhas"]} linhas {acao}, '
+            f'{resultado["total_erros"]} com erro'
+            + (f', {resultado["cartoes"]} cartões criados.' if resultado['cartoes'] else '.')
+        )
+        for linha, mensagem in resultado['erros'][:20]:
+            self.stderr.write(f'  linha {linha}: {mensagem}')
+        if resultado['total_erros'] > 20:
+            self.stderr.write(f'  … e mais {resultado["total_erros"] - 20} (use --relatorio).')
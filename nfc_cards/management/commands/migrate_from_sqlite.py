@@ -0,0 +1,135 @@
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from nfc_cards import search
+
+# Alias da conexão de leitura do arquivo SQLite (registrada só durante o comando)
+ORIGEM = 'sqlite_origem'
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia todos os dados de um banco SQLite para o banco configurado em DATABASE_URL '
+        '(ex.: PostgreSQL), em lotes: COPY no PostgreSQL, INSERT em lote nos demais. '
+        'O destino precisa estar migrado e tem os dados substituídos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('origem', nargs='?', default=str(settings.BASE_DIR / 'db.sqlite3'),
+                            help='Arquivo SQLite de origem (padrão: db.sqlite3 do projeto)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Banco de destino (padrão: default)')
+        parser.add_argument('--lote', type=int, default=5000, help='Linhas lidas e gravadas por vez (padrão: 5000)')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Não pede confirmação antes de substituir os dados do destino')
+
+    def handle(self, *args, **options):
+        caminho = Path(options['origem']).resolve()
+        if not caminho.exists():
+            raise CommandError(f'Arquivo "{caminho}" não encontrado.')
+        destino = connections[options['database']]
+        if destino.vendor == 'sqlite' and Path(destino.settings_dict['NAME']).resolve() == caminho:
+            raise CommandError('A origem é o próprio banco de destino.')
+
+        origem = self._conectar_origem(caminho)
+        try:
+            self._migrar(origem, destino, caminho, options)
+        finally:
+            origem.close()
+            del connections[ORIGEM]
+            del connections.settings[ORIGEM]
+
+    def _migrar(self, origem, destino, caminho, options):
+        modelos = self._modelos(origem, destino)
+        if options['interactive']:
+            resposta = input(
+                f'Os dados de {len(modelos)} tabelas em "{options["database"]}" ({destino.vendor}) '
+                f'serão substituídos pelos de {caminho}. Continuar? [s/N] '
+            )
+            if resposta.strip().lower() not in ('s', 'sim'):
+                raise CommandError('Cancelado.')
+
+        inicio = time.monotonic()
+        total = 0
+        with transaction.atomic(using=destino.alias):
+            # As FKs do Django são DEFERRABLE INITIALLY DEFERRED: a ordem das tabelas não importa
+            with destino.cursor() as cursor:
+                tabelas = [modelo._meta.db_table for modelo in modelos]
+                for sql in destino.ops.sql_flush(no_style(), tabelas, allow_cascade=True):
+                    cursor.execute(sql)
+            for modelo in modelos:
+                copiadas = self._copiar(modelo, origem, destino, options['lote'])
+                total += copiadas
+                self.stdout.write(f'  {modelo._meta.db_table}: {copiadas}')
+            with destino.cursor() as cursor:
+                for sql in destino.ops.sequence_reset_sql(no_style(), modelos):
+                    cursor.execute(sql)
+
+        if destino.alias == DEFAULT_DB_ALIAS:
+            self.stdout.write(f'Índice de busca: {search.reconstruir()} registros.')
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} linhas copiadas de {len(modelos)} tabelas em {time.monotonic() - inicio:.1f}s.'
+        ))
+
+    def _conectar_origem(self, caminho):
+        # configure_settings completa as chaves padrão (exige um "default", descartado aqui)
+        connections.settings[ORIGEM] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: {},
+            ORIGEM: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(caminho)},
+        })[ORIGEM]
+        return connections[ORIGEM]
+
+    def _modelos(self, origem, destino):
+        tabelas_origem = set(origem.introspection.table_names())
+        tabelas_destino = set(destino.introspection.table_names())
+        modelos = []
+        for modelo in apps.get_models(include_auto_created=True):
+            tabela = modelo._meta.db_table
+            if not modelo._meta.managed or modelo._meta.proxy or tabela not in tabelas_origem:
+                continue
+            if tabela not in tabelas_destino:
+                raise CommandError(f'Tabela "{tabela}" não existe no destino: rode "migrate" antes.')
+            with origem.cursor() as cursor:
+                colunas = {coluna.name for coluna in origem.introspection.get_table_description(cursor, tabela)}
+            faltando = [campo.column for campo in modelo._meta.concrete_fields if campo.column not in colunas]
+            if faltando:
+                raise CommandError(
+                    f'Tabela "{tabela}" da origem sem as colunas {", ".join(faltando)}: rode "migrate" na origem antes.'
+                )
+            modelos.append(modelo)
+        return modelos
+
+    def _copiar(self, modelo, origem, destino, lote):
+        campos = modelo._meta.concrete_fields
+        registros = modelo._base_manager.using(origem.alias).order_by('pk').values_list(*[campo.attname for campo in campos])
+        indice_pk = [campo.attname for campo in campos].index(modelo._meta.pk.attname)
+        total, ultimo = 0, None
+        while True:
+            # Paginação por chave: cada lote é uma consulta independente e de custo constante
+            pagina = registros if ultimo is None else registros.filter(pk__gt=ultimo)
+            linhas = list(pagina[:lote])
+            if not linhas:
+                return total
+            self._gravar(modelo, campos, linhas, destino)
+            total += len(linhas)
+            ultimo = linhas[-1][indice_pk]
+
+    def _gravar(self, modelo, campos, linhas, destino):
+        valores = [[campo.get_db_prep_save(valor, destino) for campo, valor in zip(campos, linha)] for linha in linhas]
+        tabela = destino.ops.quote_name(modelo._meta.db_table)
+        colunas = ', '.join(destino.ops.quote_name(campo.column) for campo in campos)
+        with destino.cursor() as cursor:
+            bruto = cursor.cursor
+            if destino.vendor == 'postgresql' and hasattr(bruto, 'copy'):
+                # psycopg 3: COPY FROM STDIN, sem um INSERT por linha
+                with bruto.copy(f'COPY {tabela} ({colunas}) FROM STDIN') as copia:
+                    for linha in valores:
+                        copia.write_row(linha)
+            else:
+                marcadores = ', '.join(['%s'] * len(campos))
+                cursor.executemany(f'INSERT INTO {tabela} ({colunas}) VALUES ({marcadores})', valores)
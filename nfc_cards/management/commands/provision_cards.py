@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nfc_cards.models import Empresa, NFCCard
+from nfc_cards.provisioning import ESQUEMAS, provisionar_cartoes, renderizar_qr_codes
+
+
+class Command(BaseCommand):
+    help = 'Cria cartões NFC em lote (sem vínculo) para uma empresa'
+
+    def add_arguments(self, parser):
+        parser.add_argument('empresa', help='Slug da empresa')
+        parser.add_argument('quantidade', type=int, help='Quantidade de cartões')
+        parser.add_argument('--tipo', choices=[tipo for tipo, _ in NFCCard.TIPOS], default='pessoa')
+        parser.add_argument('--esquema', choices=ESQUEMAS, default='aleatorio',
+                            help='aleatorio: sufixo aleatório; sequencial: numeração contínua por prefixo')
+        parser.add_argument('--prefixo', default='', help='Prefixo dos códigos (ex.: ACME-)')
+        parser.add_argument('--tamanho', type=int, default=8, help='Tamanho do sufixo (padrão: 8)')
+        parser.add_argument('--lote', type=int, default=1000, help='Linhas por INSERT (padrão: 1000)')
+        parser.add_argument('--sem-qr', action='store_true', help='Não gera os QR codes agora')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processos para gerar os QR codes (padrão: número de CPUs)')
+
+    def handle(self, *args, **options):
+        try:
+            empresa = Empresa.objects.get(slug=options['empresa'])
+        except Empresa.DoesNotExist:
+            raise CommandError(f'Empresa "{options["empresa"]}" não encontrada.')
+        if options['quantidade'] <= 0:
+            raise CommandError('A quantidade deve ser maior que zero.')
+        if options['tamanho'] < 4:
+            raise CommandError('O tamanho do sufixo deve ser de pelo menos 4 caracteres.')
+
+        inicio = time.monotonic()
+        try:
+            cartoes = provisionar_cartoes(
+                empresa, options['quantidade'], tipo=options['tipo'], esquema=options['esquema'],
+                prefixo=options['prefixo'], tamanho=options['tamanho'], lote=options['lote'],
+            )
+        except ValueError as erro:
+            raise CommandError(str(erro))
+        self.stdout.write(
+            f'{len(cartoes)} cartões criados em {time.monotonic() - inicio:.1f}s '
+            f'({cartoes[0].codigo_nfc} … {cartoes[-1].codigo_nfc}).'
+        )
+
+        if not options['sem_qr']:
+            estatisticas = renderizar_qr_codes(cartoes, workers=options['workers'])
+            self.stdout.write(
+                f'{estatisticas["total"]} QR codes gerados em {estatisticas["segundos"]:.1f}s '
+                f'({estatisticas["por_segundo"]:.0f} códigos/s).'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Provisionamento concluído.'))
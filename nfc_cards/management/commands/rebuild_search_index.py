@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from nfc_cards import search
+from nfc_cards.models import Empresa
+
+
+class Command(BaseCommand):
+    help = 'Recria o índice de busca textual de pessoas e pets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', help='Slug da empresa (padrão: todas)')
+        parser.add_argument('--lote', type=int, default=1000, help='Registros lidos por consulta (padrão: 1000)')
+
+    def handle(self, *args, **options):
+        if search.backend() is None:
+            self.stdout.write(self.style.WARNING('Banco sem índice de busca; a busca usa icontains.'))
+            return
+
+        empresa_id = None
+        if options['empresa']:
+            try:
+                empresa_id = Empresa.objects.get(slug=options['empresa']).pk
+            except Empresa.DoesNotExist:
+                raise CommandError(f'Empresa "{options["empresa"]}" não encontrada.')
+
+        with transaction.atomic():
+            total = search.reconstruir(empresa_id, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} registros indexados.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from nfc_cards.counters import reconciliar
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores de pessoas, pets e cartões ativos e corrige desvios'
+
+    def handle(self, *args, **options):
+        divergentes = reconciliar()
+        for chave, antes, depois in divergentes:
+            self.stdout.write(f'  {chave}: {antes or "ausente"} -> {depois or "removido"}')
+        self.stdout.write(self.style.SUCCESS(f'Contadores reconciliados ({len(divergentes)} corrigidos).'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from nfc_cards.models import Empresa, NFCCard
+from nfc_cards.serializers import atualizar_snapshots, snapshot_ativo
+
+
+class Command(BaseCommand):
+    help = 'Regrava o snapshot JSON da API (NFCCard.payload_json) dos cartões'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', help='Slug da empresa (padrão: todas)')
+        parser.add_argument('--lote', type=int, default=500, help='Cartões lidos por consulta (padrão: 500)')
+
+    def handle(self, *args, **options):
+        if not snapshot_ativo():
+            self.stdout.write(self.style.WARNING('NFC_API_SNAPSHOT está desativado; a API não usará os snapshots.'))
+
+        cartoes = NFCCard.objects.all()
+        if options['empresa']:
+            try:
+                empresa = Empresa.objects.get(slug=options['empresa'])
+            except Empresa.DoesNotExist:
+                raise CommandError(f'Empresa "{options["empresa"]}" não encontrada.')
+            cartoes = cartoes.filter(empresa=empresa)
+
+        total = atualizar_snapshots(cartoes, lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} snapshots atualizados.'))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from nfc_cards.models import Empresa, NFCCard
+from nfc_cards.qr import QRRenderEngine
+from nfc_cards.utils import iterar_em_lotes
+
+
+class Command(BaseCommand):
+    help = 'Gera os QR codes dos cartões NFC em paralelo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', help='Slug da empresa (padrão: todas)')
+        parser.add_argument('--todos', action='store_true',
+                            help='Confere todos os cartões, regerando os que mudaram (padrão: apenas os ausentes)')
+        parser.add_argument('--forcar', action='store_true',
+                            help='Ignora o fingerprint gravado e reatribui o QR de todos os cartões selecionados')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processos de renderização (padrão: número de CPUs)')
+        parser.add_argument('--lote', type=int, default=500, help='Cartões por lote (padrão: 500)')
+
+    def handle(self, *args, **options):
+        cartoes = NFCCard.objects.select_related('empresa').only('id', 'codigo_nfc', 'qr_code', 'qr_fingerprint', 'empresa__slug')
+        if options['empresa']:
+            try:
+                empresa = Empresa.objects.get(slug=options['empresa'])
+            except Empresa.DoesNotExist:
+                raise CommandError(f'Empresa "{options["empresa"]}" não encontrada.')
+            cartoes = cartoes.filter(empresa=empresa)
+        if not options['todos']:
+            cartoes = cartoes.filter(Q(qr_code='') | Q(qr_code__isnull=True))
+
+        total = cartoes.count()
+        if not total:
+            self.stdout.write('Nenhum QR code para gerar.')
+            return
+
+        def progresso(feitos, decorrido):
+            taxa = feitos / decorrido if decorrido else 0
+            self.stdout.write(f'{feitos}/{total} ({taxa:.0f} códigos/s)')
+
+        engine = QRRenderEngine(workers=options['workers'])
+        self.stdout.write(f'Processando {total} cartões com {engine.workers} processo(s)...')
+        estatisticas = engine.renderizar(
+            iterar_em_lotes(cartoes, options['lote']), progresso=progresso, forcar=options['forcar'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{estatisticas["total"]} cartões em {estatisticas["segundos"]:.1f}s '
+            f'({estatisticas["por_segundo"]:.0f} códigos/s): {estatisticas["renderizados"]} renderizados, '
+            f'{estatisticas["reaproveitados"]} reaproveitados, {estatisticas["em_dia"]} já em dia.'
+        ))
@@ -0,0 +1,32 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from nfc_cards.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = ('Executa as tarefas em segundo plano (imagens, QR codes) da fila guardada no banco. '
+            'Pode rodar em vários processos ao mesmo tempo.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None,
+                            help='Threads de execução (padrão: NFC_JOBS["WORKERS"])')
+        parser.add_argument('--ate-esvaziar', action='store_true',
+                            help='Encerra quando não houver mais tarefas disponíveis')
+
+    def handle(self, *args, **options):
+        worker = Worker(threads=options['threads'])
+
+        def encerrar(signum, frame):
+            self.stdout.write('Encerrando após as tarefas em andamento...')
+            worker.parar()
+
+        signal.signal(signal.SIGINT, encerrar)
+        signal.signal(signal.SIGTERM, encerrar)
+
+        self.stdout.write(f'Worker iniciado com {worker.threads} threads.')
+        worker.executar(ate_esvaziar=options['ate_esvaziar'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{worker.executadas} tarefas executadas, {worker.falhas} falhas.'
+        ))
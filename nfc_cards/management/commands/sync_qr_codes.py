@@ -0,0 +1,65 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nfc_cards.models import Empresa, NFCCard
+from nfc_cards.qr import QRRenderEngine, qr_desatualizado
+from nfc_cards.utils import iterar_em_lotes
+
+
+class Command(BaseCommand):
+    help = ('Detecta cartões cujo QR code não corresponde mais à URL atual '
+            '(SITE_URL ou slug da empresa alterados) e regera apenas esses')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', help='Slug da empresa (padrão: todas)')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas informa quantos cartões estão desatualizados')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processos de renderização (padrão: número de CPUs)')
+        parser.add_argument('--lote', type=int, default=1000, help='Cartões lidos por consulta (padrão: 1000)')
+
+    def handle(self, *args, **options):
+        cartoes = NFCCard.objects.select_related('empresa').only(
+            'id', 'codigo_nfc', 'qr_code', 'qr_fingerprint', 'empresa__slug'
+        )
+        if options['empresa']:
+            try:
+                empresa = Empresa.objects.get(slug=options['empresa'])
+            except Empresa.DoesNotExist:
+                raise CommandError(f'Empresa "{options["empresa"]}" não encontrada.')
+            cartoes = cartoes.filter(empresa=empresa)
+
+        conferidos = 0
+        por_empresa = Counter()
+
+        def desatualizados():
+            nonlocal conferidos
+            for lote in iterar_em_lotes(cartoes, options['lote']):
+                conferidos += len(lote)
+                pendentes = [cartao for cartao in lote if qr_desatualizado(cartao)]
+                por_empresa.update(cartao.empresa.slug for cartao in pendentes)
+                if pendentes:
+                    yield pendentes
+
+        if options['dry_run']:
+            for _ in desatualizados():
+                pass
+        else:
+            engine = QRRenderEngine(workers=options['workers'])
+            estatisticas = engine.renderizar(
+                desatualizados(),
+                progresso=lambda feitos, decorrido: self.stdout.write(f'{feitos} regerados ({conferidos} conferidos)'),
+            )
+
+        total = sum(por_empresa.values())
+        self.stdout.write(f'{conferidos} cartões conferidos, {total} desatualizados.')
+        for slug, quantidade in por_empresa.most_common():
+            self.stdout.write(f'  {slug}: {quantidade}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry-run: nenhum QR code foi alterado.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'{estatisticas["renderizados"]} renderizados, {estatisticas["reaproveitados"]} reaproveitados '
+                f'em {estatisticas["segundos"]:.1f}s.'
+            ))
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nfc_cards', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TapEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_agent', models.CharField(choices=[('android', 'Android'), ('ios', 'iOS'), ('desktop', 'Desktop'), ('bot', 'Robô'), ('outro', 'Outro')], max_length=10, verbose_name='Dispositivo')),
+                ('referencia', models.CharField(choices=[('direto', 'Direto'), ('interno', 'Interno'), ('externo', 'Externo')], max_length=10, verbose_name='Origem')),
+                ('criado_em', models.DateTimeField(verbose_name='Data do toque')),
+                ('cartao', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='toques', to='nfc_cards.nfccard', verbose_name='Cartão')),
+                ('empresa', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='toques', to='nfc_cards.empresa', verbose_name='Empresa')),
+            ],
+            options={
+                'verbose_name': 'Toque NFC',
+                'verbose_name_plural': 'Toques NFC',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['cartao', 'criado_em'], name='nfc_cards_t_cartao__ebdbe5_idx'), models.Index(fields=['empresa', 'criado_em'], name='nfc_cards_t_empresa_4a45e9_idx')],
+            },
+        ),
+    ]
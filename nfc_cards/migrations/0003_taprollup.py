@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nfc_cards', '0002_tapevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TapRollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=50, unique=True)),
+                ('ultimo_evento_id', models.BigIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de Compactação',
+                'verbose_name_plural': 'Checkpoints de Compactação',
+            },
+        ),
+        migrations.CreateModel(
+            name='TapRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularidade', models.CharField(choices=[('hora', 'Hora'), ('dia', 'Dia')], max_length=4, verbose_name='Granularidade')),
+                ('escopo', models.CharField(choices=[('empresa', 'Empresa'), ('cartao', 'Cartão NFC'), ('pessoa', 'Pessoa'), ('pet', 'Pet')], max_length=10, verbose_name='Escopo')),
+                ('objeto_id', models.CharField(max_length=36, verbose_name='Objeto')),
+                ('inicio', models.DateTimeField(verbose_name='Início do período')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Toques')),
+                ('empresa', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='rollups_toques', to='nfc_cards.empresa', verbose_name='Empresa')),
+            ],
+            options={
+                'verbose_name': 'Resumo de Toques',
+                'verbose_name_plural': 'Resumos de Toques',
+                'ordering': ['-inicio'],
+                'indexes': [models.Index(fields=['empresa', 'escopo', 'granularidade', 'inicio'], name='nfc_cards_t_empresa_918e62_idx')],
+                'unique_together': {('granularidade', 'escopo', 'objeto_id', 'inicio')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nfc_cards', '0003_taprollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nfccard',
+            name='qr_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Fingerprint do QR Code'),
+        ),
+    ]
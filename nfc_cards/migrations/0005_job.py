@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:37
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nfc_cards', '0004_nfccard_qr_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50, verbose_name='Tipo')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Parâmetros')),
+                ('chave', models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='Chave de Idempotência')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='pendente', max_length=20, verbose_name='Status')),
+                ('tentativas', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('erro', models.TextField(blank=True, verbose_name='Último Erro')),
+                ('agendado_para', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Agendado Para')),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Tarefa',
+                'verbose_name_plural': 'Tarefas',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'agendado_para'], name='nfc_cards_j_status_70ae2f_idx')],
+            },
+        ),
+    ]
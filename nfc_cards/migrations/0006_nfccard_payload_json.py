@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nfc_cards', '0005_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='nfccard',
+            name='payload_json',
+            field=models.TextField(blank=True, editable=False, verbose_name='Snapshot JSON da API'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nfc_cards', '0006_nfccard_payload_json'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='empresa',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['nome'], name='empresa_ativa_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nfccard',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['empresa', '-criado_em'], name='nfccard_ativo_recentes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['empresa', 'nome'], name='person_ativa_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['empresa', '-criado_em'], name='person_ativa_recentes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['empresa', 'nome'], name='pet_ativo_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['empresa', '-criado_em'], name='pet_ativo_recentes_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nfc_cards', '0007_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=50, unique=True, verbose_name='Chave')),
+                ('pessoas', models.IntegerField(default=0, verbose_name='Pessoas ativas')),
+                ('pets', models.IntegerField(default=0, verbose_name='Pets ativos')),
+                ('cartoes', models.IntegerField(default=0, verbose_name='Cartões ativos')),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contador',
+                'verbose_name_plural': 'Contadores',
+                'ordering': ['chave'],
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+import unicodedata
+
+from django.db import migrations
+
+# Cópia congelada do DDL e da indexação de nfc_cards/search.py no momento desta
+# migração: mudanças futuras naquele módulo não alteram o que ela executa.
+TABELA = 'nfc_cards_busca'
+
+CRIAR_SQL = {
+    'sqlite': [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA} USING fts5("
+        "empresa, tipo, texto, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    ],
+    'postgresql': [
+        f'CREATE TABLE IF NOT EXISTS {TABELA} ('
+        'rowid bigint PRIMARY KEY, empresa_id bigint NOT NULL, tipo varchar(10) NOT NULL, documento tsvector NOT NULL)',
+        f'CREATE INDEX IF NOT EXISTS {TABELA}_documento_idx ON {TABELA} USING GIN (documento)',
+        f'CREATE INDEX IF NOT EXISTS {TABELA}_empresa_tipo_idx ON {TABELA} (empresa_id, tipo)',
+    ],
+}
+
+INSERIR_SQL = {
+    'sqlite': f'INSERT INTO {TABELA} (rowid, empresa, tipo, texto) VALUES (%s, %s, %s, %s)',
+    'postgresql': (
+        f"INSERT INTO {TABELA} (rowid, empresa_id, tipo, documento) VALUES (%s, %s, %s, to_tsvector('simple', %s)) "
+        f"ON CONFLICT (rowid) DO NOTHING"
+    ),
+}
+
+LOTE = 1000
+
+
+def normalizar(texto):
+    decomposto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def texto(partes):
+    return normalizar(' '.join(parte for parte in partes if parte))
+
+
+def linhas_pessoas(Person, vendor):
+    for pessoa in Person.objects.filter(ativo=True).iterator(chunk_size=LOTE):
+        empresa = f'e{pessoa.empresa_id}' if vendor == 'sqlite' else pessoa.empresa_id
+        partes = (pessoa.nome, pessoa.slug, pessoa.email, pessoa.telefone, pessoa.whatsapp, pessoa.cargo)
+        yield (pessoa.pk * 2, empresa, 'pessoa', texto(partes))
+
+
+def linhas_pets(Pet, vendor):
+    for pet in Pet.objects.filter(ativo=True).select_related('tutor').iterator(chunk_size=LOTE):
+        empresa = f'e{pet.empresa_id}' if vendor == 'sqlite' else pet.empresa_id
+        partes = (pet.nome, pet.slug, pet.get_especie_display(), pet.raca, pet.cor, pet.tutor.nome)
+        yield (pet.pk * 2 + 1, empresa, 'pet', texto(partes))
+
+
+def criar_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in CRIAR_SQL:
+        return
+    for sql in CRIAR_SQL[vendor]:
+        schema_editor.execute(sql)
+    Person = apps.get_model('nfc_cards', 'Person')
+    Pet = apps.get_model('nfc_cards', 'Pet')
+    with schema_editor.connection.cursor() as cursor:
+        for linhas in (linhas_pessoas(Person, vendor), linhas_pets(Pet, vendor)):
+            lote = []
+            for linha in linhas:
+                lote.append(linha)
+                if len(lote) == LOTE:
+                    cursor.executemany(INSERIR_SQL[vendor], lote)
+                    lote = []
+            if lote:
+                cursor.executemany(INSERIR_SQL[vendor], lote)
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor in CRIAR_SQL:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABELA}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nfc_cards', '0008_counter'),
+    ]
+
+    operations = [
+        # Tabela do índice de busca (FTS5 no SQLite, tsvector/GIN no PostgreSQL), já populada com as
+        # pessoas e pets ativos; depois disso os sinais de Person e Pet a mantêm
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nfc_cards', '0009_busca'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='nfccard',
+            name='nfccard_ativo_recentes_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='person',
+            name='person_ativa_nome_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='person',
+            name='person_ativa_recentes_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='pet',
+            name='pet_ativo_nome_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='pet',
+            name='pet_ativo_recentes_idx',
+        ),
+        migrations.AddIndex(
+            model_name='nfccard',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['empresa', '-criado_em', '-id'], name='nfccard_ativo_recentes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['empresa', 'nome', 'id'], name='person_ativa_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['empresa', '-criado_em', '-id'], name='person_ativa_recentes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['empresa', 'nome', 'id'], name='pet_ativo_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['empresa', '-criado_em', '-id'], name='pet_ativo_recentes_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nfc_cards', '0010_indices_paginacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='repetir',
+            field=models.BooleanField(default=False, verbose_name='Repetir ao Concluir'),
+        ),
+    ]
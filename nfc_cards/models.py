@@ -1,16 +1,52 @@
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
+from django.db.backends.signals import connection_created
 from django.dispatch import receiver
 import uuid
-import qrcode
-from io import BytesIO
 from django.conf import settings
-from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models.fields.files import FieldFile
 from PIL import Image
 from django.core.exceptions import ValidationError
+from . import counters, jobs, page_cache, qr, search, slugs, sqlite, tap_cache, tenancy
+
+def _valor_rastreado(valor):
+    # Arquivos são comparados pelo nome gravado no banco
+    return valor.name if isinstance(valor, FieldFile) else valor
+
+class RastreiaCamposMixin:
+    """Guarda os valores carregados do banco para detectar alterações no save"""
+    campos_rastreados = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._registrar_valores_originais()
+        return instance
+
+    def _registrar_valores_originais(self):
+        carregados = self.__dict__
+        self._valores_originais = {
+            campo: _valor_rastreado(carregados[campo]) for campo in self.campos_rastreados if campo in carregados
+        }
+
+    def campo_alterado(self, campo):
+        """Instâncias novas ou com o campo adiado contam como alteradas"""
+        originais = getattr(self, '_valores_originais', {})
+        if campo not in originais:
+            return True
+        return originais[campo] != _valor_rastreado(getattr(self, campo))
+
+    def valor_original(self, campo, padrao=None):
+        return getattr(self, '_valores_originais', {}).get(campo, padrao)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._registrar_valores_originais()
 
 class UserProfile(models.Model):
     """Perfil do usuário conectado a uma empresa"""
@@ -43,7 +79,9 @@ def save_user_profile(sender, instance, **kwargs):
     if hasattr(instance, 'profile'):
         instance.profile.save()
 
-class Empresa(models.Model):
+class Empresa(RastreiaCamposMixin, models.Model):
+    campos_rastreados = ('nome', 'slug', 'ativo', 'logo')
+
     # Informações básicas
     nome = models.CharField(max_length=100, verbose_name="Nome da Empresa")
     slug = models.SlugField(max_length=100, unique=True, verbose_name="Slug")
@@ -71,6 +109,10 @@ class Empresa(models.Model):
         verbose_name = "Empresa"
         verbose_name_plural = "Empresas"
         ordering = ['nome']
+        indexes = [
+            # Lista de empresas ativas na home
+            models.Index(fields=['nome'], condition=models.Q(ativo=True), name='empresa_ativa_nome_idx'),
+        ]
     
     def __str__(self):
         return self.nome
@@ -83,7 +125,9 @@ class Empresa(models.Model):
     def get_absolute_url(self):
         return reverse('empresa_home', kwargs={'empresa_slug': self.slug})
 
-class Person(models.Model):
+class Person(RastreiaCamposMixin, models.Model):
+    campos_rastreados = ('nome', 'slug', 'empresa_id', 'foto', 'ativo')
+
     # Relacionamento com empresa
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='pessoas', verbose_name="Empresa")
     
@@ -124,25 +168,26 @@ class Person(models.Model):
         verbose_name_plural = "Pessoas"
         ordering = ['nome']
         unique_together = ['empresa', 'slug']
+        indexes = [
+            # Listagem (ORDER BY nome, id; ver pagination.py) e contagem das pessoas ativas da empresa
+            models.Index(fields=['empresa', 'nome', 'id'], condition=models.Q(ativo=True), name='person_ativa_nome_idx'),
+            # Pessoas recentes do dashboard e listagem por recentes (ORDER BY -criado_em, -id)
+            models.Index(fields=['empresa', '-criado_em', '-id'], condition=models.Q(ativo=True), name='person_ativa_recentes_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nome} ({self.empresa.nome})"
     
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base_slug = slugify(self.nome)
-            slug = base_slug
-            counter = 1
-            while Person.objects.filter(empresa=self.empresa, slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        # Gerar slug único (ver slugs.py)
+        slugs.salvar_com_slug(self, lambda: super(Person, self).save(*args, **kwargs), self.nome, 'pessoa')
     
     def get_absolute_url(self):
         return reverse('person_detail', kwargs={'empresa_slug': self.empresa.slug, 'person_slug': self.slug})
 
-class Pet(models.Model):
+class Pet(RastreiaCamposMixin, models.Model):
+    campos_rastreados = ('slug', 'empresa_id', 'foto', 'ativo')
+
     ESPECIES = [
         ('cao', 'Cão'),
         ('gato', 'Gato'),
@@ -198,6 +243,10 @@ class Pet(models.Model):
         verbose_name_plural = "Pets"
         ordering = ['nome']
         unique_together = ['empresa', 'slug']
+        indexes = [
+            models.Index(fields=['empresa', 'nome', 'id'], condition=models.Q(ativo=True), name='pet_ativo_nome_idx'),
+            models.Index(fields=['empresa', '-criado_em', '-id'], condition=models.Q(ativo=True), name='pet_ativo_recentes_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nome} ({self.tutor.nome} - {self.empresa.nome})"
@@ -207,16 +256,8 @@ class Pet(models.Model):
         if self.tutor:
             self.empresa = self.tutor.empresa
         
-        # Gerar slug único
-        if not self.slug:
-            base_slug = slugify(self.nome)
-            slug = base_slug
-            counter = 1
-            while Pet.objects.filter(empresa=self.empresa, slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        # Gerar slug único (ver slugs.py)
+        slugs.salvar_com_slug(self, lambda: super(Pet, self).save(*args, **kwargs), self.nome, 'pet')
     
     def get_absolute_url(self):
         return reverse('pet_detail', kwargs={'empresa_slug': self.empresa.slug, 'pet_slug': self.slug})
@@ -229,7 +270,9 @@ class Pet(models.Model):
             return today.year - self.data_nascimento.year - ((today.month, today.day) < (self.data_nascimento.month, self.data_nascimento.day))
         return None
 
-class NFCCard(models.Model):
+class NFCCard(RastreiaCamposMixin, models.Model):
+    campos_rastreados = ('codigo_nfc', 'empresa_id', 'ativo')
+
     TIPOS = [
         ('pessoa', 'Cartão de Visita'),
         ('pet', 'Carteirinha de Pet'),
@@ -249,6 +292,10 @@ class NFCCard(models.Model):
     
     # QR Code para backup
     qr_code = models.ImageField(upload_to='qr_codes/', blank=True, null=True, verbose_name="QR Code")
+    # Hash da URL + parâmetros do QR atual (ver qr.fingerprint_qr)
+    qr_fingerprint = models.CharField(max_length=64, blank=True, editable=False, verbose_name="Fingerprint do QR Code")
+    # JSON pronto da API (ver serializers.py; só com NFC_API_SNAPSHOT)
+    payload_json = models.TextField(blank=True, editable=False, verbose_name="Snapshot JSON da API")
     
     # Metadados
     criado_em = models.DateTimeField(auto_now_add=True)
@@ -259,6 +306,11 @@ class NFCCard(models.Model):
         verbose_name = "Cartão NFC"
         verbose_name_plural = "Cartões NFC"
         ordering = ['-criado_em']
+        # O lookup por código já usa o índice único de codigo_nfc
+        indexes = [
+            # Contagem e listagem dos cartões ativos da empresa
+            models.Index(fields=['empresa', '-criado_em', '-id'], condition=models.Q(ativo=True), name='nfccard_ativo_recentes_idx'),
+        ]
     
     def __str__(self):
         if self.pessoa:
@@ -286,42 +338,333 @@ class NFCCard(models.Model):
         elif self.pet:
             self.empresa = self.pet.empresa
         
-        # Gerar QR Code automaticamente
-        if not self.qr_code:
-            self.generate_qr_code()
+        # Gerar QR Code automaticamente (só renderiza se a URL mudou). Com a
+        # fila assíncrona, a renderização fica para o worker.
+        pendente = self.generate_qr_code(adiar=jobs.assincrono())
         super().save(*args, **kwargs)
+        if pendente:
+            jobs.enfileirar('qr.renderizar', {'cartao_id': str(self.pk)},
+                            chave=f'qr.renderizar:{self.pk}:{pendente}')
     
-    def generate_qr_code(self):
+    def generate_qr_code(self, adiar=False):
         """Gera QR apontando para a rota canônica de redirecionamento por código NFC.
         Mantém o comportamento consistente entre QR e NFC físico.
+
+        Com ``adiar``, não renderiza: retorna o fingerprint pendente se o
+        arquivo ainda não existe no storage.
         """
         if not self.codigo_nfc:
-            return
-
+            return None
+        url = self.get_qr_url()
+        fingerprint = qr.fingerprint_qr(url)
+        if fingerprint == self.qr_fingerprint and self.qr_code:
+            return None
+        caminho = qr.caminho_qr(fingerprint)
+        if not default_storage.exists(caminho):
+            if adiar:
+                return fingerprint
+            caminho = qr.gravar_png(fingerprint, qr.renderizar_png(url))
+        self.qr_code.name = caminho
+        self.qr_fingerprint = fingerprint
+        return None
+    
+    def get_qr_url(self):
         # Preferir URL canônica por empresa: /<empresa_slug>/nfc/<codigo>/
-        if self.empresa and self.empresa.slug:
-            relative_url = f"/{self.empresa.slug}/nfc/{self.codigo_nfc}/"
-        else:
-            relative_url = f"/nfc/{self.codigo_nfc}/"
-
-        base_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
-        url = f"{base_url.rstrip('/')}{relative_url}"
-        
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        
-        filename = f'qr_{self.codigo_nfc}.png'
-        self.qr_code.save(filename, File(buffer), save=False)
+        empresa_slug = self.empresa.slug if self.empresa_id else None
+        return qr.url_qr(empresa_slug, self.codigo_nfc)
+    
+    @property
+    def qr_versao(self):
+        return qr.versao_qr(self.get_qr_url())
     
     def get_target_url(self):
         if self.pessoa:
             return reverse('person_detail', kwargs={'empresa_slug': self.empresa.slug, 'person_slug': self.pessoa.slug})
         elif self.pet:
             return reverse('pet_detail', kwargs={'empresa_slug': self.empresa.slug, 'pet_slug': self.pet.slug})
-        return None
\ No newline at end of file
+        return None
+
+class TapEvent(models.Model):
+    """Toque registrado em um cartão NFC (gravado em lote por tap_events.py)"""
+    USER_AGENTS = [
+        ('android', 'Android'),
+        ('ios', 'iOS'),
+        ('desktop', 'Desktop'),
+        ('bot', 'Robô'),
+        ('outro', 'Outro'),
+    ]
+    
+    REFERENCIAS = [
+        ('direto', 'Direto'),
+        ('interno', 'Interno'),
+        ('externo', 'Externo'),
+    ]
+    
+    # Sem constraint no banco: eventos ainda no buffer podem referenciar
+    # cartões excluídos antes da gravação do lote.
+    cartao = models.ForeignKey(NFCCard, on_delete=models.CASCADE, related_name='toques', db_constraint=False, verbose_name="Cartão")
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='toques', db_constraint=False, verbose_name="Empresa")
+    
+    user_agent = models.CharField(max_length=10, choices=USER_AGENTS, verbose_name="Dispositivo")
+    referencia = models.CharField(max_length=10, choices=REFERENCIAS, verbose_name="Origem")
+    
+    # Momento do toque (não do flush)
+    criado_em = models.DateTimeField(verbose_name="Data do toque")
+    
+    class Meta:
+        verbose_name = "Toque NFC"
+        verbose_name_plural = "Toques NFC"
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['cartao', 'criado_em']),
+            models.Index(fields=['empresa', 'criado_em']),
+        ]
+    
+    def __str__(self):
+        return f"Toque {self.cartao_id} em {self.criado_em:%d/%m/%Y %H:%M}"
+
+class TapRollup(models.Model):
+    """Total de toques agregado por hora/dia (mantido por compact_tap_events)"""
+    GRANULARIDADES = [
+        ('hora', 'Hora'),
+        ('dia', 'Dia'),
+    ]
+    
+    ESCOPOS = [
+        ('empresa', 'Empresa'),
+        ('cartao', 'Cartão NFC'),
+        ('pessoa', 'Pessoa'),
+        ('pet', 'Pet'),
+    ]
+    
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='rollups_toques', db_constraint=False, verbose_name="Empresa")
+    granularidade = models.CharField(max_length=4, choices=GRANULARIDADES, verbose_name="Granularidade")
+    escopo = models.CharField(max_length=10, choices=ESCOPOS, verbose_name="Escopo")
+    # id da empresa, pessoa ou pet, ou UUID do cartão, conforme o escopo
+    objeto_id = models.CharField(max_length=36, verbose_name="Objeto")
+    inicio = models.DateTimeField(verbose_name="Início do período")
+    total = models.PositiveIntegerField(default=0, verbose_name="Toques")
+    
+    class Meta:
+        verbose_name = "Resumo de Toques"
+        verbose_name_plural = "Resumos de Toques"
+        ordering = ['-inicio']
+        unique_together = ['granularidade', 'escopo', 'objeto_id', 'inicio']
+        indexes = [
+            models.Index(fields=['empresa', 'escopo', 'granularidade', 'inicio']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_escopo_display()} {self.objeto_id} - {self.inicio:%d/%m/%Y %H:%M}: {self.total}"
+
+class TapRollupCheckpoint(models.Model):
+    """Último TapEvent já consolidado nos resumos"""
+    nome = models.CharField(max_length=50, unique=True)
+    ultimo_evento_id = models.BigIntegerField(default=0)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Checkpoint de Compactação"
+        verbose_name_plural = "Checkpoints de Compactação"
+    
+    def __str__(self):
+        return f"{self.nome}: {self.ultimo_evento_id}"
+
+class Job(models.Model):
+    """Tarefa da fila em segundo plano (ver jobs.py)"""
+    STATUS = [
+        ('pendente', 'Pendente'),
+        ('executando', 'Executando'),
+        ('concluida', 'Concluída'),
+        ('falhou', 'Falhou'),
+    ]
+    
+    tipo = models.CharField(max_length=50, verbose_name="Tipo")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Parâmetros")
+    # Tarefas com a mesma chave não são enfileiradas duas vezes
+    chave = models.CharField(max_length=255, unique=True, blank=True, null=True, verbose_name="Chave de Idempotência")
+    status = models.CharField(max_length=20, choices=STATUS, default='pendente', verbose_name="Status")
+    tentativas = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    erro = models.TextField(blank=True, verbose_name="Último Erro")
+    agendado_para = models.DateTimeField(default=timezone.now, verbose_name="Agendado Para")
+    iniciado_em = models.DateTimeField(blank=True, null=True, verbose_name="Iniciado em")
+    concluido_em = models.DateTimeField(blank=True, null=True, verbose_name="Concluído em")
+    # Reenfileirada durante a execução: volta para a fila ao terminar
+    repetir = models.BooleanField(default=False, verbose_name="Repetir ao Concluir")
+    
+    # Metadados
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Tarefa"
+        verbose_name_plural = "Tarefas"
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['status', 'agendado_para']),
+        ]
+    
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.get_status_display()})"
+
+class Counter(models.Model):
+    """Totais de registros ativos por empresa e globais (ver counters.py)"""
+    # 'global' ou 'empresa:<id>'
+    chave = models.CharField(max_length=50, unique=True, verbose_name="Chave")
+    pessoas = models.IntegerField(default=0, verbose_name="Pessoas ativas")
+    pets = models.IntegerField(default=0, verbose_name="Pets ativos")
+    cartoes = models.IntegerField(default=0, verbose_name="Cartões ativos")
+    atualizado_em = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Contador"
+        verbose_name_plural = "Contadores"
+        ordering = ['chave']
+    
+    def __str__(self):
+        return f"{self.chave}: {self.pessoas} pessoas, {self.pets} pets, {self.cartoes} cartões"
+
+# Invalidação do cache de toques NFC (ver tap_cache.py)
+@receiver(post_save, sender=NFCCard)
+@receiver(post_delete, sender=NFCCard)
+def invalidar_toque_cartao(sender, instance, **kwargs):
+    tap_cache.invalidar_codigos([instance.codigo_nfc, instance.valor_original('codigo_nfc')])
+
+@receiver(post_save, sender=Person)
+def invalidar_toques_pessoa(sender, instance, created, **kwargs):
+    if created or not (instance.campo_alterado('slug') or instance.campo_alterado('empresa_id')):
+        return
+    tap_cache.invalidar_codigos(NFCCard.objects.filter(pessoa=instance).values_list('codigo_nfc', flat=True))
+
+@receiver(post_save, sender=Pet)
+def invalidar_toques_pet(sender, instance, created, **kwargs):
+    if created or not (instance.campo_alterado('slug') or instance.campo_alterado('empresa_id')):
+        return
+    tap_cache.invalidar_codigos(NFCCard.objects.filter(pet=instance).values_list('codigo_nfc', flat=True))
+
+@receiver(post_save, sender=Empresa)
+def invalidar_toques_empresa(sender, instance, created, **kwargs):
+    if created or not (instance.campo_alterado('slug') or instance.campo_alterado('ativo')):
+        return
+    tap_cache.invalidar_codigos(NFCCard.objects.filter(empresa=instance).values_list('codigo_nfc', flat=True))
+
+# Invalidação das páginas públicas em cache (ver page_cache.py)
+def _invalidar_paginas(*empresa_ids):
+    empresa_ids = {empresa_id for empresa_id in empresa_ids if empresa_id}
+    if empresa_ids:
+        page_cache.invalidar_empresas(Empresa.objects.filter(pk__in=empresa_ids).values_list('slug', flat=True))
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+@receiver(post_save, sender=Pet)
+@receiver(post_delete, sender=Pet)
+@receiver(post_save, sender=NFCCard)
+@receiver(post_delete, sender=NFCCard)
+def invalidar_paginas_objeto(sender, instance, **kwargs):
+    _invalidar_paginas(instance.empresa_id, instance.valor_original('empresa_id'))
+
+@receiver(post_save, sender=Empresa)
+@receiver(post_delete, sender=Empresa)
+def invalidar_paginas_empresa(sender, instance, **kwargs):
+    page_cache.invalidar_empresas([instance.slug, instance.valor_original('slug')])
+
+# Snapshot JSON da API (ver serializers.py)
+@receiver(post_save, sender=NFCCard)
+def atualizar_snapshot_cartao(sender, instance, **kwargs):
+    from .serializers import atualizar_snapshots, snapshot_ativo
+    if snapshot_ativo():
+        atualizar_snapshots(NFCCard.objects.filter(pk=instance.pk))
+
+@receiver(post_save, sender=Person)
+def atualizar_snapshots_pessoa(sender, instance, created, **kwargs):
+    from .serializers import atualizar_snapshots, snapshot_ativo
+    if snapshot_ativo() and not created:
+        atualizar_snapshots(NFCCard.objects.filter(models.Q(pessoa=instance) | models.Q(pet__tutor=instance)))
+
+@receiver(post_save, sender=Pet)
+def atualizar_snapshots_pet(sender, instance, created, **kwargs):
+    from .serializers import atualizar_snapshots, snapshot_ativo
+    if snapshot_ativo() and not created:
+        atualizar_snapshots(NFCCard.objects.filter(pet=instance))
+
+@receiver(post_save, sender=Empresa)
+def atualizar_snapshots_empresa(sender, instance, created, **kwargs):
+    from .serializers import snapshot_ativo
+    if not snapshot_ativo() or created or not (instance.campo_alterado('nome') or instance.campo_alterado('slug')):
+        return
+    # Pode envolver muitos cartões: limpa agora (a API volta a serializar) e regrava no worker
+    NFCCard.objects.filter(empresa=instance).update(payload_json='')
+    jobs.enfileirar('api.snapshots', {'empresa_id': instance.pk}, chave=f'api.snapshots:{instance.pk}')
+
+# Processamento das imagens enviadas fora da requisição (ver jobs.py)
+def _agendar_derivados(instance, campo):
+    nome = getattr(instance, campo).name
+    if nome and instance.campo_alterado(campo):
+        empresa_id = instance.pk if isinstance(instance, Empresa) else instance.empresa_id
+        jobs.enfileirar('imagem.processar', {
+            'nome': nome, 'empresa_id': empresa_id, 'modelo': instance._meta.label_lower, 'pk': instance.pk,
+        }, chave=f'imagem.processar:{nome}')
+
+@receiver(post_save, sender=Person)
+@receiver(post_save, sender=Pet)
+def gerar_derivados_foto(sender, instance, **kwargs):
+    _agendar_derivados(instance, 'foto')
+
+@receiver(post_save, sender=Empresa)
+def gerar_derivados_logo(sender, instance, **kwargs):
+    _agendar_derivados(instance, 'logo')
+
+# Contadores de registros ativos (ver counters.py)
+@receiver(post_save, sender=Person)
+@receiver(post_save, sender=Pet)
+@receiver(post_save, sender=NFCCard)
+def atualizar_contadores(sender, instance, created, **kwargs):
+    antes = None
+    if not created:
+        if 'ativo' not in getattr(instance, '_valores_originais', {}):
+            # Instância não carregada do banco: estado anterior desconhecido (reconcile_counters corrige)
+            return
+        if instance.valor_original('ativo'):
+            antes = instance.valor_original('empresa_id')
+    depois = instance.empresa_id if instance.ativo else None
+    if antes != depois:
+        counters.mover(counters.campo_do_modelo(sender), antes, depois)
+
+@receiver(post_delete, sender=Person)
+@receiver(post_delete, sender=Pet)
+@receiver(post_delete, sender=NFCCard)
+def descontar_contadores(sender, instance, **kwargs):
+    if instance.valor_original('ativo', instance.ativo):
+        counters.mover(counters.campo_do_modelo(sender), instance.valor_original('empresa_id', instance.empresa_id), None)
+
+@receiver(post_delete, sender=Empresa)
+def remover_contador_empresa(sender, instance, **kwargs):
+    counters.remover_empresa(instance.pk)
+
+# Cache slug -> empresa da resolução de tenant (ver tenancy.py)
+@receiver(post_save, sender=Empresa)
+@receiver(post_delete, sender=Empresa)
+def invalidar_tenant(sender, instance, **kwargs):
+    tenancy.invalidar(instance.slug, instance.valor_original('slug'))
+
+# Índice de busca textual (ver search.py)
+@receiver(post_save, sender=Person)
+def indexar_pessoa(sender, instance, created, **kwargs):
+    search.indexar([instance])
+    if not created and instance.campo_alterado('nome'):
+        # O nome do tutor faz parte do texto indexado dos pets
+        search.indexar(Pet.objects.filter(tutor=instance).select_related('tutor'))
+
+@receiver(post_save, sender=Pet)
+def indexar_pet(sender, instance, **kwargs):
+    search.indexar([instance])
+
+@receiver(post_delete, sender=Person)
+@receiver(post_delete, sender=Pet)
+def remover_do_indice(sender, instance, **kwargs):
+    search.remover(search.tipo_do_objeto(instance), [instance.pk])
+
+# PRAGMAs do modo SQLite de produção em cada conexão (ver sqlite.py)
+@receiver(connection_created)
+def configurar_sqlite(sender, connection, **kwargs):
+    sqlite.configurar_conexao(connection)
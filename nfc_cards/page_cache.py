@@ -0,0 +1,171 @@
+"""
+Cache das páginas públicas de pessoas e pets para visitantes anônimos.
+
+São as páginas abertas a cada toque. O HTML renderizado é guardado no cache
+compartilhado com a chave ``(tipo, slug da empresa, slug do objeto, versão)``.
+A versão é um carimbo por empresa: qualquer alteração em ``Empresa``,
+``Person``, ``Pet`` ou ``NFCCard`` troca o carimbo (ver sinais em
+``models.py``) e as páginas antigas deixam de ser encontradas e expiram.
+
+O cache de página só fica ativo com um backend compartilhado entre os
+processos: com ``LocMemCache`` a troca de carimbo só alcançaria o worker que
+salvou, e os demais serviriam a página antiga até o ``TIMEOUT``. Nesse caso
+ele fica desligado (``check --deploy`` avisa) e só o GET condicional vale.
+
+Um acerto custa duas leituras de cache, nenhuma consulta e nenhuma
+renderização. Requisições com cookie de sessão ou de mensagens, ou com query
+string, não usam o cache, pois a página pode depender do usuário.
+
+O mixin também responde GET condicional: os validadores (ETag e
+Last-Modified, ver ``conditional.py``) ficam guardados junto com a página, e
+fora do cache são calculados com uma consulta antes de renderizar.
+"""
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .utils import cache_isolado
+
+CONFIG_PADRAO = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60 * 60,
+}
+
+COOKIE_MENSAGENS = 'messages'
+
+
+def _config():
+    config = dict(CONFIG_PADRAO)
+    config.update(getattr(settings, 'NFC_PAGE_CACHE', {}))
+    return config
+
+
+def _cache():
+    return caches[_config()['CACHE_ALIAS']]
+
+
+def ativo():
+    """Cache de página ligado e com um backend compartilhado entre os workers"""
+    config = _config()
+    return config['ENABLED'] and not cache_isolado(config['CACHE_ALIAS'])
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def verificar_backend(app_configs, **kwargs):
+    config = _config()
+    if config['ENABLED'] and cache_isolado(config['CACHE_ALIAS']):
+        return [checks.Warning(
+            'O cache de páginas públicas está desligado: o backend de cache '
+            f'"{config["CACHE_ALIAS"]}" é isolado por processo.',
+            hint='Configure CACHE_BACKEND com um backend compartilhado (ex.: Redis) '
+                 'ou defina NFC_PAGE_CACHE_ENABLED=False.',
+            id='nfc_cards.W001',
+        )]
+    return []
+
+
+def _chave_versao(empresa_slug):
+    return f"nfc:pagina:versao:{quote(empresa_slug)}"
+
+
+def versao_empresa(empresa_slug):
+    """Carimbo atual da empresa; cria um novo se ele não estiver em cache"""
+    cache = _cache()
+    chave = _chave_versao(empresa_slug)
+    versao = cache.get(chave)
+    if versao is None:
+        versao = time.time_ns()
+        # add() não sobrescreve um carimbo criado por outro worker no meio tempo
+        if not cache.add(chave, versao, timeout=None):
+            versao = cache.get(chave, versao)
+    return versao
+
+
+def invalidar_empresas(empresa_slugs):
+    """Troca o carimbo das empresas, invalidando todas as suas páginas"""
+    chaves = {_chave_versao(slug) for slug in empresa_slugs if slug}
+    if chaves:
+        versao = time.time_ns()
+        _cache().set_many({chave: versao for chave in chaves}, timeout=None)
+
+
+def requisicao_elegivel(request):
+    if not ativo() or request.method not in ('GET', 'HEAD') or request.GET:
+        return False
+    cookies = request.COOKIES
+    return settings.SESSION_COOKIE_NAME not in cookies and COOKIE_MENSAGENS not in cookies
+
+
+def _chave_pagina(tipo, empresa_slug, objeto_slug, versao):
+    return f"nfc:pagina:{tipo}:{quote(empresa_slug)}:{quote(objeto_slug)}:{versao}"
+
+
+def _usuario(request):
+    user = getattr(request, 'user', None)
+    return user.pk if user is not None and user.is_authenticated else 'anonimo'
+
+
+class CachePaginaPublicaMixin:
+    """Cache de página e GET condicional das páginas públicas (ver módulo).
+
+    As views definem ``cache_tipo``, ``cache_slug_kwarg`` e
+    ``get_validadores`` (ver ``conditional.py``).
+    """
+    cache_tipo = None
+    cache_slug_kwarg = None
+
+    def get_validadores(self, empresa_slug, objeto_slug, versao, usuario):
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        from .conditional import aplicar_validadores, nao_modificado
+
+        # Mensagens pendentes são consumidas ao renderizar: nunca responder 304
+        if request.method not in ('GET', 'HEAD') or COOKIE_MENSAGENS in request.COOKIES:
+            return super().dispatch(request, *args, **kwargs)
+
+        empresa_slug = kwargs['empresa_slug']
+        objeto_slug = kwargs[self.cache_slug_kwarg]
+        versao = versao_empresa(empresa_slug)
+        elegivel = requisicao_elegivel(request)
+        cache = _cache()
+        chave = _chave_pagina(self.cache_tipo, empresa_slug, objeto_slug, versao)
+
+        if elegivel:
+            pagina = cache.get(chave)
+            if pagina is not None:
+                response = nao_modificado(request, pagina['etag'], pagina['last_modified'])
+                if response is None:
+                    response = HttpResponse(pagina['conteudo'], content_type=pagina['content_type'])
+                    aplicar_validadores(response, pagina['etag'], pagina['last_modified'])
+                patch_vary_headers(response, ('Cookie',))
+                return response
+
+        validadores = self.get_validadores(empresa_slug, objeto_slug, versao, _usuario(request))
+        if validadores is None:
+            # Objeto inexistente ou inativo: a view responde 404
+            return super().dispatch(request, *args, **kwargs)
+        response = nao_modificado(request, **validadores)
+        if response is not None:
+            patch_vary_headers(response, ('Cookie',))
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            if hasattr(response, 'render'):
+                response.render()
+            aplicar_validadores(response, **validadores)
+            patch_vary_headers(response, ('Cookie',))
+            if elegivel:
+                cache.set(chave, {
+                    'conteudo': response.content,
+                    'content_type': response['Content-Type'],
+                    **validadores,
+                }, _config()['TIMEOUT'])
+        return response
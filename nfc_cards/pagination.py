@@ -0,0 +1,229 @@
+"""
+Paginação por cursor (keyset) das listagens.
+
+Com ``OFFSET`` cada página exigia ``COUNT(*)`` e descartava as linhas das
+páginas anteriores, ficando mais lenta quanto mais fundo. Aqui a página
+continua a partir da chave do último registro da página anterior
+(``(nome, id)`` ou ``(-criado_em, id)``), que os índices parciais
+``(empresa, nome, id)`` e ``(empresa, -criado_em, -id)`` (ver ``models.py``)
+resolvem com uma busca por faixa: a página 1000 custa o mesmo que a primeira.
+
+O cursor é opaco para o cliente (base64 de ``[direção, valores]``) e os
+totais exibidos vêm dos contadores (ver ``counters.py``), não de ``COUNT``.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from functools import cached_property
+from uuid import UUID
+
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# ordem -> campos da chave (o último sempre é a PK, para desempate)
+ORDENACOES = {
+    'nome': ('nome', 'pk'),
+    'recentes': ('-criado_em', '-pk'),
+}
+
+PROXIMA = 'p'
+ANTERIOR = 'a'
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def _nome(campo):
+    return campo.lstrip('-')
+
+
+def _inverter(campo):
+    return _nome(campo) if campo.startswith('-') else f'-{campo}'
+
+
+def codificar(direcao, valores):
+    # isoformat completo: o DjangoJSONEncoder corta os microssegundos e o cursor pularia registros
+    valores = [
+        valor.isoformat() if isinstance(valor, datetime) else str(valor) if isinstance(valor, UUID) else valor
+        for valor in valores
+    ]
+    dados = json.dumps([direcao, valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip('=')
+
+
+def decodificar(cursor, modelo, campos):
+    try:
+        dados = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direcao, valores = json.loads(dados)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise CursorInvalido('Cursor inválido.')
+    if direcao not in (PROXIMA, ANTERIOR) or not isinstance(valores, list) or len(valores) != len(campos):
+        raise CursorInvalido('Cursor inválido.')
+    for indice, campo in enumerate(campos):
+        nome = _nome(campo)
+        if nome != 'pk' and modelo._meta.get_field(nome).get_internal_type() == 'DateTimeField':
+            valores[indice] = parse_datetime(valores[indice] or '')
+            if valores[indice] is None:
+                raise CursorInvalido('Cursor inválido.')
+    return direcao, valores
+
+
+def _depois_de(campos, valores):
+    """Filtro "depois da chave ``valores``" na ordem ``campos`` (chave de dois campos).
+
+    ``campo >= v AND (campo > v OR pk > id)``: o primeiro termo vira a faixa
+    do índice e o segundo só desempata as linhas com o mesmo valor.
+    """
+    (campo, campo_pk), (valor, pk) = campos, valores
+    maior, igual_ou_maior = ('lt', 'lte') if campo.startswith('-') else ('gt', 'gte')
+    maior_pk = 'lt' if campo_pk.startswith('-') else 'gt'
+    return Q(**{f'{_nome(campo)}__{igual_ou_maior}': valor}) & (
+        Q(**{f'{_nome(campo)}__{maior}': valor}) | Q(**{f'pk__{maior_pk}': pk})
+    )
+
+
+class PaginaCursor:
+    """Página de ``paginar``; ``proximo``/``anterior`` são os cursores vizinhos (ou None)"""
+
+    def __init__(self, objetos, ordem, campos, tem_proxima, tem_anterior):
+        self.object_list = objetos
+        self.ordem = ordem
+        self.proximo = codificar(PROXIMA, self._chave(objetos[-1], campos)) if tem_proxima and objetos else None
+        self.anterior = codificar(ANTERIOR, self._chave(objetos[0], campos)) if tem_anterior and objetos else None
+
+    @staticmethod
+    def _chave(objeto, campos):
+        return [getattr(objeto, _nome(campo)) for campo in campos]
+
+    def has_next(self):
+        return self.proximo is not None
+
+    def has_previous(self):
+        return self.anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginar(queryset, ordem, cursor=None, por_pagina=12):
+    """Página de ``queryset`` na ``ordem`` (chave de ``ORDENACOES``) a partir de ``cursor``"""
+    campos = ORDENACOES[ordem]
+    direcao, valores = decodificar(cursor, queryset.model, campos) if cursor else (PROXIMA, None)
+    voltando = direcao == ANTERIOR
+    ordenacao = [_inverter(campo) for campo in campos] if voltando else list(campos)
+    if valores is not None:
+        queryset = queryset.filter(_depois_de(ordenacao, valores))
+    # Um registro a mais indica se há outra página na direção percorrida
+    objetos = list(queryset.order_by(*ordenacao)[:por_pagina + 1])
+    tem_mais = len(objetos) > por_pagina
+    objetos = objetos[:por_pagina]
+    if voltando:
+        objetos.reverse()
+        return PaginaCursor(objetos, ordem, campos, tem_proxima=True, tem_anterior=tem_mais)
+    return PaginaCursor(objetos, ordem, campos, tem_proxima=tem_mais, tem_anterior=valores is not None)
+
+
+class PaginacaoCursorMixin:
+    """ListView paginada por cursor (``?cursor=`` e ``?ordem=``), sem COUNT nem OFFSET.
+
+    O contexto traz ``page_obj`` (``PaginaCursor``), ``ordem`` e as URLs
+    ``url_proxima``/``url_anterior`` com os demais parâmetros preservados.
+    """
+    ordenacoes = ('nome', 'recentes')
+
+    def get_ordem(self):
+        ordem = self.request.GET.get('ordem')
+        return ordem if ordem in self.ordenacoes else self.ordenacoes[0]
+
+    def paginate_queryset(self, queryset, page_size):
+        ordem = self.get_ordem()
+        try:
+            pagina = paginar(queryset, ordem, self.request.GET.get('cursor'), page_size)
+        except CursorInvalido:
+            pagina = paginar(queryset, ordem, None, page_size)
+        return None, pagina, pagina.object_list, pagina.has_other_pages()
+
+    def _url_cursor(self, cursor):
+        if cursor is None:
+            return None
+        parametros = self.request.GET.copy()
+        parametros['cursor'] = cursor
+        return f'?{parametros.urlencode()}'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        pagina = context.get('page_obj')
+        context['ordem'] = self.get_ordem()
+        context['url_proxima'] = self._url_cursor(pagina.proximo) if pagina else None
+        context['url_anterior'] = self._url_cursor(pagina.anterior) if pagina else None
+        return context
+
+
+class ContagemEstimadaPaginator(Paginator):
+    """Paginator do admin que conta no máximo ``limite_contagem`` linhas.
+
+    Acima do limite o total só é usado se ``estimar`` (callable) o conhecer,
+    como o contador da empresa quando o único filtro é a empresa (ver
+    ``ContagemEstimadaAdminMixin`` em ``admin.py``). Sem ele o total fica
+    desconhecido: ``count`` para em ``limite_contagem + 1`` e o admin mostra
+    "10000+" com links só de anterior/próxima
+    (``admin/nfc_cards/pagination.html``).
+    """
+    limite_contagem = 10000
+
+    def __init__(self, *args, estimar=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimar = estimar
+        self.tem_proxima = False
+
+    @cached_property
+    def _contagem_limitada(self):
+        # COUNT sobre uma subconsulta com LIMIT: custo limitado ao teto
+        return self.object_list.order_by()[:self.limite_contagem + 1].count()
+
+    @property
+    def estimado(self):
+        return self._contagem_limitada > self.limite_contagem
+
+    @cached_property
+    def _estimativa(self):
+        return self.estimar() if self.estimado and self.estimar else None
+
+    @property
+    def total_desconhecido(self):
+        return self.estimado and self._estimativa is None
+
+    @cached_property
+    def count(self):
+        if not self.estimado:
+            return self._contagem_limitada
+        return max(self._contagem_limitada, self._estimativa or 0)
+
+    def validate_number(self, number):
+        if not self.estimado:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('O número da página não é um inteiro.')
+        if number < 1:
+            raise EmptyPage('O número da página é menor que 1.')
+        return number
+
+    def page(self, number):
+        if not self.estimado:
+            return super().page(number)
+        number = self.validate_number(number)
+        inicio = (number - 1) * self.per_page
+        fim = inicio + self.per_page
+        self.tem_proxima = self.object_list[fim:fim + 1].exists()
+        return self._get_page(self.object_list[inicio:fim], number, self)
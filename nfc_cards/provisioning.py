@@ -0,0 +1,132 @@
+"""
+Provisionamento em lote de cartões NFC.
+
+Os códigos são alocados em memória e conferidos contra o banco com consultas
+``codigo_nfc__in`` em blocos, em vez de descobrir colisões por IntegrityError
+linha a linha. As linhas são inseridas com ``bulk_create`` dentro de uma
+transação; a geração dos QR codes fica para uma etapa posterior.
+"""
+import secrets
+
+from django.db import IntegrityError, transaction
+
+from . import counters
+from .models import NFCCard
+from .qr import QRRenderEngine
+
+ESQUEMAS = ('aleatorio', 'sequencial')
+
+# Sem caracteres ambíguos (0/O, 1/I/L) para facilitar a leitura impressa
+ALFABETO = '23456789ABCDEFGHJKMNPQRSTUVWXYZ'
+
+# Limite seguro de parâmetros por consulta no SQLite
+BLOCO_CONSULTA = 500
+
+MAX_TENTATIVAS = 3
+
+
+def codigos_existentes(codigos):
+    """Subconjunto de ``codigos`` que já existe no banco"""
+    codigos = list(codigos)
+    existentes = set()
+    for inicio in range(0, len(codigos), BLOCO_CONSULTA):
+        bloco = codigos[inicio:inicio + BLOCO_CONSULTA]
+        existentes.update(NFCCard.objects.filter(codigo_nfc__in=bloco).values_list('codigo_nfc', flat=True))
+    return existentes
+
+
+def _alocar_aleatorios(quantidade, prefixo, tamanho):
+    alocados = set()
+    while len(alocados) < quantidade:
+        faltam = quantidade - len(alocados)
+        candidatos = set()
+        while len(candidatos) < faltam:
+            sufixo = ''.join(secrets.choice(ALFABETO) for _ in range(tamanho))
+            candidatos.add(f'{prefixo}{sufixo}')
+        candidatos -= alocados
+        candidatos -= codigos_existentes(candidatos)
+        alocados |= candidatos
+    return sorted(alocados)
+
+
+def _alocar_sequenciais(quantidade, prefixo, tamanho):
+    maior = 0
+    for codigo in NFCCard.objects.filter(codigo_nfc__startswith=prefixo).values_list('codigo_nfc', flat=True).iterator():
+        sufixo = codigo[len(prefixo):]
+        if sufixo.isdigit():
+            maior = max(maior, int(sufixo))
+
+    alocados = []
+    proximo = maior + 1
+    while len(alocados) < quantidade:
+        faltam = quantidade - len(alocados)
+        candidatos = [f'{prefixo}{numero:0{tamanho}d}' for numero in range(proximo, proximo + faltam)]
+        proximo += faltam
+        ocupados = codigos_existentes(candidatos)
+        alocados.extend(codigo for codigo in candidatos if codigo not in ocupados)
+    return alocados
+
+
+def alocar_codigos(quantidade, esquema='aleatorio', prefixo='', tamanho=8):
+    """Retorna ``quantidade`` códigos normalizados e livres no banco"""
+    if esquema not in ESQUEMAS:
+        raise ValueError(f'Esquema de código inválido: {esquema}')
+    prefixo = prefixo.strip().upper()
+    if len(prefixo) + tamanho > NFCCard._meta.get_field('codigo_nfc').max_length:
+        raise ValueError('Prefixo e tamanho excedem o limite do código NFC.')
+    if esquema == 'sequencial':
+        return _alocar_sequenciais(quantidade, prefixo, tamanho)
+    return _alocar_aleatorios(quantidade, prefixo, tamanho)
+
+
+def provisionar_cartoes(empresa, quantidade, tipo='pessoa', esquema='aleatorio', prefixo='', tamanho=8, lote=1000):
+    """Cria ``quantidade`` cartões sem vínculo para a empresa e retorna a lista criada.
+
+    Os cartões são criados sem QR code; use ``renderizar_qr_codes`` em seguida.
+    """
+    for tentativa in range(1, MAX_TENTATIVAS + 1):
+        codigos = alocar_codigos(quantidade, esquema=esquema, prefixo=prefixo, tamanho=tamanho)
+        cartoes = [NFCCard(empresa=empresa, codigo_nfc=codigo, tipo=tipo) for codigo in codigos]
+        try:
+            with transaction.atomic():
+                for inicio in range(0, len(cartoes), lote):
+                    NFCCard.objects.bulk_create(cartoes[inicio:inicio + lote])
+                # Sem sinais no bulk_create: os contadores são ajustados aqui
+                counters.somar(empresa.pk, cartoes=len(cartoes))
+        except IntegrityError:
+            # Outro processo usou algum dos códigos entre a alocação e a inserção
+            if tentativa == MAX_TENTATIVAS:
+                raise
+            continue
+        return cartoes
+
+
+def vincular_cartoes(empresa, objetos, tipo, esquema='aleatorio', prefixo='', tamanho=8, lote=1000):
+    """Cria um cartão já vinculado para cada pessoa (``tipo='pessoa'``) ou pet de ``objetos``.
+
+    Como em ``provisionar_cartoes``, os QR codes ficam pendentes.
+    """
+    for tentativa in range(1, MAX_TENTATIVAS + 1):
+        codigos = alocar_codigos(len(objetos), esquema=esquema, prefixo=prefixo, tamanho=tamanho)
+        cartoes = [
+            NFCCard(empresa=empresa, codigo_nfc=codigo, tipo=tipo, **{tipo: objeto})
+            for codigo, objeto in zip(codigos, objetos)
+        ]
+        try:
+            with transaction.atomic():
+                for inicio in range(0, len(cartoes), lote):
+                    NFCCard.objects.bulk_create(cartoes[inicio:inicio + lote])
+                # Sem sinais no bulk_create: os contadores são ajustados aqui
+                counters.somar(empresa.pk, cartoes=len(cartoes))
+        except IntegrityError:
+            if tentativa == MAX_TENTATIVAS:
+                raise
+            continue
+        return cartoes
+
+
+def renderizar_qr_codes(cartoes, lote=500, workers=None, progresso=None):
+    """Gera os QR codes dos cartões informados em paralelo (ver ``qr.QRRenderEngine``)"""
+    cartoes = list(cartoes)
+    lotes = (cartoes[inicio:inicio + lote] for inicio in range(0, len(cartoes), lote))
+    return QRRenderEngine(workers=workers).renderizar(lotes, progresso=progresso)
@@ -0,0 +1,222 @@
+"""
+Geração de QR codes dos cartões NFC.
+
+``renderizar_png`` é uma função pura (sem ORM) para poder rodar em processos
+filhos. ``QRRenderEngine`` distribui a renderização entre os núcleos com um
+``ProcessPoolExecutor``. O processo principal grava os arquivos no storage e
+atualiza os cartões em lote.
+
+Os arquivos são endereçados pelo conteúdo: o nome é o hash da URL e dos
+parâmetros de renderização (``fingerprint_qr``). Um QR só é renderizado se
+esse arquivo ainda não existe, e cada cartão guarda o fingerprint atual em
+``NFCCard.qr_fingerprint``.
+"""
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+QR_VERSION = 1
+QR_BOX_SIZE = 10
+QR_BORDER = 5
+QR_FORMATO = 'png'
+
+# Incrementar quando a forma de renderizar mudar (cores, biblioteca etc.)
+QR_REVISAO = 1
+
+# Limites do parâmetro ?size= do endpoint de QR (em pixels)
+TAMANHO_MINIMO = 64
+TAMANHO_MAXIMO = 1024
+
+
+def url_qr(empresa_slug, codigo):
+    """URL gravada no QR: a rota canônica de redirecionamento por código NFC"""
+    if empresa_slug:
+        relative_url = f"/{empresa_slug}/nfc/{codigo}/"
+    else:
+        relative_url = f"/nfc/{codigo}/"
+    base_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
+    return f"{base_url.rstrip('/')}{relative_url}"
+
+
+def fingerprint_qr(url, version=QR_VERSION, box_size=QR_BOX_SIZE, border=QR_BORDER, formato=QR_FORMATO):
+    dados = f"{url}|v{version}|b{box_size}|m{border}|{formato}|r{QR_REVISAO}"
+    return hashlib.sha256(dados.encode('utf-8')).hexdigest()
+
+
+def versao_qr(url):
+    """Parâmetro ``?v=`` das URLs de QR: muda com a URL gravada e com a renderização"""
+    return fingerprint_qr(url)[:16]
+
+
+def caminho_qr(fingerprint, formato=QR_FORMATO):
+    return f"qr_codes/{fingerprint[:2]}/{fingerprint}.{formato}"
+
+
+def gravar_png(fingerprint, png):
+    """Grava o PNG no caminho endereçado pelo conteúdo e retorna o nome salvo"""
+    caminho = caminho_qr(fingerprint)
+    if default_storage.exists(caminho):
+        return caminho
+    return default_storage.save(caminho, ContentFile(png))
+
+
+def renderizar_png(url, box_size=QR_BOX_SIZE, border=QR_BORDER):
+    qr = qrcode.QRCode(version=QR_VERSION, box_size=box_size, border=border)
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _matriz(url, border):
+    qr = qrcode.QRCode(version=QR_VERSION, border=border)
+    qr.add_data(url)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def renderizar_svg(url, border=QR_BORDER):
+    """SVG compacto: um único path com os módulos escuros agrupados por linha"""
+    matriz = _matriz(url, border)
+    lado = len(matriz)
+    trechos = []
+    for y, linha in enumerate(matriz):
+        x = 0
+        while x < lado:
+            if not linha[x]:
+                x += 1
+                continue
+            inicio = x
+            while x < lado and linha[x]:
+                x += 1
+            trechos.append(f"M{inicio} {y}h{x - inicio}v1h-{x - inicio}z")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {lado} {lado}" '
+        f'shape-rendering="crispEdges"><rect width="{lado}" height="{lado}" fill="#fff"/>'
+        f'<path d="{"".join(trechos)}" fill="#000"/></svg>'
+    ).encode('utf-8')
+
+
+def box_size_para(url, tamanho, border=QR_BORDER):
+    """Maior box_size cuja imagem não passa de ``tamanho`` pixels"""
+    modulos = len(_matriz(url, border=0)) + 2 * border
+    return max(1, tamanho // modulos)
+
+
+def normalizar_tamanho(tamanho):
+    try:
+        tamanho = int(tamanho)
+    except (TypeError, ValueError):
+        return None
+    tamanho = min(max(tamanho, TAMANHO_MINIMO), TAMANHO_MAXIMO)
+    # Arredonda para múltiplos de 32 para limitar as variações em cache
+    return tamanho - tamanho % 32
+
+
+@lru_cache(maxsize=512)
+def renderizar_memoizado(url, formato, tamanho=None):
+    """Renderiza o QR no formato pedido, com memoização LRU por processo"""
+    if formato == 'svg':
+        return renderizar_svg(url)
+    box_size = box_size_para(url, tamanho) if tamanho else QR_BOX_SIZE
+    return renderizar_png(url, box_size=box_size)
+
+
+def qr_desatualizado(cartao):
+    """True se o QR gravado não corresponde à URL atual do cartão"""
+    if not cartao.codigo_nfc:
+        return False
+    return not cartao.qr_code or cartao.qr_fingerprint != fingerprint_qr(cartao.get_qr_url())
+
+
+def _renderizar_item(item):
+    chave, url = item
+    return chave, renderizar_png(url)
+
+
+class QRRenderEngine:
+    """Renderiza QR codes de muitos cartões em paralelo"""
+
+    def __init__(self, workers=None, chunksize=16):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+
+    def _mapear(self, executor, itens):
+        if executor is None:
+            return map(_renderizar_item, itens)
+        return executor.map(_renderizar_item, itens, chunksize=self.chunksize)
+
+    def renderizar(self, lotes, progresso=None, forcar=False):
+        """Renderiza e grava os QR codes de cada lote de cartões.
+
+        ``lotes`` é um iterável de listas de ``NFCCard`` (com ``empresa``
+        carregada). Cartões cujo fingerprint não mudou são ignorados, e QR
+        codes já existentes no storage são reaproveitados sem renderizar.
+        ``forcar`` ignora o fingerprint gravado no cartão.
+        ``progresso(feitos, decorrido)`` é chamado após cada lote.
+        """
+        from .models import NFCCard
+
+        inicio = time.monotonic()
+        estatisticas = {'total': 0, 'renderizados': 0, 'reaproveitados': 0, 'em_dia': 0}
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        try:
+            for lote in lotes:
+                estatisticas['total'] += len(lote)
+                alterados = []
+                # fingerprint -> (url, cartões que usam esse QR)
+                pendentes = {}
+                for cartao in lote:
+                    if not cartao.codigo_nfc:
+                        continue
+                    url = cartao.get_qr_url()
+                    fingerprint = fingerprint_qr(url)
+                    if not forcar and cartao.qr_fingerprint == fingerprint and cartao.qr_code:
+                        estatisticas['em_dia'] += 1
+                        continue
+                    pendentes.setdefault(fingerprint, (url, []))[1].append(cartao)
+
+                a_renderizar = []
+                for fingerprint, (url, cartoes) in pendentes.items():
+                    caminho = caminho_qr(fingerprint)
+                    if default_storage.exists(caminho):
+                        estatisticas['reaproveitados'] += len(cartoes)
+                        self._atribuir(cartoes, fingerprint, caminho, alterados)
+                    else:
+                        a_renderizar.append((fingerprint, url))
+
+                for fingerprint, png in self._mapear(executor, a_renderizar):
+                    caminho = gravar_png(fingerprint, png)
+                    cartoes = pendentes[fingerprint][1]
+                    estatisticas['renderizados'] += len(cartoes)
+                    self._atribuir(cartoes, fingerprint, caminho, alterados)
+
+                NFCCard.objects.bulk_update(alterados, ['qr_code', 'qr_fingerprint'])
+                if progresso:
+                    progresso(estatisticas['total'], time.monotonic() - inicio)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        segundos = time.monotonic() - inicio
+        estatisticas['segundos'] = segundos
+        estatisticas['por_segundo'] = estatisticas['total'] / segundos if segundos else 0.0
+        return estatisticas
+
+    @staticmethod
+    def _atribuir(cartoes, fingerprint, caminho, alterados):
+        for cartao in cartoes:
+            cartao.qr_code.name = caminho
+            cartao.qr_fingerprint = fingerprint
+            alterados.append(cartao)
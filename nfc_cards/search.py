@@ -0,0 +1,258 @@
+"""
+Busca textual de pessoas e pets por empresa.
+
+O índice guarda uma linha por pessoa/pet ativo, com ``rowid`` derivado do
+tipo e do id (``id * 2 + tipo``), e é mantido pelos sinais de ``Person`` e
+``Pet`` (ver ``models.py``); ``rebuild_search_index`` o recria do zero.
+Há duas implementações com a mesma interface, escolhidas pelo banco:
+
+- SQLite: tabela virtual FTS5 (``unicode61 remove_diacritics``, índices de
+  prefixo de 2 e 3 caracteres), ordenada por ``bm25``;
+- PostgreSQL: tabela com ``tsvector`` (configuração ``simple``) e índice GIN,
+  ordenada por ``ts_rank``.
+
+Os textos e os termos são normalizados em Python (minúsculas, sem acentos),
+então "joao" encontra "João" nos dois bancos. Cada termo é buscado como
+prefixo ("mar sil" encontra "Maria Silva"). A empresa e o tipo também são
+tokens do índice, para a busca ficar restrita ao tenant sem varrer as
+linhas das outras empresas.
+
+Em outros bancos ``backend()`` é None e ``buscar`` usa ``icontains``.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+
+TABELA = 'nfc_cards_busca'
+
+TIPOS = {'pessoa': 0, 'pet': 1}
+
+LIMITE_PADRAO = 50
+
+# Acima disso a busca é ampla demais para ordenar por relevância (bm25/ts_rank
+# de cada linha custa centenas de ms em 100k registros) e volta sem ordenar
+RANQUEAR_ATE = 1000
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos"""
+    decomposto = unicodedata.normalize('NFKD', str(texto or ''))
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def termos(consulta):
+    return re.findall(r'\w+', normalizar(consulta))[:8]
+
+
+def _rowid(tipo, objeto_id):
+    return objeto_id * 2 + TIPOS[tipo]
+
+
+def _token_empresa(empresa_id):
+    return f'e{empresa_id}'
+
+
+def tipo_do_objeto(objeto):
+    return 'pessoa' if objeto._meta.model_name == 'person' else 'pet'
+
+
+def texto_do_objeto(objeto):
+    if tipo_do_objeto(objeto) == 'pessoa':
+        partes = (objeto.nome, objeto.slug, objeto.email, objeto.telefone, objeto.whatsapp, objeto.cargo)
+    else:
+        partes = (objeto.nome, objeto.slug, objeto.get_especie_display(), objeto.raca, objeto.cor, objeto.tutor.nome)
+    return normalizar(' '.join(parte for parte in partes if parte))
+
+
+class BuscaSQLite:
+    criar_sql = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA} USING fts5("
+        "empresa, tipo, texto, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    ]
+    remover_sql = [f'DROP TABLE IF EXISTS {TABELA}']
+
+    def gravar(self, cursor, linhas):
+        cursor.executemany(f'DELETE FROM {TABELA} WHERE rowid = %s', [(linha[0],) for linha in linhas])
+        cursor.executemany(
+            f'INSERT INTO {TABELA} (rowid, empresa, tipo, texto) VALUES (%s, %s, %s, %s)',
+            [(rowid, _token_empresa(empresa_id), tipo, texto) for rowid, empresa_id, tipo, texto in linhas],
+        )
+
+    def apagar(self, cursor, rowids):
+        cursor.executemany(f'DELETE FROM {TABELA} WHERE rowid = %s', [(rowid,) for rowid in rowids])
+
+    def limpar(self, cursor, empresa_id=None):
+        if empresa_id is None:
+            cursor.execute(f'DELETE FROM {TABELA}')
+        else:
+            cursor.execute(f'DELETE FROM {TABELA} WHERE {TABELA} MATCH %s', [f'empresa : "{_token_empresa(empresa_id)}"'])
+
+    def consultar(self, cursor, empresa_id, tipo, palavras, limite, ordenar):
+        filtros = [f'tipo : "{tipo}"'] + [f'texto : "{palavra}"*' for palavra in palavras]
+        if empresa_id is not None:
+            filtros.insert(0, f'empresa : "{_token_empresa(empresa_id)}"')
+        ordem = 'ORDER BY rank' if ordenar else ''
+        cursor.execute(
+            f'SELECT rowid FROM {TABELA} WHERE {TABELA} MATCH %s {ordem} LIMIT %s',
+            [' AND '.join(filtros), limite],
+        )
+        return [rowid // 2 for (rowid,) in cursor.fetchall()]
+
+
+class BuscaPostgres:
+    criar_sql = [
+        f'CREATE TABLE IF NOT EXISTS {TABELA} ('
+        'rowid bigint PRIMARY KEY, empresa_id bigint NOT NULL, tipo varchar(10) NOT NULL, documento tsvector NOT NULL)',
+        f'CREATE INDEX IF NOT EXISTS {TABELA}_documento_idx ON {TABELA} USING GIN (documento)',
+        f'CREATE INDEX IF NOT EXISTS {TABELA}_empresa_tipo_idx ON {TABELA} (empresa_id, tipo)',
+    ]
+    remover_sql = [f'DROP TABLE IF EXISTS {TABELA}']
+
+    def gravar(self, cursor, linhas):
+        cursor.executemany(
+            f"INSERT INTO {TABELA} (rowid, empresa_id, tipo, documento) "
+            f"VALUES (%s, %s, %s, to_tsvector('simple', %s)) "
+            f"ON CONFLICT (rowid) DO UPDATE SET empresa_id = EXCLUDED.empresa_id, documento = EXCLUDED.documento",
+            linhas,
+        )
+
+    def apagar(self, cursor, rowids):
+        cursor.execute(f'DELETE FROM {TABELA} WHERE rowid = ANY(%s)', [list(rowids)])
+
+    def limpar(self, cursor, empresa_id=None):
+        if empresa_id is None:
+            cursor.execute(f'TRUNCATE {TABELA}')
+        else:
+            cursor.execute(f'DELETE FROM {TABELA} WHERE empresa_id = %s', [empresa_id])
+
+    def consultar(self, cursor, empresa_id, tipo, palavras, limite, ordenar):
+        consulta = ' & '.join(f'{palavra}:*' for palavra in palavras)
+        filtro_empresa = 'AND empresa_id = %s' if empresa_id is not None else ''
+        ordem = 'ORDER BY ts_rank(documento, consulta) DESC' if ordenar else ''
+        parametros = [consulta, tipo] + ([empresa_id] if empresa_id is not None else []) + [limite]
+        cursor.execute(
+            f"SELECT rowid FROM {TABELA}, to_tsquery('simple', %s) AS consulta "
+            f"WHERE documento @@ consulta AND tipo = %s {filtro_empresa} {ordem} LIMIT %s",
+            parametros,
+        )
+        return [rowid // 2 for (rowid,) in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': BuscaSQLite,
+    'postgresql': BuscaPostgres,
+}
+
+
+def backend(conexao=None):
+    classe = BACKENDS.get((conexao or connection).vendor)
+    return classe() if classe else None
+
+
+def indexar(objetos):
+    """Grava (ou remove, se inativos) pessoas/pets no índice"""
+    implementacao = backend()
+    if implementacao is None:
+        return
+    linhas, inativos = [], []
+    for objeto in objetos:
+        tipo = tipo_do_objeto(objeto)
+        if objeto.ativo:
+            linhas.append((_rowid(tipo, objeto.pk), objeto.empresa_id, tipo, texto_do_objeto(objeto)))
+        else:
+            inativos.append(_rowid(tipo, objeto.pk))
+    with connection.cursor() as cursor:
+        if linhas:
+            implementacao.gravar(cursor, linhas)
+        if inativos:
+            implementacao.apagar(cursor, inativos)
+
+
+def remover(tipo, objeto_ids):
+    implementacao = backend()
+    if implementacao is None or not objeto_ids:
+        return
+    with connection.cursor() as cursor:
+        implementacao.apagar(cursor, [_rowid(tipo, objeto_id) for objeto_id in objeto_ids])
+
+
+def buscar(empresa_id, tipo, consulta, limite=LIMITE_PADRAO):
+    """Ids de ``tipo`` ('pessoa' ou 'pet') que casam com ``consulta``, do mais relevante ao menos
+
+    Buscas com mais de ``RANQUEAR_ATE`` resultados voltam sem ordem de relevância.
+    """
+    palavras = termos(consulta)
+    if not palavras:
+        return []
+    implementacao = backend()
+    if implementacao is None:
+        return _buscar_sem_indice(empresa_id, tipo, palavras, limite)
+    with connection.cursor() as cursor:
+        candidatos = implementacao.consultar(cursor, empresa_id, tipo, palavras, RANQUEAR_ATE, ordenar=False)
+        if len(candidatos) >= RANQUEAR_ATE:
+            return candidatos[:limite]
+        return implementacao.consultar(cursor, empresa_id, tipo, palavras, limite, ordenar=True)
+
+
+def autocompletar(queryset, tipo, empresa_id, consulta, pagina=1, por_pagina=20):
+    """Uma página de ``queryset`` para campos de autocomplete: ``(objetos, tem_mais)``.
+
+    Com termo, os ids vêm do índice (ordem de relevância); sem termo, a
+    página sai em ordem de nome. Nos dois casos é lido um registro a mais em
+    vez de contar o total.
+    """
+    inicio = (pagina - 1) * por_pagina
+    fim = inicio + por_pagina
+    if termos(consulta):
+        ids = buscar(empresa_id, tipo, consulta, limite=fim + 1)
+        por_id = queryset.in_bulk(ids[inicio:fim])
+        return [por_id[pk] for pk in ids[inicio:fim] if pk in por_id], len(ids) > fim
+    objetos = list(queryset.order_by('nome')[inicio:fim + 1])
+    return objetos[:por_pagina], len(objetos) > por_pagina
+
+
+def _buscar_sem_indice(empresa_id, tipo, palavras, limite):
+    from django.db.models import Q
+
+    from .models import Person, Pet
+
+    modelo = Person if tipo == 'pessoa' else Pet
+    registros = modelo.objects.filter(ativo=True)
+    if empresa_id is not None:
+        registros = registros.filter(empresa_id=empresa_id)
+    for palavra in palavras:
+        registros = registros.filter(Q(nome__icontains=palavra) | Q(slug__icontains=palavra))
+    return list(registros.order_by('nome').values_list('pk', flat=True)[:limite])
+
+
+def reconstruir(empresa_id=None, lote=1000):
+    """Recria o índice (de uma empresa ou de todas); retorna quantas linhas foram indexadas"""
+    from .models import Person, Pet
+    from .utils import iterar_em_lotes
+
+    implementacao = backend()
+    if implementacao is None:
+        return 0
+    with connection.cursor() as cursor:
+        implementacao.limpar(cursor, empresa_id)
+    total = 0
+    for consulta in (Person.objects.filter(ativo=True), Pet.objects.filter(ativo=True).select_related('tutor')):
+        if empresa_id is not None:
+            consulta = consulta.filter(empresa_id=empresa_id)
+        for pagina in iterar_em_lotes(consulta, lote):
+            indexar(pagina)
+            total += len(pagina)
+    return total
+
+
+def criar_indice(schema_editor):
+    implementacao = backend(schema_editor.connection)
+    for sql in implementacao.criar_sql if implementacao else []:
+        schema_editor.execute(sql)
+
+
+def remover_indice(schema_editor):
+    implementacao = backend(schema_editor.connection)
+    for sql in implementacao.remover_sql if implementacao else []:
+        schema_editor.execute(sql)
@@ -0,0 +1,112 @@
+"""
+Serialização de cartões NFC para as APIs JSON.
+
+``cartoes_para_api`` busca, em uma única consulta, apenas as colunas usadas
+por ``serializar_cartao``. Com ``NFC_API_SNAPSHOT`` ativo, o JSON de cada
+cartão também fica gravado em ``NFCCard.payload_json`` e é atualizado pelos
+sinais dos modelos relacionados; as APIs então leem só essa coluna, sem os
+JOINs. O snapshot guarda o caminho da landing page e ``payload_da_resposta``
+completa a URL com o host da requisição, como na serialização ao vivo: o
+flag muda o custo da resposta, não o conteúdo.
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+
+from .models import NFCCard
+from .utils import iterar_em_lotes
+
+CAMPOS = (
+    'id', 'codigo_nfc', 'ativo', 'empresa_id', 'pessoa_id', 'pet_id',
+    'empresa__nome', 'empresa__slug',
+    'pessoa__nome', 'pessoa__slug', 'pessoa__email', 'pessoa__telefone',
+    'pessoa__cargo', 'pessoa__apresentacao', 'pessoa__foto',
+    'pet__nome', 'pet__slug', 'pet__especie', 'pet__raca', 'pet__foto', 'pet__tutor_id',
+    'pet__tutor__nome', 'pet__tutor__telefone',
+)
+
+
+def snapshot_ativo():
+    return getattr(settings, 'NFC_API_SNAPSHOT', False)
+
+
+def cartoes_para_api():
+    return NFCCard.objects.select_related('empresa', 'pessoa', 'pet', 'pet__tutor').only(*CAMPOS)
+
+
+def url_site(caminho):
+    return f"{getattr(settings, 'SITE_URL', 'http://localhost:8000').rstrip('/')}{caminho}"
+
+
+def serializar_cartao(cartao, montar_url=url_site):
+    """Payload público do cartão, ou None se ele não está associado.
+
+    ``montar_url`` transforma o caminho da landing page em URL absoluta
+    (ex.: ``request.build_absolute_uri``).
+    """
+    empresa = cartao.empresa
+    if cartao.pessoa_id:
+        pessoa = cartao.pessoa
+        return {
+            'tipo': 'pessoa',
+            'empresa': empresa.nome,
+            'empresa_slug': empresa.slug,
+            'nome': pessoa.nome,
+            'email': pessoa.email,
+            'telefone': pessoa.telefone,
+            'cargo': pessoa.cargo,
+            'apresentacao': pessoa.apresentacao,
+            'url': montar_url(reverse('person_detail', kwargs={'empresa_slug': empresa.slug, 'person_slug': pessoa.slug})),
+            'foto': pessoa.foto.url if pessoa.foto else None,
+        }
+    elif cartao.pet_id:
+        pet = cartao.pet
+        return {
+            'tipo': 'pet',
+            'empresa': empresa.nome,
+            'empresa_slug': empresa.slug,
+            'nome': pet.nome,
+            'especie': pet.get_especie_display(),
+            'raca': pet.raca,
+            'tutor': pet.tutor.nome,
+            'tutor_telefone': pet.tutor.telefone,
+            'url': montar_url(reverse('pet_detail', kwargs={'empresa_slug': empresa.slug, 'pet_slug': pet.slug})),
+            'foto': pet.foto.url if pet.foto else None,
+        }
+    return None
+
+
+def _caminho(caminho):
+    return caminho
+
+
+def gerar_snapshot(cartao):
+    payload = serializar_cartao(cartao, montar_url=_caminho)
+    if payload is None:
+        return ''
+    return json.dumps(payload, cls=DjangoJSONEncoder)
+
+
+def payload_da_resposta(snapshot, montar_url):
+    """Payload de um snapshot com a URL completada por ``montar_url`` (ex.: ``request.build_absolute_uri``)"""
+    payload = json.loads(snapshot)
+    payload['url'] = montar_url(payload['url'])
+    return payload
+
+
+def atualizar_snapshots(queryset, lote=500):
+    """Regrava ``payload_json`` dos cartões do queryset; retorna quantos foram gravados"""
+    total = 0
+    cartoes = queryset.select_related('empresa', 'pessoa', 'pet', 'pet__tutor').only(*CAMPOS, 'payload_json')
+    for pagina in iterar_em_lotes(cartoes, lote):
+        alterados = []
+        for cartao in pagina:
+            snapshot = gerar_snapshot(cartao)
+            if snapshot != cartao.payload_json:
+                cartao.payload_json = snapshot
+                alterados.append(cartao)
+        NFCCard.objects.bulk_update(alterados, ['payload_json'])
+        total += len(alterados)
+    return total
@@ -0,0 +1,107 @@
+"""
+Alocação de slugs únicos por empresa (``unique_together = ['empresa', 'slug']``).
+
+Em vez de testar ``slug``, ``slug-1``, ``slug-2``... com um ``exists()`` por
+tentativa, os slugs ocupados com o mesmo prefixo são lidos em uma única
+consulta (``slug__startswith``) e o próximo sufixo livre é escolhido em
+memória. Como dois saves simultâneos ainda podem escolher o mesmo slug,
+``salvar_com_slug`` grava dentro de um savepoint e realoca se o
+IntegrityError for da colisão de slug.
+
+``AlocadorSlugs`` é a versão em lote: carrega os slugs da empresa uma vez e
+aloca quantos forem necessários (ex.: importação).
+"""
+from django.db import IntegrityError, transaction
+from django.utils.text import slugify
+
+MAX_TENTATIVAS = 5
+
+# Deixa espaço para o sufixo numérico dentro do max_length do SlugField
+RESERVA_SUFIXO = 10
+
+
+def slug_base(texto, padrao, tamanho=100):
+    return slugify(texto)[:tamanho - RESERVA_SUFIXO].strip('-') or padrao
+
+
+def proximo_livre(base, usados, inicio=1):
+    """``base`` se livre, senão ``base-N`` com o menor N >= ``inicio`` livre"""
+    if base not in usados:
+        return base
+    numero = inicio
+    while f'{base}-{numero}' in usados:
+        numero += 1
+    return f'{base}-{numero}'
+
+
+def _tamanho(modelo):
+    return modelo._meta.get_field('slug').max_length
+
+
+def alocar_slug(modelo, empresa_id, texto, padrao):
+    """Slug livre para ``texto`` na empresa, com uma consulta"""
+    base = slug_base(texto, padrao, _tamanho(modelo))
+    usados = set(
+        modelo.objects.filter(empresa_id=empresa_id, slug__startswith=base).values_list('slug', flat=True)
+    )
+    return proximo_livre(base, usados)
+
+
+def salvar_com_slug(instancia, salvar, texto, padrao):
+    """Gera o slug de ``instancia`` (se vazio) e chama ``salvar``.
+
+    Se outro processo gravar o mesmo slug entre a alocação e o INSERT, o
+    savepoint é desfeito e um novo slug é alocado.
+    """
+    if instancia.slug:
+        return salvar()
+    modelo = type(instancia)
+    for tentativa in range(1, MAX_TENTATIVAS + 1):
+        instancia.slug = alocar_slug(modelo, instancia.empresa_id, texto, padrao)
+        try:
+            with transaction.atomic():
+                return salvar()
+        except IntegrityError:
+            colisao = modelo.objects.filter(empresa_id=instancia.empresa_id, slug=instancia.slug).exists()
+            instancia.slug = ''
+            if not colisao or tentativa == MAX_TENTATIVAS:
+                raise
+
+
+class AlocadorSlugs:
+    """Aloca slugs em memória contra todos os slugs da empresa, lidos uma vez"""
+
+    def __init__(self, modelo, empresa_id, padrao):
+        self.modelo = modelo
+        self.empresa_id = empresa_id
+        self.padrao = padrao
+        self.tamanho = _tamanho(modelo)
+        self.usados = set(self._existentes())
+        self._proximo = {}
+        self._origem = {}
+
+    def _existentes(self):
+        return self.modelo.objects.filter(empresa_id=self.empresa_id).values_list('slug', flat=True)
+
+    def alocar(self, texto):
+        base = slug_base(texto, self.padrao, self.tamanho)
+        slug = proximo_livre(base, self.usados, self._proximo.get(base, 1))
+        if slug != base:
+            self._proximo[base] = int(slug.rsplit('-', 1)[1]) + 1
+        self.usados.add(slug)
+        self._origem[slug] = texto
+        return slug
+
+    def alocar_varios(self, textos):
+        return [self.alocar(texto) for texto in textos]
+
+    def realocar(self, slugs):
+        """Depois de uma colisão com outro processo: relê o banco e realoca ``slugs``"""
+        self.usados.difference_update(slugs)
+        self.usados.update(self._existentes())
+        return [self.alocar(self._origem.pop(slug, slug)) for slug in slugs]
+
+
+def alocar_slugs(modelo, empresa_id, textos, padrao):
+    """Slugs livres e distintos para cada texto de ``textos``, com uma consulta"""
+    return AlocadorSlugs(modelo, empresa_id, padrao).alocar_varios(textos)
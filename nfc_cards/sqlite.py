@@ -0,0 +1,152 @@
+"""
+Modo de produção do SQLite (``NFC_SQLITE['PRODUCTION']``).
+
+Com vários workers do gunicorn no mesmo arquivo, o journal padrão
+(``DELETE``) bloqueia leituras durante as escritas e escritas concorrentes
+falham com "database is locked". Neste modo:
+
+- cada conexão nova recebe os PRAGMAs de ``pragmas()`` (ver o receiver de
+  ``connection_created`` em ``models.py``): journal ``WAL`` (leitores não
+  esperam o escritor), ``synchronous=NORMAL`` (sem fsync a cada commit;
+  seguro com WAL), ``mmap_size``, ``cache_size`` e ``busy_timeout`` (quem
+  encontra o lock espera em vez de falhar na hora);
+- as gravações em segundo plano (os toques de ``tap_events.py``) repetem
+  com espera exponencial quando o banco está ocupado.
+
+``Escritor`` é a thread de gravações em segundo plano do processo, usada em
+qualquer banco: cada worker do gunicorn tem a sua, que executa em série as
+gravações registradas, em lotes. Não há um escritor único entre processos;
+entre workers quem serializa é o lock do SQLite, com ``busy_timeout``. Os
+contadores (``counters.py``) continuam na transação da requisição.
+
+Em outros bancos, ou com o modo desligado, os PRAGMAs não são aplicados.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PADRAO = {
+    'PRODUCTION': False,
+    'BUSY_TIMEOUT': 5000,
+    'CACHE_SIZE_KB': 65536,
+    'MMAP_SIZE': 268435456,
+    'WRITER_INTERVAL': 1.0,
+    'WRITER_TENTATIVAS': 5,
+}
+
+
+def _config():
+    config = dict(CONFIG_PADRAO)
+    config.update(getattr(settings, 'NFC_SQLITE', {}))
+    return config
+
+
+def ativo(conexao=None):
+    """True com o modo de produção ligado e o banco em SQLite"""
+    return _config()['PRODUCTION'] and (conexao or connection).vendor == 'sqlite'
+
+
+def pragmas():
+    config = _config()
+    return [
+        'PRAGMA journal_mode = WAL',
+        'PRAGMA synchronous = NORMAL',
+        f"PRAGMA busy_timeout = {int(config['BUSY_TIMEOUT'])}",
+        # Negativo: tamanho em KiB, não em páginas
+        f"PRAGMA cache_size = -{int(config['CACHE_SIZE_KB'])}",
+        f"PRAGMA mmap_size = {int(config['MMAP_SIZE'])}",
+        'PRAGMA temp_store = MEMORY',
+    ]
+
+
+def configurar_conexao(conexao):
+    if not ativo(conexao):
+        return
+    with conexao.cursor() as cursor:
+        for pragma in pragmas():
+            cursor.execute(pragma)
+
+
+def _ocupado(erro):
+    mensagem = str(erro).lower()
+    return 'locked' in mensagem or 'busy' in mensagem
+
+
+def com_retentativa(funcao, tentativas=None):
+    """Executa ``funcao`` repetindo com espera exponencial enquanto o banco estiver ocupado"""
+    tentativas = tentativas or _config()['WRITER_TENTATIVAS']
+    for tentativa in range(tentativas):
+        try:
+            return funcao()
+        except OperationalError as erro:
+            if not _ocupado(erro) or tentativa == tentativas - 1:
+                raise
+            time.sleep(0.05 * 2 ** tentativa)
+
+
+class Escritor:
+    """Thread de segundo plano do processo, que executa as gravações registradas em série"""
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self._gravacoes = []
+        self._acordar = threading.Event()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def registrar(self, funcao):
+        """Registra ``funcao`` (sem argumentos) para rodar a cada ciclo"""
+        self._gravacoes.append(funcao)
+        return funcao
+
+    def acordar(self, imediato=False):
+        self._garantir_thread()
+        if imediato:
+            self._acordar.set()
+
+    def _garantir_thread(self):
+        # Após um fork (workers do gunicorn) a thread do processo pai não existe
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._executar, name='sqlite-writer', daemon=True)
+            self._thread.start()
+
+    def _executar(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Executa todas as gravações registradas, uma de cada vez"""
+        with self._flush_lock:
+            for funcao in self._gravacoes:
+                try:
+                    com_retentativa(funcao)
+                except Exception:
+                    logger.exception('Falha na gravação em segundo plano %s', funcao.__qualname__)
+
+
+escritor = Escritor(intervalo=_config()['WRITER_INTERVAL'])
+
+
+@atexit.register
+def _flush_ao_encerrar():
+    escritor.flush()
@@ -0,0 +1,159 @@
+"""
+Cache de resolução de toques NFC (código → URL de destino).
+
+Cada toque físico passa por ``nfc_redirect``/``nfc_redirect_empresa``. A
+resposta quase nunca muda, então guardamos o destino final em duas camadas:
+
+1. um LRU com TTL curto por processo (worker do gunicorn), sem I/O;
+2. o backend de cache compartilhado do Django (``CACHES``).
+
+A invalidação acontece pelos sinais de ``NFCCard``, ``Person``, ``Pet`` e
+``Empresa`` (ver ``models.py``). Ela limpa o LRU do processo atual e o cache
+compartilhado; os LRUs dos demais workers expiram pelo TTL local.
+
+Com um backend isolado por processo (``LocMemCache``) a segunda camada também
+não é compartilhada: nesse caso ela usa o mesmo TTL curto do LRU, senão os
+outros workers redirecionariam para o dono antigo por até ``TIMEOUT``.
+"""
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .utils import cache_isolado
+
+_AUSENTE = object()
+
+CONFIG_PADRAO = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60 * 60,
+    'LOCAL_MAXSIZE': 2048,
+    'LOCAL_TTL': 30,
+}
+
+
+def _config():
+    config = dict(CONFIG_PADRAO)
+    config.update(getattr(settings, 'NFC_TAP_CACHE', {}))
+    return config
+
+
+class LRUComTTL:
+    """LRU thread-safe com expiração por entrada"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            item = self._dados.get(chave, _AUSENTE)
+            if item is _AUSENTE:
+                return _AUSENTE
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                return _AUSENTE
+            self._dados.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+
+    def delete(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+
+_config_inicial = _config()
+cache_local = LRUComTTL(_config_inicial['LOCAL_MAXSIZE'], _config_inicial['LOCAL_TTL'])
+
+
+def normalizar_codigo(codigo):
+    """Mesma normalização aplicada em ``NFCCard.save``"""
+    return str(codigo).strip().upper()
+
+
+def _chave(codigo):
+    return f"nfc:toque:{quote(codigo, safe='')}"
+
+
+def _cache_compartilhado():
+    return caches[_config()['CACHE_ALIAS']]
+
+
+def _timeout():
+    config = _config()
+    return config['LOCAL_TTL'] if cache_isolado(config['CACHE_ALIAS']) else config['TIMEOUT']
+
+
+def _resolver_no_banco(codigo):
+    from .models import NFCCard
+
+    try:
+        cartao = NFCCard.objects.select_related('empresa', 'pessoa', 'pet').get(
+            codigo_nfc=codigo, ativo=True
+        )
+    except NFCCard.DoesNotExist:
+        return None
+    return {
+        'url': cartao.get_target_url(),
+        'cartao_id': str(cartao.pk),
+        'empresa_id': cartao.empresa_id,
+        'empresa_slug': cartao.empresa.slug,
+        'empresa_ativa': cartao.empresa.ativo,
+    }
+
+
+def resolver_toque(codigo):
+    """Retorna o destino de um código NFC ativo ou ``None`` se não existir.
+
+    O dicionário retornado contém ``url`` (``None`` quando o cartão não está
+    associado a pessoa/pet), ``cartao_id``, ``empresa_id``, ``empresa_slug``
+    e ``empresa_ativa``. Em um toque "quente" nenhuma consulta é feita.
+    """
+    codigo = normalizar_codigo(codigo)
+    chave = _chave(codigo)
+
+    toque = cache_local.get(chave)
+    if toque is not _AUSENTE:
+        return toque
+
+    compartilhado = _cache_compartilhado()
+    toque = compartilhado.get(chave)
+    if toque is None:
+        toque = _resolver_no_banco(codigo)
+        if toque is None:
+            # Códigos inexistentes não são cacheados: um cartão criado em
+            # seguida precisa funcionar no primeiro toque.
+            return None
+        compartilhado.set(chave, toque, _timeout())
+
+    cache_local.set(chave, toque)
+    return toque
+
+
+def invalidar_codigos(codigos):
+    """Remove os códigos informados das duas camadas de cache"""
+    chaves = [_chave(normalizar_codigo(codigo)) for codigo in codigos if codigo]
+    if not chaves:
+        return
+    for chave in chaves:
+        cache_local.delete(chave)
+    _cache_compartilhado().delete_many(chaves)
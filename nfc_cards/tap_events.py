@@ -0,0 +1,155 @@
+"""
+Registro assíncrono de toques NFC.
+
+As views de redirecionamento apenas enfileiram um evento compacto em memória
+(sem I/O). O ``flush`` fica registrado no escritor em segundo plano do
+processo (``sqlite.escritor``), que grava os eventos com ``bulk_create`` em
+lotes a cada ``NFC_SQLITE['WRITER_INTERVAL']`` segundos, ou logo que um lote
+enche. Assim o caminho do toque nunca disputa o lock de escrita do SQLite. A
+fila é limitada: quando ela enche, o evento é descartado e contabilizado em
+``estatisticas()['descartados']``.
+"""
+import logging
+import queue
+import threading
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import sqlite
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PADRAO = {
+    'ENABLED': True,
+    'MAX_QUEUE': 10000,
+    'BATCH_SIZE': 500,
+    'BACKGROUND': True,
+}
+
+_ROBOS = ('bot', 'crawler', 'spider', 'slurp', 'curl', 'wget', 'python-requests', 'httpclient')
+
+
+def _config():
+    config = dict(CONFIG_PADRAO)
+    config.update(getattr(settings, 'NFC_TAP_EVENTS', {}))
+    return config
+
+
+def classificar_user_agent(user_agent):
+    ua = (user_agent or '').lower()
+    if not ua:
+        return 'outro'
+    if any(robo in ua for robo in _ROBOS):
+        return 'bot'
+    if 'android' in ua:
+        return 'android'
+    if 'iphone' in ua or 'ipad' in ua or 'ipod' in ua:
+        return 'ios'
+    if 'windows' in ua or 'macintosh' in ua or 'x11' in ua or 'linux' in ua:
+        return 'desktop'
+    return 'outro'
+
+
+def classificar_referencia(request):
+    """Toques NFC normalmente chegam sem Referer ("direto")"""
+    referer = request.META.get('HTTP_REFERER')
+    if not referer:
+        return 'direto'
+    if urlsplit(referer).netloc == request.get_host():
+        return 'interno'
+    return 'externo'
+
+
+class TapEventBuffer:
+    """Fila limitada de eventos com gravação em lote"""
+
+    def __init__(self, max_fila, tamanho_lote, em_segundo_plano=True):
+        self.tamanho_lote = tamanho_lote
+        self.em_segundo_plano = em_segundo_plano
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._contadores = {'enfileirados': 0, 'descartados': 0, 'gravados': 0, 'falhas': 0}
+
+    def _incrementar(self, nome, quantidade=1):
+        with self._lock:
+            self._contadores[nome] += quantidade
+
+    def estatisticas(self):
+        with self._lock:
+            dados = dict(self._contadores)
+        dados['pendentes'] = self._fila.qsize()
+        return dados
+
+    def registrar(self, evento):
+        """Enfileira um dicionário com os campos de ``TapEvent``; nunca bloqueia"""
+        try:
+            self._fila.put_nowait(evento)
+        except queue.Full:
+            self._incrementar('descartados')
+            return False
+        self._incrementar('enfileirados')
+        if self.em_segundo_plano:
+            sqlite.escritor.acordar(imediato=self._fila.qsize() >= self.tamanho_lote)
+        return True
+
+    def _retirar_lote(self):
+        lote = []
+        while len(lote) < self.tamanho_lote:
+            try:
+                lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def flush(self):
+        """Grava todos os eventos pendentes e retorna quantos foram gravados"""
+        from .models import TapEvent
+
+        gravados = 0
+        with self._flush_lock:
+            while True:
+                lote = self._retirar_lote()
+                if not lote:
+                    break
+                try:
+                    # Com vários workers no SQLite o lock de escrita pode estar com outro processo
+                    sqlite.com_retentativa(
+                        lambda: TapEvent.objects.bulk_create([TapEvent(**evento) for evento in lote])
+                    )
+                except Exception:
+                    self._incrementar('falhas', len(lote))
+                    logger.exception('Falha ao gravar %d toques NFC', len(lote))
+                    continue
+                gravados += len(lote)
+                self._incrementar('gravados', len(lote))
+        return gravados
+
+
+_config_inicial = _config()
+buffer = TapEventBuffer(
+    max_fila=_config_inicial['MAX_QUEUE'],
+    tamanho_lote=_config_inicial['BATCH_SIZE'],
+    em_segundo_plano=_config_inicial['BACKGROUND'],
+)
+# Também grava os pendentes no encerramento do processo (atexit em sqlite.py)
+sqlite.escritor.registrar(buffer.flush)
+
+
+def registrar_toque(request, toque):
+    """Enfileira um toque resolvido por ``tap_cache.resolver_toque``"""
+    if not _config()['ENABLED']:
+        return False
+    return buffer.registrar({
+        'cartao_id': toque['cartao_id'],
+        'empresa_id': toque['empresa_id'],
+        'criado_em': timezone.now(),
+        'user_agent': classificar_user_agent(request.META.get('HTTP_USER_AGENT')),
+        'referencia': classificar_referencia(request),
+    })
+
+
+def estatisticas():
+    return buffer.estatisticas()
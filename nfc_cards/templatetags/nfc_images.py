@@ -0,0 +1,34 @@
+from django import template
+from django.utils.html import format_html
+
+from nfc_cards.images import url_derivado
+
+register = template.Library()
+
+
+@register.filter
+def variante(arquivo, nome):
+    """URL JPEG da variante (``thumb``, ``card`` ou ``full``) ou do original.
+
+    Uso: ``{{ person.foto|variante:"thumb" }}``
+    """
+    if not arquivo:
+        return ''
+    return url_derivado(arquivo, nome) or arquivo.url
+
+
+@register.simple_tag
+def imagem(arquivo, nome='card', alt='', **atributos):
+    """``<picture>`` com WebP e JPEG de fallback, ou ``<img>`` do original.
+
+    Uso: ``{% imagem person.foto "thumb" alt=person.nome class="rounded-circle" %}``
+    """
+    if not arquivo:
+        return ''
+    extras = format_html(''.join(f' {chave}="{{}}"' for chave in atributos), *atributos.values())
+    jpg = url_derivado(arquivo, nome, 'jpg')
+    if jpg is None:
+        return format_html('<img src="{}" alt="{}" loading="lazy"{}>', arquivo.url, alt, extras)
+    webp = url_derivado(arquivo, nome, 'webp')
+    fonte = format_html('<source type="image/webp" srcset="{}">', webp) if webp else ''
+    return format_html('<picture>{}<img src="{}" alt="{}" loading="lazy"{}></picture>', fonte, jpg, alt, extras)
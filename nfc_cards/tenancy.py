@@ -0,0 +1,107 @@
+"""
+Resolução da empresa (tenant) da requisição.
+
+As views com ``<empresa_slug>`` na URL buscavam a mesma ``Empresa`` duas ou
+três vezes por requisição. ``EmpresaMiddleware`` resolve o slug uma única vez
+e guarda o resultado em ``request.empresa`` (``None`` se não existir). A
+busca passa por um cache slug → empresa no backend compartilhado, invalidado
+pelos sinais de ``Empresa`` (ver ``models.py``); assim a resolução custa no
+máximo uma consulta e, normalmente, nenhuma. Com um backend isolado por
+processo (``LocMemCache``) a invalidação não chega aos outros workers, então
+as entradas usam ``LOCAL_TIMEOUT`` (segundos) em vez de ``TIMEOUT``.
+
+Views de classe usam ``EmpresaDaRequisicaoMixin`` (``self.empresa``) e views
+de função, ``empresa_ativa_ou_404``.
+"""
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404
+from django.utils.functional import cached_property
+
+from .utils import cache_isolado
+
+CONFIG_PADRAO = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60 * 60,
+    'LOCAL_TIMEOUT': 30,
+}
+
+# Marca de "slug inexistente" no cache (None é o retorno de cache.get para ausência)
+_INEXISTENTE = 0
+
+
+def _config():
+    config = dict(CONFIG_PADRAO)
+    config.update(getattr(settings, 'NFC_TENANT_CACHE', {}))
+    return config
+
+
+def _cache():
+    return caches[_config()['CACHE_ALIAS']]
+
+
+def _timeout():
+    config = _config()
+    return config['LOCAL_TIMEOUT'] if cache_isolado(config['CACHE_ALIAS']) else config['TIMEOUT']
+
+
+def _chave(slug):
+    return f"nfc:empresa:{quote(slug)}"
+
+
+def empresa_por_slug(slug):
+    """Empresa (ativa ou não) com o slug, ou None"""
+    from .models import Empresa
+
+    cache = _cache()
+    chave = _chave(slug)
+    empresa = cache.get(chave)
+    if empresa is None:
+        empresa = Empresa.objects.filter(slug=slug).first()
+        cache.set(chave, empresa if empresa is not None else _INEXISTENTE, _timeout())
+    return empresa or None
+
+
+def invalidar(*slugs):
+    chaves = [_chave(slug) for slug in set(slugs) if slug]
+    if chaves:
+        _cache().delete_many(chaves)
+
+
+def empresa_da_requisicao(request, slug):
+    """``request.empresa`` se o middleware já resolveu este slug; senão busca pelo slug"""
+    if getattr(request, 'empresa_slug', None) == slug:
+        return request.empresa
+    return empresa_por_slug(slug)
+
+
+def empresa_ativa_ou_404(request, slug):
+    empresa = empresa_da_requisicao(request, slug)
+    if empresa is None or not empresa.ativo:
+        raise Http404('Empresa não encontrada.')
+    return empresa
+
+
+class EmpresaMiddleware:
+    """Define ``request.empresa`` a partir do ``empresa_slug`` da URL"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        slug = view_kwargs.get('empresa_slug')
+        request.empresa_slug = slug
+        request.empresa = empresa_por_slug(slug) if slug else None
+
+
+class EmpresaDaRequisicaoMixin:
+    """``self.empresa``: a empresa ativa da URL, resolvida uma vez por requisição"""
+
+    @cached_property
+    def empresa(self):
+        return empresa_ativa_ou_404(self.request, self.kwargs['empresa_slug'])
@@ -1,3 +1,730 @@
-from django.test import TestCase
+import json
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from card_nfc_project.database import banco_de_dados
+
+from nfc_cards import analytics, counters, exports, imports, jobs, page_cache, pagination, provisioning, qr, search, slugs, sqlite, tap_cache, tenancy
+from nfc_cards.models import Empresa, Job, NFCCard, Person, Pet, TapEvent, TapRollup, TapRollupCheckpoint
+from nfc_cards.admin import PersonAdmin
+from nfc_cards.pagination import ContagemEstimadaPaginator
+from nfc_cards.tap_events import TapEventBuffer
+
+MEDIA_TESTES = tempfile.mkdtemp(prefix='cards_nfc_testes_')
+
+
+def criar_pessoa(empresa, nome, **campos):
+    campos.setdefault('email', 'contato@example.com')
+    campos.setdefault('telefone', '11999999999')
+    campos.setdefault('apresentacao', 'Olá')
+    return Person.objects.create(empresa=empresa, nome=nome, **campos)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, NFC_JOBS={'EAGER': False})
+class TapCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tap_cache.cache_local.clear()
+        self.empresa = Empresa.objects.create(nome='Acme')
+        self.ana = criar_pessoa(self.empresa, 'Ana')
+        self.bia = criar_pessoa(self.empresa, 'Bia')
+        self.cartao = NFCCard.objects.create(codigo_nfc='abc1', pessoa=self.ana, tipo='pessoa')
+
+    def test_troca_de_dono_invalida_o_destino(self):
+        self.assertEqual(tap_cache.resolver_toque('ABC1')['url'], f'/{self.empresa.slug}/pessoas/{self.ana.slug}/')
+        self.cartao.pessoa = self.bia
+        self.cartao.save()
+        self.assertEqual(tap_cache.resolver_toque('abc1')['url'], f'/{self.empresa.slug}/pessoas/{self.bia.slug}/')
+
+    def test_cartao_desativado_deixa_de_resolver(self):
+        self.assertIsNotNone(tap_cache.resolver_toque('ABC1'))
+        self.cartao.ativo = False
+        self.cartao.save()
+        self.assertIsNone(tap_cache.resolver_toque('ABC1'))
+
+    def test_qr_imutavel_apenas_com_versao(self):
+        url = f'/{self.empresa.slug}/nfc/ABC1/qr.svg'
+        self.assertEqual(self.client.get(url)['Cache-Control'], 'public, max-age=300')
+        response = self.client.get(url, {'v': self.cartao.qr_versao})
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, {'v': 'antiga'})['Cache-Control'], 'public, max-age=300')
+        with self.settings(SITE_URL='https://cartoes.example.com'):
+            self.assertNotEqual(qr.versao_qr(self.cartao.get_qr_url()), response.wsgi_request.GET['v'])
+
+    def test_cartoes_da_pagina_sem_consulta_por_cartao(self):
+        self.client.force_login(User.objects.create_user('equipe'))
+        url = f'/{self.empresa.slug}/pessoas/{self.ana.slug}/'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as um_cartao:
+            self.client.get(url)
+        NFCCard.objects.create(codigo_nfc='abc2', pessoa=self.ana, tipo='pessoa')
+        NFCCard.objects.create(codigo_nfc='abc3', pessoa=self.ana, tipo='pessoa', ativo=False)
+        with self.assertNumQueries(len(um_cartao)):
+            response = self.client.get(url)
+        self.assertContains(response, 'ABC2')
+        self.assertNotContains(response, 'ABC3')
+
+    def test_snapshot_responde_igual_a_serializacao(self):
+        url = '/api/nfc/ABC1/'
+        ao_vivo = self.client.get(url, HTTP_HOST='outro.example.com').json()
+        with self.settings(NFC_API_SNAPSHOT=True, SITE_URL='https://cartoes.example.com'):
+            self.cartao.save()
+            self.assertTrue(NFCCard.objects.get(pk=self.cartao.pk).payload_json)
+            self.assertEqual(self.client.get(url, HTTP_HOST='outro.example.com').json(), ao_vivo)
+        self.assertTrue(ao_vivo['url'].startswith('http://outro.example.com/'))
+
+    def test_api_em_lote_com_erros_por_codigo_e_limite(self):
+        url = f'/{self.empresa.slug}/api/nfc/lote/'
+        outra = Empresa.objects.create(nome='Outra')
+        NFCCard.objects.create(codigo_nfc='xyz9', pessoa=criar_pessoa(outra, 'Caio'), tipo='pessoa')
+        response = self.client.post(url, {'codigos': ['ABC1', 'nada', 'XYZ9']}, content_type='application/json')
+        cartoes = response.json()['cartoes']
+        self.assertEqual(list(cartoes), ['ABC1', 'nada', 'XYZ9'])
+        self.assertEqual(cartoes['ABC1'], self.client.get('/api/nfc/ABC1/').json())
+        self.assertEqual(cartoes['nada'], {'error': 'Código NFC não encontrado'})
+        self.assertIn('error', cartoes['XYZ9'])
+        self.assertNotIn('error', self.client.get('/api/nfc/lote/', {'codigos': 'xyz9'}).json()['cartoes']['xyz9'])
+        with self.settings(NFC_API_LOTE_MAXIMO=2):
+            self.assertEqual(self.client.get(url, {'codigos': 'abc1,b,c'}).status_code, 400)
+            self.assertEqual(self.client.get(url, {'codigos': 'abc1,abc1,b'}).status_code, 200)
+
+    def test_empresa_renomeada_ou_desativada(self):
+        slug = self.empresa.slug
+        self.assertEqual(tenancy.empresa_por_slug(slug), self.empresa)
+        self.empresa.slug = 'acme-nova'
+        self.empresa.save()
+        self.assertIsNone(tenancy.empresa_por_slug(slug))
+        self.assertEqual(tenancy.empresa_por_slug('acme-nova'), self.empresa)
+        self.empresa.ativo = False
+        self.empresa.save()
+        self.assertFalse(tenancy.empresa_por_slug('acme-nova').ativo)
+        self.assertEqual(self.client.get(f'/acme-nova/pessoas/{self.ana.slug}/').status_code, 404)
+
+    def test_cache_isolado_usa_ttl_curto(self):
+        self.assertEqual(tap_cache._timeout(), tap_cache._config()['LOCAL_TTL'])
+        self.assertEqual(tenancy._timeout(), tenancy._config()['LOCAL_TIMEOUT'])
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': tempfile.mkdtemp(),
+        }}):
+            self.assertEqual(tap_cache._timeout(), tap_cache._config()['TIMEOUT'])
+            self.assertEqual(tenancy._timeout(), tenancy._config()['TIMEOUT'])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, NFC_JOBS={'EAGER': False})
+class BufferToquesTests(TestCase):
+    def setUp(self):
+        empresa = Empresa.objects.create(nome='Acme')
+        self.cartao = NFCCard.objects.create(codigo_nfc='abc1', pessoa=criar_pessoa(empresa, 'Ana'), tipo='pessoa')
+        self.buffer = TapEventBuffer(max_fila=3, tamanho_lote=2, em_segundo_plano=False)
+
+    def _evento(self):
+        return {
+            'cartao_id': self.cartao.pk, 'empresa_id': self.cartao.empresa_id,
+            'criado_em': timezone.now(), 'user_agent': 'android', 'referencia': 'direto',
+        }
+
+    def test_fila_cheia_descarta_e_flush_grava_em_lotes(self):
+        self.assertEqual([self.buffer.registrar(self._evento()) for _ in range(4)], [True, True, True, False])
+        self.assertEqual(self.buffer.estatisticas()['descartados'], 1)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(TapEvent.objects.count(), 3)
+        estatisticas = self.buffer.estatisticas()
+        self.assertEqual((estatisticas['gravados'], estatisticas['pendentes']), (3, 0))
+        self.assertTrue(self.buffer.registrar(self._evento()))
+
+    def test_falha_na_gravacao_e_contabilizada(self):
+        evento = self._evento()
+        evento['cartao_id'] = None
+        self.buffer.registrar(evento)
+        with self.assertLogs('nfc_cards.tap_events', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.estatisticas()['falhas'], 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, NFC_JOBS={'EAGER': False})
+class CompactacaoToquesTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Acme')
+        self.cartao = NFCCard.objects.create(codigo_nfc='abc1', pessoa=criar_pessoa(self.empresa, 'Ana'), tipo='pessoa')
+
+    def _toques(self, quantidade, criado_em):
+        TapEvent.objects.bulk_create([
+            TapEvent(cartao=self.cartao, empresa=self.empresa, criado_em=criado_em, user_agent='android', referencia='direto')
+            for _ in range(quantidade)
+        ])
+
+    def _total(self, escopo='empresa', objeto_id=None):
+        return sum(TapRollup.objects.filter(
+            escopo=escopo, granularidade='dia', objeto_id=str(objeto_id or self.empresa.pk),
+        ).values_list('total', flat=True))
+
+    def test_consolida_em_lotes_de_forma_incremental(self):
+        antigo = timezone.now() - timedelta(hours=3)
+        self._toques(5, antigo)
+        self.assertEqual(analytics.compactar_toques(tamanho_lote=2), (5, 18))
+        self._toques(2, antigo)
+        analytics.compactar_toques()
+        self.assertEqual(self._total(), 7)
+        self.assertEqual(self._total('cartao', self.cartao.pk), 7)
+        self.assertIsNone(analytics.compactar_lote())
+
+    def test_toques_recentes_ficam_para_depois(self):
+        self._toques(3, timezone.now() - timedelta(hours=1))
+        self._toques(2, timezone.now())
+        # Evento antigo gravado depois de um recente (lote de outro worker)
+        self._toques(1, timezone.now() - timedelta(hours=1))
+        eventos, _ = analytics.compactar_toques()
+        self.assertEqual(eventos, 3)
+        primeiro_recente = TapEvent.objects.filter(criado_em__gte=timezone.now() - timedelta(minutes=1)).order_by('id').first()
+        self.assertEqual(TapRollupCheckpoint.objects.get().ultimo_evento_id, primeiro_recente.pk - 1)
+
+        analytics.compactar_toques(atraso=0)
+        self.assertEqual(self._total(), 6)
+
+    def test_poda_apenas_eventos_consolidados(self):
+        self._toques(2, timezone.now() - timedelta(days=100))
+        self.assertEqual(analytics.podar_eventos(90), 0)
+        analytics.compactar_toques()
+        self.assertEqual(analytics.podar_eventos(90), 2)
+        self.assertEqual(self._total(), 2)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, NFC_JOBS={'EAGER': False}, NFC_SQLITE={'PRODUCTION': False})
+class CadastroTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Acme')
+        self.ana = criar_pessoa(self.empresa, 'Ana')
+
+    def test_slugs_por_empresa(self):
+        self.assertEqual(self.ana.slug, 'ana')
+        self.assertEqual(criar_pessoa(self.empresa, 'Ana').slug, 'ana-1')
+        self.assertEqual(criar_pessoa(Empresa.objects.create(nome='Outra'), 'Ana').slug, 'ana')
+
+    def test_colisao_de_slug_realoca(self):
+        # Simula outro processo gravando "ana" entre a alocação e o INSERT
+        respostas = iter(['ana'])
+        alocar = slugs.alocar_slug
+        with mock.patch.object(slugs, 'alocar_slug', side_effect=lambda *args: next(respostas, None) or alocar(*args)) as alocador:
+            pessoa = criar_pessoa(self.empresa, 'Ana')
+        self.assertEqual((pessoa.slug, alocador.call_count), ('ana-1', 2))
+
+    def test_alocacao_em_lote(self):
+        alocador = slugs.AlocadorSlugs(Person, self.empresa.pk, 'pessoa')
+        self.assertEqual(alocador.alocar_varios(['Ana', 'Ana', 'Bia', '']), ['ana-1', 'ana-2', 'bia', 'pessoa'])
+        criar_pessoa(self.empresa, 'Bia', slug='bia')
+        self.assertEqual(alocador.realocar(['bia']), ['bia-1'])
+
+    def test_contadores_acompanham_ativacao_e_exclusao(self):
+        bia = criar_pessoa(self.empresa, 'Bia')
+        Pet.objects.create(empresa=self.empresa, tutor=bia, nome='Rex', especie='cao')
+        self.assertEqual(counters.totais(self.empresa.pk), {'pessoas': 2, 'pets': 1, 'cartoes': 0})
+        bia.ativo = False
+        bia.save()
+        self.assertEqual(counters.totais(self.empresa.pk)['pessoas'], 1)
+        bia.ativo = True
+        bia.save()
+        cartao = NFCCard.objects.create(codigo_nfc='abc1', pessoa=bia, tipo='pessoa')
+        self.assertEqual(counters.totais()['cartoes'], 1)
+        cartao.ativo = False
+        cartao.save()
+        self.assertEqual(counters.totais()['cartoes'], 0)
+        self.ana.delete()
+        self.assertEqual(counters.totais(self.empresa.pk)['pessoas'], 1)
+        bia.delete()
+        self.assertEqual(counters.totais(self.empresa.pk), {'pessoas': 0, 'pets': 0, 'cartoes': 0})
+        self.assertEqual(counters.totais(), counters.contar())
+        self.assertEqual(counters.reconciliar(), [])
+
+    def test_migracoes_criam_indices_parciais(self):
+        esperados = {
+            'nfc_cards_empresa': {'empresa_ativa_nome_idx': ['nome']},
+            'nfc_cards_nfccard': {'nfccard_ativo_recentes_idx': ['empresa_id', 'criado_em', 'id']},
+            'nfc_cards_person': {
+                'person_ativa_nome_idx': ['empresa_id', 'nome', 'id'],
+                'person_ativa_recentes_idx': ['empresa_id', 'criado_em', 'id'],
+            },
+            'nfc_cards_pet': {
+                'pet_ativo_nome_idx': ['empresa_id', 'nome', 'id'],
+                'pet_ativo_recentes_idx': ['empresa_id', 'criado_em', 'id'],
+            },
+        }
+        consulta = {
+            'sqlite': "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = %s",
+            'postgresql': 'SELECT indexdef FROM pg_indexes WHERE indexname = %s',
+        }[connection.vendor]
+        with connection.cursor() as cursor:
+            for tabela, indices in esperados.items():
+                restricoes = connection.introspection.get_constraints(cursor, tabela)
+                for nome, colunas in indices.items():
+                    self.assertEqual(restricoes[nome]['columns'], colunas)
+                    cursor.execute(consulta, [nome])
+                    self.assertRegex(cursor.fetchone()[0], r'WHERE.*"?ativo"?')
+        call_command('makemigrations', 'nfc_cards', '--check', '--dry-run', stdout=StringIO())
+
+    def test_paginacao_por_cursor_ida_e_volta(self):
+        for nome in ('Bia', 'Caio', 'Duda', 'Edu'):
+            criar_pessoa(self.empresa, nome)
+        # Mesmo criado_em para todos: o desempate fica com a PK
+        Person.objects.update(criado_em=timezone.now())
+        pessoas = Person.objects.filter(empresa=self.empresa)
+        for ordem, esperado in (('nome', ['Ana', 'Bia', 'Caio', 'Duda', 'Edu']),
+                                ('recentes', ['Edu', 'Duda', 'Caio', 'Bia', 'Ana'])):
+            paginas, pagina = [], pagination.paginar(pessoas, ordem, por_pagina=2)
+            while True:
+                paginas.append([pessoa.nome for pessoa in pagina])
+                if not pagina.has_next():
+                    break
+                pagina = pagination.paginar(pessoas, ordem, pagina.proximo, por_pagina=2)
+            self.assertEqual(paginas, [esperado[:2], esperado[2:4], esperado[4:]])
+            self.assertFalse(pagina.has_next())
+            voltando = []
+            while pagina.has_previous():
+                pagina = pagination.paginar(pessoas, ordem, pagina.anterior, por_pagina=2)
+                voltando.append([pessoa.nome for pessoa in pagina])
+            self.assertEqual(voltando, paginas[-2::-1])
+        with self.assertRaises(pagination.CursorInvalido):
+            pagination.paginar(pessoas, 'nome', 'lixo')
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_estima_total_so_com_filtro_de_empresa(self):
+        for nome in ('Bia', 'Caio', 'Duda', 'Edu'):
+            criar_pessoa(self.empresa, nome)
+        criar_pessoa(Empresa.objects.create(nome='Outra'), 'Fabi')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'senha'))
+        url = '/admin/nfc_cards/person/'
+        with mock.patch.object(ContagemEstimadaPaginator, 'limite_contagem', 3), \
+                mock.patch.object(PersonAdmin, 'list_per_page', 2):
+            response = self.client.get(url, {'empresa__id__exact': self.empresa.pk})
+            self.assertEqual(response.context['cl'].result_count, 5)
+            self.assertNotContains(response, '3+ Pessoas')
+
+            response = self.client.get(url, {'ativo__exact': '1'})
+            self.assertEqual(response.context['cl'].result_count, 4)
+            self.assertContains(response, '3+ Pessoas')
+            self.assertContains(response, 'Próxima')
+            self.assertNotContains(response, 'Anterior')
+
+            response = self.client.get(url, {'ativo__exact': '1', 'p': '3'})
+            self.assertEqual(len(response.context['cl'].result_list), 2)
+            self.assertContains(response, 'Anterior')
+            self.assertNotContains(response, 'Próxima')
+
+            self.assertEqual(self.client.get(url, {'ativo__exact': '0'}).context['cl'].result_count, 0)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, NFC_JOBS={'EAGER': False})
+class BuscaTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Acme')
+        self.outra = Empresa.objects.create(nome='Outra')
+        self.joao = criar_pessoa(self.empresa, 'João Silva')
+        self.intruso = criar_pessoa(self.outra, 'João Souza')
+        self.usuario = User.objects.create_user('equipe')
+        self.usuario.profile.empresa = self.empresa
+        self.usuario.profile.save()
+
+    def _autocomplete(self, empresa, termo=''):
+        return self.client.get(f'/{empresa.slug}/api/autocomplete/pessoas/', {'q': termo})
+
+    def test_busca_sem_acentos_por_prefixo_e_na_empresa(self):
+        maria = criar_pessoa(self.empresa, 'Maria Silveira')
+        rex = Pet.objects.create(empresa=self.empresa, tutor=maria, nome='Rex', especie='cao')
+        self.assertEqual(search.buscar(self.empresa.pk, 'pessoa', 'joao'), [self.joao.pk])
+        self.assertEqual(search.buscar(self.empresa.pk, 'pessoa', 'JOÃO si'), [self.joao.pk])
+        self.assertEqual(sorted(search.buscar(self.empresa.pk, 'pessoa', 'sil')), [self.joao.pk, maria.pk])
+        self.assertEqual(search.buscar(self.outra.pk, 'pessoa', 'joao'), [self.intruso.pk])
+        self.assertEqual(search.buscar(self.empresa.pk, 'pet', 'silveira'), [rex.pk])
+        maria.nome = 'Maria Souza'
+        maria.save()
+        self.assertEqual(search.buscar(self.empresa.pk, 'pessoa', 'souza'), [maria.pk])
+        self.joao.ativo = False
+        self.joao.save()
+        self.assertEqual(search.buscar(self.empresa.pk, 'pessoa', 'joao'), [])
+
+    def test_autocomplete_restrito_a_empresa_do_usuario(self):
+        self.client.force_login(self.usuario)
+        for termo in ('', 'joao'):
+            resultados = self._autocomplete(self.empresa, termo).json()['results']
+            self.assertEqual([item['id'] for item in resultados], [self.joao.pk])
+        self.assertEqual(self._autocomplete(self.outra, 'joao').status_code, 302)
+
+    def test_formulario_usa_select2_do_admin(self):
+        self.client.force_login(self.usuario)
+        with self.settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage'):
+            response = self.client.get(f'/{self.empresa.slug}/pets/novo/')
+        self.assertContains(response, '/static/admin/js/vendor/select2/')
+        self.assertNotContains(response, 'cdn.jsdelivr.net/npm/select2')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, NFC_JOBS={'EAGER': False})
+class CartoesTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Acme')
+        self.ana = criar_pessoa(self.empresa, 'Ana')
+
+    def test_provisionamento_realoca_apos_colisao(self):
+        NFCCard.objects.create(codigo_nfc='ACME-0001', pessoa=self.ana, tipo='pessoa')
+        # Simula outro processo gravando ACME-0001 entre a alocação e o INSERT
+        respostas = iter([['ACME-0001', 'ACME-0002']])
+        alocar = provisioning.alocar_codigos
+        with mock.patch.object(provisioning, 'alocar_codigos',
+                               side_effect=lambda *args, **kwargs: next(respostas, None) or alocar(*args, **kwargs)) as alocador:
+            cartoes = provisioning.provisionar_cartoes(self.empresa, 2, esquema='sequencial', prefixo='acme-', tamanho=4)
+        self.assertEqual(alocador.call_count, 2)
+        self.assertEqual([cartao.codigo_nfc for cartao in cartoes], ['ACME-0002', 'ACME-0003'])
+        self.assertEqual(NFCCard.objects.filter(empresa=self.empresa).count(), 3)
+        self.assertEqual(counters.totais(self.empresa.pk)['cartoes'], 3)
+
+    def test_codigos_aleatorios_evitam_os_existentes(self):
+        NFCCard.objects.create(codigo_nfc='X2222', pessoa=self.ana, tipo='pessoa')
+        sorteios = iter('2222' + '3333')
+        with mock.patch.object(provisioning.secrets, 'choice', side_effect=lambda alfabeto: next(sorteios)):
+            self.assertEqual(provisioning.alocar_codigos(1, prefixo='x', tamanho=4), ['X3333'])
+
+    def test_engine_renderiza_so_os_desatualizados(self):
+        cartoes = [NFCCard.objects.create(codigo_nfc=codigo, pessoa=self.ana, tipo='pessoa') for codigo in ('q1', 'q2')]
+        self.assertFalse(any(cartao.qr_code for cartao in cartoes))
+        engine = qr.QRRenderEngine(workers=1)
+        estatisticas = engine.renderizar([cartoes])
+        self.assertEqual((estatisticas['renderizados'], estatisticas['em_dia']), (2, 0))
+        for cartao in NFCCard.objects.filter(pk__in=[cartao.pk for cartao in cartoes]):
+            self.assertEqual(cartao.qr_fingerprint, qr.fingerprint_qr(cartao.get_qr_url()))
+            self.assertTrue(default_storage.exists(cartao.qr_code.name))
+        estatisticas = engine.renderizar([list(NFCCard.objects.filter(pk__in=[cartao.pk for cartao in cartoes]))])
+        self.assertEqual((estatisticas['renderizados'], estatisticas['em_dia']), (0, 2))
+
+    def test_qr_enderecado_pelo_conteudo_e_reaproveitado(self):
+        url = qr.url_qr(self.empresa.slug, 'Q3')
+        self.assertEqual(qr.fingerprint_qr(url), qr.fingerprint_qr(url))
+        self.assertNotEqual(qr.fingerprint_qr(url), qr.fingerprint_qr(url, box_size=qr.QR_BOX_SIZE + 1))
+        qr.gravar_png(qr.fingerprint_qr(url), qr.renderizar_png(url))
+
+        cartao = NFCCard.objects.create(codigo_nfc='q3', pessoa=self.ana, tipo='pessoa')
+        # O arquivo já existe: o save grava o caminho sem enfileirar a renderização
+        self.assertEqual(cartao.qr_code.name, qr.caminho_qr(qr.fingerprint_qr(url)))
+        self.assertFalse(Job.objects.filter(tipo='qr.renderizar').exists())
+        NFCCard.objects.filter(pk=cartao.pk).update(qr_fingerprint='')
+        with mock.patch.object(qr, 'renderizar_png') as renderizar:
+            estatisticas = qr.QRRenderEngine(workers=1).renderizar([[NFCCard.objects.get(pk=cartao.pk)]])
+        renderizar.assert_not_called()
+        self.assertEqual(estatisticas['reaproveitados'], 1)
+        self.assertEqual(NFCCard.objects.get(pk=cartao.pk).qr_fingerprint, qr.fingerprint_qr(url))
+
+    def test_sync_qr_codes_dry_run_nao_grava(self):
+        cartao = NFCCard.objects.create(codigo_nfc='q4', pessoa=self.ana, tipo='pessoa')
+        qr.QRRenderEngine(workers=1).renderizar([[cartao]])
+        antes = NFCCard.objects.values('qr_code', 'qr_fingerprint').get(pk=cartao.pk)
+        with self.settings(SITE_URL='https://cartoes.example.com'):
+            saida = StringIO()
+            with mock.patch.object(default_storage, 'save') as salvar:
+                call_command('sync_qr_codes', '--dry-run', stdout=saida)
+            salvar.assert_not_called()
+            self.assertIn('1 desatualizados', saida.getvalue())
+            self.assertEqual(NFCCard.objects.values('qr_code', 'qr_fingerprint').get(pk=cartao.pk), antes)
+
+            call_command('sync_qr_codes', '--workers', '1', stdout=StringIO())
+            cartao.refresh_from_db()
+            self.assertFalse(qr.qr_desatualizado(cartao))
+
+
+def jpeg_com_exif():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientação: girar 90°
+    buffer = BytesIO()
+    Image.new('RGB', (40, 20), 'red').save(buffer, format='JPEG', exif=exif)
+    return ContentFile(buffer.getvalue(), name='foto.jpg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, NFC_JOBS={'EAGER': False})
+class ExportacaoImportacaoTests(TestCase):
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome='Acme')
+        self.ana = criar_pessoa(self.empresa, 'Ana', cargo='Diretora, vendas')
+        self.bia = criar_pessoa(self.empresa, 'Bia')
+        criar_pessoa(Empresa.objects.create(nome='Outra'), 'Caio')
+
+    def test_exportacao_em_pedacos_com_cabecalhos(self):
+        usuario = User.objects.create_user('equipe')
+        usuario.profile.empresa = self.empresa
+        usuario.profile.save()
+        self.client.force_login(usuario)
+        url = f'/{self.empresa.slug}/exportar/pessoas'
+        with mock.patch.object(exports, 'TAMANHO_PEDACO', 1):
+            response = self.client.get(f'{url}.csv')
+            self.assertTrue(response.streaming)
+            pedacos = [pedaco.decode() for pedaco in response.streaming_content]
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{self.empresa.slug}-pessoas.csv"')
+        # BOM, cabeçalho e uma linha por pessoa da empresa, cada um em seu pedaço
+        self.assertEqual(len(pedacos), 4)
+        self.assertTrue(pedacos[1].startswith('slug,nome,email'))
+        self.assertTrue(pedacos[2].startswith('ana,Ana,') and '"Diretora, vendas"' in pedacos[2])
+
+        response = self.client.get(f'{url}.jsonl')
+        linhas = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(linha)['slug'] for linha in linhas], ['ana', 'bia'])
+
+        response = self.client.get(f'{url}.vcf.zip')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as arquivo:
+            self.assertEqual(arquivo.namelist(), ['ana.vcf', 'bia.vcf'])
+            self.assertIn('TITLE:Diretora\\, vendas', arquivo.read('ana.vcf').decode())
+        self.assertEqual(self.client.get(f'/{self.empresa.slug}/exportar/pets.vcf.zip').status_code, 404)
+
+    def test_importacao_com_erros_por_linha_e_tutores_do_mesmo_arquivo(self):
+        pessoas = BytesIO(
+            'nome,email,telefone,apresentacao,slug\n'
+            'Ana,nova@example.com,1199,Oi,\n'
+            ',sem-nome@example.com,1199,Oi,\n'
+            'Caio,caio@example.com,1199,Oi,caio-tutor\n'
+            'Duda,email-invalido,1199,Oi,\n'.encode()
+        )
+        pets = BytesIO('\n'.join([
+            json.dumps({'nome': 'Rex', 'especie': 'cao', 'tutor_slug': 'caio-tutor'}),
+            '',
+            '{quebrado',
+            json.dumps({'nome': 'Mia', 'especie': 'gato', 'tutor_email': 'NOVA@example.com'}),
+            json.dumps({'nome': 'Tom', 'especie': 'gato', 'tutor_slug': 'ninguem'}),
+        ]).encode())
+        resultados = imports.importar_arquivos(self.empresa, pessoas=pessoas, pets=pets, formato_pets='jsonl')
+
+        self.assertEqual((resultados['pessoas']['criados'], resultados['pets']['criados']), (2, 2))
+        self.assertEqual([linha for linha, _ in resultados['pessoas']['erros']], [3, 5])
+        self.assertIn('email', resultados['pessoas']['erros'][1][1])
+        self.assertEqual([linha for linha, _ in resultados['pets']['erros']], [3, 5])
+        self.assertIn('Tutor não encontrado', resultados['pets']['erros'][1][1])
+        self.assertEqual(
+            dict(Pet.objects.values_list('nome', 'tutor__slug')),
+            {'Rex': 'caio-tutor', 'Mia': 'ana-1'},
+        )
+        self.assertEqual(counters.totais(self.empresa.pk)['pets'], 2)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, NFC_JOBS={'EAGER': False})
+class RemocaoExifTests(TestCase):
+    def setUp(self):
+        self.pessoa = criar_pessoa(Empresa.objects.create(nome='Acme'), 'Ana', foto=jpeg_com_exif())
+        self.original = self.pessoa.foto.name
+
+    def test_troca_o_arquivo_antes_de_apagar_o_original(self):
+        jobs.processar_imagem(self.original, modelo='nfc_cards.person', pk=self.pessoa.pk)
+        self.pessoa.refresh_from_db()
+        self.assertNotEqual(self.pessoa.foto.name, self.original)
+        self.assertFalse(default_storage.exists(self.original))
+        with default_storage.open(self.pessoa.foto.name) as arquivo:
+            imagem = Image.open(arquivo)
+            self.assertEqual((imagem.size, dict(imagem.getexif())), ((20, 40), {}))
+
+    def test_imagem_substituida_durante_a_tarefa(self):
+        Person.objects.filter(pk=self.pessoa.pk).update(foto='pessoas/outra.jpg')
+        arquivos = set(default_storage.listdir('pessoas')[1])
+        jobs.processar_imagem(self.original, modelo='nfc_cards.person', pk=self.pessoa.pk)
+        self.assertTrue(default_storage.exists(self.original))
+        self.assertEqual(set(default_storage.listdir('pessoas')[1]), arquivos)
+
+    def test_tarefa_antiga_sem_modelo(self):
+        jobs.processar_imagem(self.original)
+        self.pessoa.refresh_from_db()
+        self.assertNotEqual(self.pessoa.foto.name, self.original)
+        self.assertTrue(default_storage.exists(self.pessoa.foto.name))
+
+
+EXECUCOES = []
+
+
+@jobs.tarefa('teste.registrar')
+def _registrar(valor, falhar=False):
+    EXECUCOES.append(valor)
+    if falhar:
+        raise RuntimeError('falha de teste')
+
+
+@override_settings(NFC_JOBS={'EAGER': False, 'MAX_TENTATIVAS': 2})
+class FilaTarefasTests(TestCase):
+    def setUp(self):
+        EXECUCOES.clear()
+
+    def test_chave_reaproveita_tarefa_pendente(self):
+        primeira = jobs.enfileirar('teste.registrar', {'valor': 1}, chave='k')
+        segunda = jobs.enfileirar('teste.registrar', {'valor': 2}, chave='k')
+        self.assertEqual(primeira.pk, segunda.pk)
+        self.assertEqual(Job.objects.get().payload, {'valor': 2})
+
+    def test_reserva_e_execucao(self):
+        jobs.enfileirar('teste.registrar', {'valor': 1})
+        job = jobs.reservar()
+        self.assertEqual((job.status, job.tentativas), ('executando', 1))
+        self.assertIsNone(jobs.reservar())
+        self.assertTrue(jobs.executar(job))
+        self.assertEqual(Job.objects.get().status, 'concluida')
+        self.assertEqual(EXECUCOES, [1])
+
+    def test_reenfileirada_durante_a_execucao_roda_de_novo(self):
+        jobs.enfileirar('teste.registrar', {'valor': 1}, chave='k')
+        job = jobs.reservar()
+        jobs.enfileirar('teste.registrar', {'valor': 2}, chave='k')
+        jobs.executar(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.repetir, job.tentativas), ('pendente', False, 0))
+        jobs.executar(jobs.reservar())
+        self.assertEqual(EXECUCOES, [1, 2])
+        self.assertEqual(Job.objects.get().status, 'concluida')
+
+    def test_falha_repete_com_espera_ate_o_limite(self):
+        jobs.enfileirar('teste.registrar', {'valor': 1, 'falhar': True})
+        with self.assertLogs('nfc_cards.jobs', 'WARNING'):
+            self.assertFalse(jobs.executar(jobs.reservar()))
+        job = Job.objects.get()
+        self.assertEqual(job.status, 'pendente')
+        self.assertGreater(job.agendado_para, timezone.now())
+        self.assertIsNone(jobs.reservar())
+
+        Job.objects.update(agendado_para=timezone.now())
+        with self.assertLogs('nfc_cards.jobs', 'WARNING'):
+            jobs.executar(jobs.reservar())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.tentativas), ('falhou', 2))
+        self.assertIn('falha de teste', job.erro)
+
+    def test_recupera_tarefas_travadas(self):
+        jobs.enfileirar('teste.registrar', {'valor': 1})
+        jobs.reservar()
+        Job.objects.update(iniciado_em=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.recuperar_travadas(), 1)
+        self.assertEqual(Job.objects.get().status, 'pendente')
+
+
+@override_settings(NFC_SQLITE={'PRODUCTION': True, 'BUSY_TIMEOUT': 1234, 'CACHE_SIZE_KB': 4096})
+class SqliteProducaoTests(TestCase):
+    def _pragma(self, conexao, nome):
+        with conexao.cursor() as cursor:
+            cursor.execute(f'PRAGMA {nome}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_aplicados_em_cada_conexao_nova(self):
+        nova = connections.create_connection('default')
+        try:
+            nova.ensure_connection()
+            self.assertEqual((self._pragma(nova, 'busy_timeout'), self._pragma(nova, 'cache_size')), (1234, -4096))
+        finally:
+            nova.close()
+        with self.settings(NFC_SQLITE={'PRODUCTION': False, 'BUSY_TIMEOUT': 1234}):
+            nova = connections.create_connection('default')
+            try:
+                nova.ensure_connection()
+                self.assertNotEqual(self._pragma(nova, 'busy_timeout'), 1234)
+            finally:
+                nova.close()
+
+    def test_retentativa_apenas_com_banco_ocupado(self):
+        gravar = mock.Mock(side_effect=[OperationalError('database is locked'), 'ok'])
+        with mock.patch.object(sqlite.time, 'sleep') as esperar:
+            self.assertEqual(sqlite.com_retentativa(gravar), 'ok')
+            self.assertEqual((gravar.call_count, esperar.call_count), (2, 1))
+
+            gravar = mock.Mock(side_effect=OperationalError('database is locked'))
+            with self.assertRaises(OperationalError):
+                sqlite.com_retentativa(gravar, tentativas=3)
+            self.assertEqual(gravar.call_count, 3)
+
+            gravar = mock.Mock(side_effect=OperationalError('no such table: x'))
+            with self.assertRaises(OperationalError):
+                sqlite.com_retentativa(gravar)
+            self.assertEqual(gravar.call_count, 1)
+
+    def test_contadores_na_transacao_da_requisicao(self):
+        empresa = Empresa.objects.create(nome='Acme')
+        criar_pessoa(empresa, 'Ana')
+        self.assertEqual(counters.totais(empresa.pk)['pessoas'], 1)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            criar_pessoa(empresa, 'Bia')
+            raise RuntimeError
+        self.assertEqual(counters.totais(empresa.pk)['pessoas'], 1)
+
+
+def cache_compartilhado():
+    return {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(prefix='cards_nfc_cache_'),
+    }}
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TESTES, NFC_JOBS={'EAGER': False}, CACHES=cache_compartilhado())
+class CachePaginasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(nome='Acme')
+        self.pessoa = criar_pessoa(self.empresa, 'Ana', cargo='Gerente')
+        self.url = f'/{self.empresa.slug}/pessoas/{self.pessoa.slug}/'
+
+    def test_acerto_sem_consultas_e_304(self):
+        primeira = self.client.get(self.url)
+        self.assertEqual(primeira.status_code, 200)
+        with self.assertNumQueries(0):
+            segunda = self.client.get(self.url)
+        self.assertEqual(segunda.content, primeira.content)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=primeira['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_alteracao_invalida_pagina_e_etag(self):
+        primeira = self.client.get(self.url)
+        self.pessoa.cargo = 'Diretora'
+        self.pessoa.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=primeira['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Diretora')
+        self.assertNotEqual(response['ETag'], primeira['ETag'])
+
+    def test_cache_isolado_desliga_o_cache_de_paginas(self):
+        self.assertTrue(page_cache.ativo())
+        self.assertEqual(page_cache.verificar_backend(None), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertFalse(page_cache.ativo())
+            self.assertEqual([aviso.id for aviso in page_cache.verificar_backend(None)], ['nfc_cards.W001'])
+            # O GET condicional continua valendo sem o cache de página
+            etag = self.client.get(self.url)['ETag']
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class BancoDeDadosTests(SimpleTestCase):
+    def test_sqlite_relativo_e_absoluto(self):
+        self.assertEqual(banco_de_dados('sqlite:///db.sqlite3')['NAME'], 'db.sqlite3')
+        self.assertEqual(banco_de_dados('sqlite:////var/lib/cards/db.sqlite3')['NAME'], '/var/lib/cards/db.sqlite3')
+        self.assertEqual(banco_de_dados('sqlite://')['NAME'], ':memory:')
+
+    def test_postgres_com_credenciais_e_opcoes(self):
+        banco = banco_de_dados('postgres://cards:s%40nha@db:5432/cards?sslmode=require', conn_max_age=60)
+        self.assertEqual(banco['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(
+            (banco['NAME'], banco['USER'], banco['PASSWORD'], banco['HOST'], banco['PORT']),
+            ('cards', 'cards', 's@nha', 'db', '5432'),
+        )
+        self.assertEqual(banco['OPTIONS'], {'sslmode': 'require'})
+        self.assertEqual(banco['CONN_MAX_AGE'], 60)
+        self.assertTrue(banco_de_dados('postgres://db/cards', pool='pgbouncer')['DISABLE_SERVER_SIDE_CURSORS'])
+
+    def test_esquema_e_pool_invalidos(self):
+        with self.assertRaises(ImproperlyConfigured):
+            banco_de_dados('mysql://db/cards')
+        with self.assertRaises(ImproperlyConfigured):
+            banco_de_dados('postgres://db/cards', pool='pgpool')
+        with self.assertRaises(ImproperlyConfigured):
+            banco_de_dados('postgres://db/cards', pool='django')
@@ -29,11 +29,25 @@ urlpatterns = [
     path('<slug:empresa_slug>/pets/novo/', views.PetCreateView.as_view(), name='pet_create'),
     path('<slug:empresa_slug>/pets/<slug:pet_slug>/', views.PetDetailView.as_view(), name='pet_detail'),
     
+    # Busca de pessoas e pets (JSON)
+    path('<slug:empresa_slug>/api/busca/', views.BuscaView.as_view(), name='busca'),
+    path('<slug:empresa_slug>/api/autocomplete/<slug:conjunto>/', views.AutocompleteView.as_view(), name='autocomplete'),
+    
+    # Listagens JSON paginadas por cursor (pessoas, pets e cartões)
+    path('<slug:empresa_slug>/api/<slug:conjunto>/', views.ListagemApiView.as_view(), name='api_listagem'),
+    
+    # Exportações (CSV, JSONL e vCards)
+    path('<slug:empresa_slug>/exportar/<slug:conjunto>.<str:formato>', views.ExportarView.as_view(), name='exportar'),
+    
     # URLs para NFC (mantém compatibilidade)
     path('nfc/<str:codigo>/', views.nfc_redirect, name='nfc_redirect'),
+    path('api/nfc/lote/', views.api_nfc_lote, name='api_nfc_lote'),
     path('api/nfc/<str:codigo>/', views.api_nfc_info, name='api_nfc_info'),
     
     # URLs diretos por empresa para NFC
     path('<slug:empresa_slug>/nfc/<str:codigo>/', views.nfc_redirect_empresa, name='nfc_redirect_empresa'),
+    path('<slug:empresa_slug>/nfc/<str:codigo>/qr.svg', views.qr_code_cartao, {'formato': 'svg'}, name='qr_code_svg'),
+    path('<slug:empresa_slug>/nfc/<str:codigo>/qr.png', views.qr_code_cartao, {'formato': 'png'}, name='qr_code_png'),
+    path('<slug:empresa_slug>/api/nfc/lote/', views.api_nfc_lote, name='api_nfc_lote_empresa'),
     path('<slug:empresa_slug>/api/nfc/<str:codigo>/', views.api_nfc_info_empresa, name='api_nfc_info_empresa'),
 ]
\ No newline at end of file
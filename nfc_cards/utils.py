@@ -0,0 +1,30 @@
+from django.conf import settings
+
+# Backends de cache cujo conteúdo é isolado em cada processo
+BACKENDS_CACHE_LOCAIS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def cache_isolado(alias='default'):
+    """True quando o cache ``alias`` não é compartilhado entre os workers (ex.: LocMemCache).
+
+    Nesse caso uma invalidação só alcança o processo que a fez.
+    """
+    return settings.CACHES[alias]['BACKEND'] in BACKENDS_CACHE_LOCAIS
+
+
+def iterar_em_lotes(queryset, tamanho=500):
+    """Percorre o queryset em lotes ordenados pela PK (paginação por chave).
+
+    Diferente de ``iterator()``, cada lote é uma consulta independente, então
+    é seguro atualizar as linhas lidas entre um lote e outro e a memória fica
+    limitada ao tamanho do lote.
+    """
+    ultimo = None
+    queryset = queryset.order_by('pk')
+    while True:
+        pagina = queryset if ultimo is None else queryset.filter(pk__gt=ultimo)
+        lote = list(pagina[:tamanho])
+        if not lote:
+            return
+        yield lote
+        ultimo = lote[-1].pk
@@ -1,7 +1,12 @@
+import json
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
-from django.views.generic import DetailView, CreateView, ListView
-from django.urls import reverse_lazy
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from django.views.generic import DetailView, CreateView, ListView, View
+from django.urls import reverse, reverse_lazy
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -10,6 +15,17 @@ from django.contrib.auth.models import User
 from django.contrib import messages
 from django import forms
 from .models import Person, Pet, NFCCard, Empresa, UserProfile
+from .tap_cache import normalizar_codigo, resolver_toque
+from .page_cache import CachePaginaPublicaMixin
+from .tenancy import EmpresaDaRequisicaoMixin, empresa_ativa_ou_404, empresa_da_requisicao
+from .pagination import CursorInvalido, PaginacaoCursorMixin, paginar
+from .serializers import cartoes_para_api, payload_da_resposta, serializar_cartao, snapshot_ativo
+from .conditional import aplicar_validadores, nao_modificado, validadores_cartao, validadores_pessoa, validadores_pet
+from . import counters, qr, search
+from .tap_events import registrar_toque
+from .analytics import resumo_dashboard, total_toques
+from .exports import FORMATOS as FORMATOS_EXPORTACAO, exportar, nome_arquivo
+from .widgets import AutocompleteSelect
 
 class CustomUserCreationForm(UserCreationForm):
     """Formulário customizado para registro de usuário"""
@@ -102,6 +118,11 @@ def minha_empresa_view(request):
         messages.warning(request, 'Você precisa criar uma empresa primeiro.')
         return redirect('create_empresa')
 
+def _totais(empresa_id=None):
+    """Totais de registros ativos lidos dos contadores (ver counters.py)"""
+    totais = counters.totais(empresa_id)
+    return {'total_pessoas': totais['pessoas'], 'total_pets': totais['pets'], 'total_cartoes': totais['cartoes']}
+
 @login_required
 def dashboard_view(request):
     """Dashboard principal do usuário logado"""
@@ -113,28 +134,17 @@ def dashboard_view(request):
         
         context = {
             'empresa': empresa,
-            'total_pessoas': empresa.pessoas.filter(ativo=True).count(),
-            'total_pets': empresa.pets.filter(ativo=True).count(),
-            'total_cartoes': empresa.cartoes_nfc.filter(ativo=True).count(),
+            **_totais(empresa.pk),
             'pessoas_recentes': empresa.pessoas.filter(ativo=True).order_by('-criado_em')[:5],
             'pets_recentes': empresa.pets.filter(ativo=True).order_by('-criado_em')[:5],
         }
+        context.update(resumo_dashboard(empresa))
         return render(request, 'nfc_cards/dashboard.html', context)
     except (UserProfile.DoesNotExist, AttributeError):
         return redirect('create_empresa')
-    
-    context = {
-        'empresa': empresa,
-        'total_pessoas': empresa.pessoas.filter(ativo=True).count(),
-        'total_pets': empresa.pets.filter(ativo=True).count(),
-        'total_cartoes': empresa.cartoes_nfc.filter(ativo=True).count(),
-        'pessoas_recentes': empresa.pessoas.filter(ativo=True).order_by('-criado_em')[:5],
-        'pets_recentes': empresa.pets.filter(ativo=True).order_by('-criado_em')[:5],
-    }
-    return render(request, 'nfc_cards/dashboard.html', context)
 
 # Mixin para verificar se o usuário tem acesso à empresa
-class EmpresaAccessMixin(LoginRequiredMixin):
+class EmpresaAccessMixin(EmpresaDaRequisicaoMixin, LoginRequiredMixin):
     """Mixin para verificar se o usuário tem acesso à empresa"""
     
     def dispatch(self, request, *args, **kwargs):
@@ -143,12 +153,15 @@ class EmpresaAccessMixin(LoginRequiredMixin):
         
         empresa_slug = kwargs.get('empresa_slug')
         if empresa_slug:
-            # Verificar se o usuário tem acesso a esta empresa
+            # Verificar se o usuário tem acesso a esta empresa (sem carregar profile.empresa)
             try:
-                if (not request.user.profile.empresa or 
-                    request.user.profile.empresa.slug != empresa_slug):
+                empresa = empresa_da_requisicao(request, empresa_slug)
+                if (not request.user.profile.empresa_id or empresa is None or
+                    request.user.profile.empresa_id != empresa.pk):
                     messages.error(request, 'Você não tem acesso a esta empresa.')
                     return redirect('minha_empresa')
+                # O menu do base.html usa user.profile.empresa: reaproveita a instância resolvida
+                request.user.profile.empresa = empresa
             except (UserProfile.DoesNotExist, AttributeError):
                 messages.error(request, 'Você precisa criar uma empresa primeiro.')
                 return redirect('create_empresa')
@@ -156,44 +169,67 @@ class EmpresaAccessMixin(LoginRequiredMixin):
         return super().dispatch(request, *args, **kwargs)
 
 # Atualizar as views existentes para incluir controle de acesso
-class PersonDetailView(DetailView):
+class PersonDetailView(CachePaginaPublicaMixin, DetailView):
     model = Person
+    cache_tipo = 'pessoa'
+    cache_slug_kwarg = 'person_slug'
     template_name = 'nfc_cards/person_detail.html'
     context_object_name = 'person'
     slug_field = 'slug'
     slug_url_kwarg = 'person_slug'
     
     def get_object(self, queryset=None):
-        empresa_slug = self.kwargs.get('empresa_slug')
-        person_slug = self.kwargs.get('person_slug')
-        empresa = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
-        return get_object_or_404(Person, empresa=empresa, slug=person_slug, ativo=True)
+        empresa = empresa_ativa_ou_404(self.request, self.kwargs.get('empresa_slug'))
+        pessoa = get_object_or_404(Person, empresa=empresa, slug=self.kwargs.get('person_slug'), ativo=True)
+        pessoa.empresa = empresa
+        return pessoa
+    
+    def get_validadores(self, empresa_slug, objeto_slug, versao, usuario):
+        return validadores_pessoa(empresa_slug, objeto_slug, versao=versao, usuario=usuario)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['cartoes_nfc'] = self.object.cartoes_nfc.filter(ativo=True)
+        context['cartoes_nfc'] = self.object.cartoes_nfc.filter(ativo=True).select_related('empresa')
         context['empresa'] = self.object.empresa
         return context
 
-class PetDetailView(DetailView):
+class PetDetailView(CachePaginaPublicaMixin, DetailView):
     model = Pet
+    cache_tipo = 'pet'
+    cache_slug_kwarg = 'pet_slug'
     template_name = 'nfc_cards/pet_detail.html'
     context_object_name = 'pet'
     slug_field = 'slug'
     slug_url_kwarg = 'pet_slug'
     
     def get_object(self, queryset=None):
-        empresa_slug = self.kwargs.get('empresa_slug')
-        pet_slug = self.kwargs.get('pet_slug')
-        empresa = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
-        return get_object_or_404(Pet, empresa=empresa, slug=pet_slug, ativo=True)
+        empresa = empresa_ativa_ou_404(self.request, self.kwargs.get('empresa_slug'))
+        pet = get_object_or_404(Pet.objects.select_related('tutor'), empresa=empresa, slug=self.kwargs.get('pet_slug'), ativo=True)
+        pet.empresa = empresa
+        return pet
+    
+    def get_validadores(self, empresa_slug, objeto_slug, versao, usuario):
+        return validadores_pet(empresa_slug, objeto_slug, versao=versao, usuario=usuario)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['cartoes_nfc'] = self.object.cartoes_nfc.filter(ativo=True)
+        context['cartoes_nfc'] = self.object.cartoes_nfc.filter(ativo=True).select_related('empresa')
         context['empresa'] = self.object.empresa
         return context
 
+class ExportarView(EmpresaAccessMixin, View):
+    """Exportação em streaming dos cadastros da empresa (ver exports.py)"""
+    
+    def get(self, request, empresa_slug, conjunto, formato):
+        empresa = empresa_da_requisicao(request, empresa_slug)
+        try:
+            conteudo = exportar(empresa, conjunto, formato)
+        except ValueError:
+            raise Http404('Exportação não encontrada.')
+        response = StreamingHttpResponse(conteudo, content_type=FORMATOS_EXPORTACAO[formato])
+        response['Content-Disposition'] = f'attachment; filename="{nome_arquivo(empresa, conjunto, formato)}"'
+        return response
+
 class PersonCreateView(EmpresaAccessMixin, CreateView):
     model = Person
     template_name = 'nfc_cards/person_form.html'
@@ -207,14 +243,11 @@ class PersonCreateView(EmpresaAccessMixin, CreateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        empresa_slug = self.kwargs.get('empresa_slug')
-        context['empresa'] = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
+        context['empresa'] = self.empresa
         return context
     
     def form_valid(self, form):
-        empresa_slug = self.kwargs.get('empresa_slug')
-        empresa = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
-        form.instance.empresa = empresa
+        form.instance.empresa = self.empresa
         messages.success(self.request, 'Pessoa cadastrada com sucesso!')
         return super().form_valid(form)
 
@@ -231,60 +264,205 @@ class PetCreateView(EmpresaAccessMixin, CreateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        empresa_slug = self.kwargs.get('empresa_slug')
-        empresa = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
-        context['empresa'] = empresa
+        context['empresa'] = self.empresa
         return context
     
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
-        empresa_slug = self.kwargs.get('empresa_slug')
-        empresa = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
-        # Filtrar tutores apenas da empresa atual
-        form.fields['tutor'].queryset = Person.objects.filter(empresa=empresa, ativo=True)
+        # As opções vêm do autocomplete: a página só renderiza o tutor selecionado
+        tutor = form.fields['tutor']
+        tutor.widget = AutocompleteSelect(
+            reverse('autocomplete', kwargs={'empresa_slug': self.empresa.slug, 'conjunto': 'pessoas'}),
+            placeholder='Digite o nome do tutor...',
+        )
+        tutor.widget.is_required = tutor.required
+        # Filtrar tutores apenas da empresa atual (Person.__str__ exibe a empresa)
+        tutor.queryset = Person.objects.filter(empresa=self.empresa, ativo=True).select_related('empresa')
         return form
     
     def form_valid(self, form):
-        empresa_slug = self.kwargs.get('empresa_slug')
-        empresa = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
-        form.instance.empresa = empresa
+        form.instance.empresa = self.empresa
         messages.success(self.request, 'Pet cadastrado com sucesso!')
         return super().form_valid(form)
 
-class PersonListView(EmpresaAccessMixin, ListView):
+class BuscaListaMixin:
+    """Filtra a listagem pelo índice de busca quando há ``?q=`` (ver search.py)"""
+    busca_tipo = None
+    busca_limite = 500
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        termo = self.request.GET.get('q', '').strip()
+        if termo:
+            queryset = queryset.filter(pk__in=search.buscar(self.empresa.pk, self.busca_tipo, termo, self.busca_limite))
+        return queryset
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['q'] = self.request.GET.get('q', '').strip()
+        return context
+
+class PersonListView(EmpresaAccessMixin, BuscaListaMixin, PaginacaoCursorMixin, ListView):
     model = Person
     template_name = 'nfc_cards/person_list.html'
     context_object_name = 'pessoas'
     paginate_by = 12
+    busca_tipo = 'pessoa'
     
     def get_queryset(self):
-        empresa_slug = self.kwargs.get('empresa_slug')
-        empresa = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
-        return Person.objects.filter(empresa=empresa, ativo=True).order_by('nome')
+        # A ordem vem da paginação por cursor (?ordem=nome|recentes)
+        return super().get_queryset().filter(empresa=self.empresa, ativo=True)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        empresa_slug = self.kwargs.get('empresa_slug')
-        context['empresa'] = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
+        context['empresa'] = self.empresa
+        context['total'] = None if context['q'] else counters.totais(self.empresa.pk)['pessoas']
         return context
 
-class PetListView(EmpresaAccessMixin, ListView):
+class PetListView(EmpresaAccessMixin, BuscaListaMixin, PaginacaoCursorMixin, ListView):
     model = Pet
     template_name = 'nfc_cards/pet_list.html'
     context_object_name = 'pets'
     paginate_by = 12
+    busca_tipo = 'pet'
     
     def get_queryset(self):
-        empresa_slug = self.kwargs.get('empresa_slug')
-        empresa = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
-        return Pet.objects.filter(empresa=empresa, ativo=True).order_by('nome')
+        # A ordem vem da paginação por cursor (?ordem=nome|recentes)
+        return super().get_queryset().filter(empresa=self.empresa, ativo=True)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        empresa_slug = self.kwargs.get('empresa_slug')
-        context['empresa'] = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
+        context['empresa'] = self.empresa
+        context['total'] = None if context['q'] else counters.totais(self.empresa.pk)['pets']
         return context
 
+class BuscaView(EmpresaAccessMixin, View):
+    """Busca de pessoas e pets da empresa em JSON (``?q=``, ``tipo=pessoa|pet``, ``limite=``)"""
+    
+    def get(self, request, empresa_slug):
+        termo = request.GET.get('q', '').strip()
+        tipos = [request.GET['tipo']] if request.GET.get('tipo') else list(search.TIPOS)
+        if any(tipo not in search.TIPOS for tipo in tipos):
+            return JsonResponse({'error': 'Tipo inválido (use "pessoa" ou "pet").'}, status=400)
+        try:
+            limite = min(max(int(request.GET.get('limite', search.LIMITE_PADRAO)), 1), search.LIMITE_PADRAO)
+        except ValueError:
+            return JsonResponse({'error': 'Limite inválido.'}, status=400)
+        
+        resultados = []
+        for tipo in tipos:
+            ids = search.buscar(self.empresa.pk, tipo, termo, limite)
+            modelo, rota, parametro = (Person, 'person_detail', 'person_slug') if tipo == 'pessoa' else (Pet, 'pet_detail', 'pet_slug')
+            # in_bulk devolve um dict: a ordem de relevância vem de ids
+            objetos = modelo.objects.filter(ativo=True).only('pk', 'nome', 'slug').in_bulk(ids)
+            resultados.extend(
+                {
+                    'tipo': tipo,
+                    'id': objetos[pk].pk,
+                    'nome': objetos[pk].nome,
+                    'slug': objetos[pk].slug,
+                    'url': reverse(rota, kwargs={'empresa_slug': self.empresa.slug, parametro: objetos[pk].slug}),
+                }
+                for pk in ids if pk in objetos
+            )
+        return JsonResponse({'q': termo, 'resultados': resultados})
+
+class AutocompleteView(EmpresaAccessMixin, View):
+    """Opções para campos de autocomplete no formato do select2 (``?q=``, ``page=``)"""
+    conjuntos = {
+        'pessoas': ('pessoa', Person.objects.all()),
+        'pets': ('pet', Pet.objects.select_related('tutor')),
+    }
+    
+    def get(self, request, empresa_slug, conjunto):
+        if conjunto not in self.conjuntos:
+            raise Http404('Conjunto não encontrado.')
+        try:
+            pagina = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            pagina = 1
+        tipo, queryset = self.conjuntos[conjunto]
+        queryset = queryset.filter(empresa=self.empresa, ativo=True)
+        objetos, tem_mais = search.autocompletar(queryset, tipo, self.empresa.pk, request.GET.get('q', ''), pagina)
+        for objeto in objetos:
+            # __str__ mostra o nome da empresa, que já está resolvida
+            objeto.empresa = self.empresa
+        return JsonResponse({
+            'results': [{'id': objeto.pk, 'text': str(objeto)} for objeto in objetos],
+            'pagination': {'more': tem_mais},
+        })
+
+class ListagemApiView(EmpresaAccessMixin, View):
+    """Listagem JSON paginada por cursor (``?ordem=``, ``cursor=``, ``limite=``; ver pagination.py)"""
+    limite_maximo = 100
+    
+    def _pessoa(self, pessoa):
+        return {
+            'id': pessoa.pk,
+            'nome': pessoa.nome,
+            'slug': pessoa.slug,
+            'email': pessoa.email,
+            'telefone': pessoa.telefone,
+            'cargo': pessoa.cargo,
+            'criado_em': pessoa.criado_em,
+            'url': reverse('person_detail', kwargs={'empresa_slug': self.empresa.slug, 'person_slug': pessoa.slug}),
+        }
+    
+    def _pet(self, pet):
+        return {
+            'id': pet.pk,
+            'nome': pet.nome,
+            'slug': pet.slug,
+            'especie': pet.especie,
+            'raca': pet.raca,
+            'tutor': {'id': pet.tutor_id, 'nome': pet.tutor.nome},
+            'criado_em': pet.criado_em,
+            'url': reverse('pet_detail', kwargs={'empresa_slug': self.empresa.slug, 'pet_slug': pet.slug}),
+        }
+    
+    def _cartao(self, cartao):
+        return {
+            'id': cartao.pk,
+            'codigo_nfc': cartao.codigo_nfc,
+            'tipo': cartao.tipo,
+            'pessoa_id': cartao.pessoa_id,
+            'pet_id': cartao.pet_id,
+            'criado_em': cartao.criado_em,
+            'url': reverse('nfc_redirect_empresa', kwargs={'empresa_slug': self.empresa.slug, 'codigo': cartao.codigo_nfc}),
+        }
+    
+    def get(self, request, empresa_slug, conjunto):
+        # conjunto -> (queryset, ordenações aceitas, serializador, campo do contador)
+        conjuntos = {
+            'pessoas': (Person.objects.all(), ('nome', 'recentes'), self._pessoa, 'pessoas'),
+            'pets': (Pet.objects.select_related('tutor'), ('nome', 'recentes'), self._pet, 'pets'),
+            'cartoes': (NFCCard.objects.all(), ('recentes',), self._cartao, 'cartoes'),
+        }
+        if conjunto not in conjuntos:
+            raise Http404('Conjunto não encontrado.')
+        queryset, ordenacoes, serializar, campo = conjuntos[conjunto]
+        ordem = request.GET.get('ordem') or ordenacoes[0]
+        if ordem not in ordenacoes:
+            return JsonResponse({'error': f'Ordem inválida (use {", ".join(ordenacoes)}).'}, status=400)
+        try:
+            limite = min(max(int(request.GET.get('limite', 20)), 1), self.limite_maximo)
+        except ValueError:
+            return JsonResponse({'error': 'Limite inválido.'}, status=400)
+        
+        queryset = queryset.filter(empresa=self.empresa, ativo=True)
+        try:
+            pagina = paginar(queryset, ordem, request.GET.get('cursor'), limite)
+        except CursorInvalido as erro:
+            return JsonResponse({'error': str(erro)}, status=400)
+        return JsonResponse({
+            'ordem': ordem,
+            # Total dos contadores (não conta a cada página)
+            'total': counters.totais(self.empresa.pk)[campo],
+            'resultados': [serializar(objeto) for objeto in pagina],
+            'proximo': pagina.proximo,
+            'anterior': pagina.anterior,
+        })
+
 def home(request):
     """Página inicial do sistema - lista empresas ativas"""
     if request.user.is_authenticated:
@@ -302,144 +480,168 @@ def home(request):
             return redirect('create_empresa')
     else:
         # Se não está logado, mostra página inicial pública
-        empresas = Empresa.objects.filter(ativo=True).order_by('nome')
+        empresas = list(Empresa.objects.filter(ativo=True).order_by('nome'))
+        totais_empresas = counters.totais_empresas([empresa.pk for empresa in empresas])
+        for empresa in empresas:
+            empresa.totais = totais_empresas[empresa.pk]
         
         context = {
             'empresas': empresas,
-            'total_pessoas': Person.objects.filter(ativo=True).count(),
-            'total_pets': Pet.objects.filter(ativo=True).count(),
-            'total_cartoes': NFCCard.objects.filter(ativo=True).count(),
+            **_totais(),
         }
         return render(request, 'nfc_cards/home.html', context)
 
 def empresa_home(request, empresa_slug):
     """Página inicial de uma empresa específica"""
-    empresa = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
+    empresa = empresa_ativa_ou_404(request, empresa_slug)
     
     context = {
         'empresa': empresa,
-        'total_pessoas': empresa.pessoas.filter(ativo=True).count(),
-        'total_pets': empresa.pets.filter(ativo=True).count(),
-        'total_cartoes': empresa.cartoes_nfc.filter(ativo=True).count(),
+        **_totais(empresa.pk),
         'pessoas_recentes': empresa.pessoas.filter(ativo=True).order_by('-criado_em')[:5],
         'pets_recentes': empresa.pets.filter(ativo=True).order_by('-criado_em')[:5],
+        'total_toques': total_toques(empresa, dias=30),
     }
     return render(request, 'nfc_cards/empresa_home.html', context)
 
 def nfc_redirect(request, codigo):
     """Redireciona baseado no código NFC (compatibilidade)"""
-    try:
-        cartao = NFCCard.objects.get(codigo_nfc=codigo, ativo=True)
-        if cartao.pessoa:
-            return redirect('person_detail', 
-                          empresa_slug=cartao.empresa.slug, 
-                          person_slug=cartao.pessoa.slug)
-        elif cartao.pet:
-            return redirect('pet_detail', 
-                          empresa_slug=cartao.empresa.slug, 
-                          pet_slug=cartao.pet.slug)
-        else:
-            messages.error(request, 'Cartão NFC não está associado a nenhum cadastro.')
-            return redirect('home')
-    except NFCCard.DoesNotExist:
+    toque = resolver_toque(codigo)
+    if toque is None:
         messages.error(request, 'Código NFC não encontrado.')
         return redirect('home')
+    registrar_toque(request, toque)
+    if not toque['url']:
+        messages.error(request, 'Cartão NFC não está associado a nenhum cadastro.')
+        return redirect('home')
+    return redirect(toque['url'])
 
 def nfc_redirect_empresa(request, empresa_slug, codigo):
     """Redireciona baseado no código NFC dentro de uma empresa"""
-    empresa = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
-    try:
-        cartao = NFCCard.objects.get(codigo_nfc=codigo, empresa=empresa, ativo=True)
-        if cartao.pessoa:
-            return redirect('person_detail', 
-                          empresa_slug=empresa_slug, 
-                          person_slug=cartao.pessoa.slug)
-        elif cartao.pet:
-            return redirect('pet_detail', 
-                          empresa_slug=empresa_slug, 
-                          pet_slug=cartao.pet.slug)
-        else:
-            messages.error(request, 'Cartão NFC não está associado a nenhum cadastro.')
-            return redirect('empresa_home', empresa_slug=empresa_slug)
-    except NFCCard.DoesNotExist:
+    toque = resolver_toque(codigo)
+    if toque is None or toque['empresa_slug'] != empresa_slug or not toque['empresa_ativa']:
+        # Só consulta a empresa no caminho de erro para manter o 404 original
+        empresa_ativa_ou_404(request, empresa_slug)
         messages.error(request, 'Código NFC não encontrado.')
         return redirect('empresa_home', empresa_slug=empresa_slug)
+    registrar_toque(request, toque)
+    if not toque['url']:
+        messages.error(request, 'Cartão NFC não está associado a nenhum cadastro.')
+        return redirect('empresa_home', empresa_slug=empresa_slug)
+    return redirect(toque['url'])
+
+def qr_code_cartao(request, empresa_slug, codigo, formato):
+    """QR code do cartão gerado localmente (SVG ou PNG com ?size=).
+
+    Só é ``immutable`` quando a URL traz ``?v=`` com a versão atual (ver
+    ``qr.versao_qr``); sem ela o conteúdo muda com ``SITE_URL`` ou a
+    renderização, então o cache é curto e revalidado pelo ETag.
+    """
+    toque = resolver_toque(codigo)
+    if toque is None or toque['empresa_slug'] != empresa_slug or not toque['empresa_ativa']:
+        raise Http404('Código NFC não encontrado.')
+    
+    url = qr.url_qr(empresa_slug, normalizar_codigo(codigo))
+    tamanho = qr.normalizar_tamanho(request.GET.get('size')) if formato == 'png' else None
+    etag = '"%s"' % qr.fingerprint_qr(url, box_size=tamanho or qr.QR_BOX_SIZE, formato=formato)
+    
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        conteudo = qr.renderizar_memoizado(url, formato, tamanho)
+        content_type = 'image/svg+xml' if formato == 'svg' else 'image/png'
+        response = HttpResponse(conteudo, content_type=content_type)
+    response['ETag'] = etag
+    if request.GET.get('v') == qr.versao_qr(url):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=300'
+    return response
+
+def _resposta_cartao(request, validadores, **filtros):
+    filtros['ativo'] = True
+    if snapshot_ativo():
+        snapshot = NFCCard.objects.filter(**filtros).values_list('payload_json', flat=True).first()
+        if snapshot:
+            data = payload_da_resposta(snapshot, request.build_absolute_uri)
+            return aplicar_validadores(JsonResponse(data), **validadores)
+    cartao = cartoes_para_api().filter(**filtros).first()
+    if cartao is None:
+        return JsonResponse({'error': 'Código NFC não encontrado'}, status=404)
+    data = serializar_cartao(cartao, request.build_absolute_uri)
+    if data is None:
+        return JsonResponse({'error': 'Cartão não associado'}, status=404)
+    return aplicar_validadores(JsonResponse(data), **validadores)
 
 def api_nfc_info(request, codigo):
     """API para retornar informações do cartão NFC em JSON (compatibilidade)"""
-    try:
-        cartao = NFCCard.objects.get(codigo_nfc=codigo, ativo=True)
-        
-        if cartao.pessoa:
-            data = {
-                'tipo': 'pessoa',
-                'empresa': cartao.empresa.nome,
-                'empresa_slug': cartao.empresa.slug,
-                'nome': cartao.pessoa.nome,
-                'email': cartao.pessoa.email,
-                'telefone': cartao.pessoa.telefone,
-                'cargo': cartao.pessoa.cargo,
-                'apresentacao': cartao.pessoa.apresentacao,
-                'url': request.build_absolute_uri(cartao.pessoa.get_absolute_url()),
-                'foto': cartao.pessoa.foto.url if cartao.pessoa.foto else None,
-            }
-        elif cartao.pet:
-            data = {
-                'tipo': 'pet',
-                'empresa': cartao.empresa.nome,
-                'empresa_slug': cartao.empresa.slug,
-                'nome': cartao.pet.nome,
-                'especie': cartao.pet.get_especie_display(),
-                'raca': cartao.pet.raca,
-                'tutor': cartao.pet.tutor.nome,
-                'tutor_telefone': cartao.pet.tutor.telefone,
-                'url': request.build_absolute_uri(cartao.pet.get_absolute_url()),
-                'foto': cartao.pet.foto.url if cartao.pet.foto else None,
-            }
-        else:
-            return JsonResponse({'error': 'Cartão não associado'}, status=404)
-            
-        return JsonResponse(data)
-        
-    except NFCCard.DoesNotExist:
+    validadores = validadores_cartao(codigo, host=request.get_host())
+    if validadores is None:
         return JsonResponse({'error': 'Código NFC não encontrado'}, status=404)
+    response = nao_modificado(request, **validadores)
+    if response is not None:
+        return response
+    return _resposta_cartao(request, validadores, codigo_nfc=codigo)
 
 def api_nfc_info_empresa(request, empresa_slug, codigo):
     """API para retornar informações do cartão NFC em JSON dentro de uma empresa"""
-    empresa = get_object_or_404(Empresa, slug=empresa_slug, ativo=True)
-    try:
-        cartao = NFCCard.objects.get(codigo_nfc=codigo, empresa=empresa, ativo=True)
-        
-        if cartao.pessoa:
-            data = {
-                'tipo': 'pessoa',
-                'empresa': empresa.nome,
-                'empresa_slug': empresa.slug,
-                'nome': cartao.pessoa.nome,
-                'email': cartao.pessoa.email,
-                'telefone': cartao.pessoa.telefone,
-                'cargo': cartao.pessoa.cargo,
-                'apresentacao': cartao.pessoa.apresentacao,
-                'url': request.build_absolute_uri(cartao.pessoa.get_absolute_url()),
-                'foto': cartao.pessoa.foto.url if cartao.pessoa.foto else None,
-            }
-        elif cartao.pet:
-            data = {
-                'tipo': 'pet',
-                'empresa': empresa.nome,
-                'empresa_slug': empresa.slug,
-                'nome': cartao.pet.nome,
-                'especie': cartao.pet.get_especie_display(),
-                'raca': cartao.pet.raca,
-                'tutor': cartao.pet.tutor.nome,
-                'tutor_telefone': cartao.pet.tutor.telefone,
-                'url': request.build_absolute_uri(cartao.pet.get_absolute_url()),
-                'foto': cartao.pet.foto.url if cartao.pet.foto else None,
-            }
-        else:
-            return JsonResponse({'error': 'Cartão não associado'}, status=404)
-            
-        return JsonResponse(data)
-        
-    except NFCCard.DoesNotExist:
+    validadores = validadores_cartao(codigo, empresa_slug=empresa_slug, host=request.get_host())
+    if validadores is None:
+        empresa_ativa_ou_404(request, empresa_slug)
         return JsonResponse({'error': 'Código NFC não encontrado'}, status=404)
+    response = nao_modificado(request, **validadores)
+    if response is not None:
+        return response
+    return _resposta_cartao(request, validadores, codigo_nfc=codigo, empresa__slug=empresa_slug, empresa__ativo=True)
+
+def _codigos_lote(request):
+    """Códigos pedidos via corpo JSON ({"codigos": [...]}) ou ?codigos=A,B,C"""
+    if request.method == 'POST' and request.content_type == 'application/json':
+        try:
+            corpo = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ValueError('JSON inválido.')
+        codigos = corpo.get('codigos') if isinstance(corpo, dict) else corpo
+        if not isinstance(codigos, list) or not all(isinstance(codigo, str) for codigo in codigos):
+            raise ValueError('Envie "codigos" como uma lista de strings.')
+    else:
+        parametro = request.POST.get('codigos') if request.method == 'POST' else request.GET.get('codigos')
+        codigos = (parametro or '').split(',')
+    # Remove vazios e repetidos, mantendo a ordem
+    return list(dict.fromkeys(codigo.strip() for codigo in codigos if codigo.strip()))
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def api_nfc_lote(request, empresa_slug=None):
+    """Consulta vários cartões NFC de uma vez.
+
+    Retorna ``{"cartoes": {codigo: payload}}``, com o mesmo payload da API de
+    um cartão ou ``{"error": ...}`` para os códigos não resolvidos.
+    """
+    try:
+        codigos = _codigos_lote(request)
+    except ValueError as erro:
+        return JsonResponse({'error': str(erro)}, status=400)
+    limite = getattr(settings, 'NFC_API_LOTE_MAXIMO', 100)
+    if not codigos:
+        return JsonResponse({'error': 'Nenhum código informado.'}, status=400)
+    if len(codigos) > limite:
+        return JsonResponse({'error': f'Máximo de {limite} códigos por consulta.'}, status=400)
+    
+    cartoes = cartoes_para_api().filter(ativo=True)
+    if empresa_slug is not None:
+        empresa_ativa_ou_404(request, empresa_slug)
+        cartoes = cartoes.filter(empresa__slug=empresa_slug)
+    normalizados = {codigo: normalizar_codigo(codigo) for codigo in codigos}
+    encontrados = {
+        cartao.codigo_nfc: cartao
+        for cartao in cartoes.filter(codigo_nfc__in=set(normalizados.values()))
+    }
+    
+    resultado = {}
+    for codigo, normalizado in normalizados.items():
+        cartao = encontrados.get(normalizado)
+        if cartao is None:
+            resultado[codigo] = {'error': 'Código NFC não encontrado'}
+            continue
+        resultado[codigo] = serializar_cartao(cartao, request.build_absolute_uri) or {'error': 'Cartão não associado'}
+    return JsonResponse({'cartoes': resultado})
@@ -0,0 +1,39 @@
+from django import forms
+from django.conf import settings
+
+
+class AutocompleteSelect(forms.Select):
+    """Select que carrega as opções sob demanda (select2 + endpoint JSON de autocomplete).
+
+    Só a opção selecionada é renderizada, então a página não lê o queryset
+    inteiro do campo; a validação continua sendo a do ``ModelChoiceField``.
+    """
+
+    def __init__(self, url, attrs=None, placeholder='Digite para buscar...'):
+        super().__init__(attrs)
+        self.url = url
+        self.placeholder = placeholder
+
+    @property
+    def media(self):
+        # jQuery e select2 que o admin do Django já distribui, servidos pelo whitenoise como o resto
+        extra = '' if settings.DEBUG else '.min'
+        return forms.Media(
+            css={'all': [f'admin/css/vendor/select2/select2{extra}.css']},
+            js=[f'admin/js/vendor/jquery/jquery{extra}.js', f'admin/js/vendor/select2/select2.full{extra}.js'],
+        )
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs.setdefault('data-autocomplete-url', str(self.url))
+        attrs.setdefault('data-placeholder', self.placeholder)
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        selecionados = [valor for valor in value if valor]
+        opcoes = [self.create_option(name, '', '', not selecionados, 0)]
+        if selecionados:
+            queryset = self.choices.queryset.filter(pk__in=selecionados)
+            for indice, objeto in enumerate(queryset, start=1):
+                opcoes.append(self.create_option(name, objeto.pk, self.choices.field.label_from_instance(objeto), True, indice))
+        return [(None, opcoes, 0)]